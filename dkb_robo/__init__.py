@@ -1,8 +1,26 @@
 """init"""
 
-from importlib.metadata import version
+__author__ = "GrindSa"
+# the names get bound on first access by __getattr__ below (PEP 562)
+__all__ = ["DKBRobo", "DKBRoboError", "__version__"]  # pylint: disable=e0603
 
-from .dkb_robo import DKBRobo, DKBRoboError
 
-__author__ = "GrindSa"
-__version__ = version("dkb_robo")
+def __getattr__(name):
+    """import the api and scraping stack on first access only (PEP 562)"""
+    # pylint: disable=c0415
+    if name in ("DKBRobo", "DKBRoboError"):
+        from .dkb_robo import DKBRobo, DKBRoboError
+
+        globals().update(DKBRobo=DKBRobo, DKBRoboError=DKBRoboError)
+        return globals()[name]
+    if name == "__version__":
+        from importlib.metadata import version
+
+        globals()["__version__"] = version("dkb_robo")
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    """list the lazily bound names as well"""
+    return sorted(list(globals()) + __all__)
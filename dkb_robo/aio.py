@@ -0,0 +1,787 @@
+""" Module providing an asyncio counterpart of DKBRobo on top of httpx """
+# pylint: disable=r0913, w0212
+import asyncio
+import email.utils
+import functools
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from dkb_robo.authentication import SSO_HEADERS, Authentication
+from dkb_robo.dkb_robo import DKBRobo, DKBRoboError
+from dkb_robo.exemptionorder import ExemptionOrders
+from dkb_robo.frame import TransactionFrame
+from dkb_robo.portfolio import Overview
+from dkb_robo.postbox import CHUNK_SIZE, PostBox, PostboxItem
+from dkb_robo.snapshot import save_snapshot
+from dkb_robo.standingorder import StandingOrders
+from dkb_robo.transaction import Transactions
+from dkb_robo.transport import RETRY_STATUS, DeadlineExceeded, TransportPolicy
+from dkb_robo.utilities import JSON_CONTENT_TYPE, validate_dates
+from dkb_robo.utilities import DKBRoboError as ApiError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_after(response) -> Optional[float]:
+    """seconds to wait according to the Retry-After header"""
+    value = response.headers.get("Retry-After", None)
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_date.timestamp() - time.time(), 0)
+
+
+class AsyncSession:
+    """httpx.AsyncClient taking over the cookies and headers of a requests session
+
+    GET requests get retried on 429/5xx responses with the jittered back-off
+    of the transport policy honouring Retry-After. Other requests are sent once.
+    """
+
+    def __init__(self, session, policy: TransportPolicy = None, max_workers: int = 1):
+        if httpx is None:
+            raise ImportError(
+                "AsyncDKBRobo requires httpx, install it by running 'pip install dkb_robo[async]'"
+            )
+        self.policy = policy if policy is not None else TransportPolicy()
+
+        verify = True
+        proxy = None
+        if session.proxies:
+            proxy = session.proxies.get("https") or session.proxies.get("http")
+            verify = False  # NOSONAR
+
+        cookies = httpx.Cookies()
+        for cookie in session.cookies:
+            cookies.set(
+                cookie.name, cookie.value, domain=cookie.domain, path=cookie.path
+            )
+
+        pool_size = self.policy.connections(max_workers)
+        self.client = httpx.AsyncClient(
+            # httpx announces the encodings it is able to decode on its own
+            headers={
+                key: value
+                for key, value in session.headers.items()
+                if key.lower() != "accept-encoding"
+            },
+            cookies=cookies,
+            timeout=httpx.Timeout(
+                self.policy.read_timeout, connect=self.policy.connect_timeout
+            ),
+            transport=httpx.AsyncHTTPTransport(
+                verify=verify,
+                proxy=proxy,
+                # connection errors only, status codes are handled by get()
+                retries=self.policy.retries,
+                limits=httpx.Limits(
+                    max_connections=pool_size, max_keepalive_connections=pool_size
+                ),
+            ),
+            follow_redirects=True,
+        )
+
+    async def aclose(self):
+        """close all connections"""
+        await self.client.aclose()
+
+    async def get(self, url: str, **kwargs):
+        """send a GET request and retry it on 429/5xx responses"""
+        attempt = 0
+        while True:
+            response = await self.client.get(url, **kwargs)
+            if (
+                response.status_code not in RETRY_STATUS
+                or attempt >= self.policy.retries
+            ):
+                return response
+
+            attempt += 1
+            wait = _retry_after(response)
+            if wait is None:
+                wait = self.policy.backoff(attempt)
+            logger.debug(
+                "AsyncSession.get(): %s returned %s, retry %s in %.1fs\n",
+                url,
+                response.status_code,
+                attempt,
+                wait,
+            )
+            await response.aclose()
+            await asyncio.sleep(wait)
+
+    async def patch(self, url: str, **kwargs):
+        """send a PATCH request"""
+        return await self.client.patch(url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        """send a POST request"""
+        return await self.client.post(url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs):
+        """context manager streaming the response body"""
+        return self.client.stream(method, url, **kwargs)
+
+
+class AsyncOverview(Overview):
+    """Overview fetching the product endpoints concurrently"""
+
+    async def _afetch(self, url_path) -> Dict[str, str]:
+        """fetch data via API"""
+        logger.debug("AsyncOverview._afetch()\n")
+
+        start = time.perf_counter()
+        response = await self.client.get(self.base_url + url_path)
+        self.latency_dic[url_path] = time.perf_counter() - start
+        if response.status_code == 200:
+            response_dic = response.json()
+        else:
+            logger.error(
+                "fetch %s: RC is not 200 but %s", url_path, response.status_code
+            )
+            response_dic = {}
+
+        logger.debug("AsyncOverview._afetch() ended\n")
+        return response_dic
+
+    async def _afetch_products(self) -> Dict[str, Dict[str, str]]:
+        """fetch all product endpoints at once"""
+        result_list = await asyncio.gather(
+            *(self._afetch(url_path) for url_path in self.PRODUCT_ENDPOINTS.values())
+        )
+        return dict(zip(self.PRODUCT_ENDPOINTS, result_list))
+
+    async def aget(self):
+        """Get overview"""
+        logger.debug("AsyncOverview.aget()")
+
+        self.latency_dic = {}
+        product_display_dic = await self._afetch(
+            "/config/users/me/product-display-settings"
+        )
+        if product_display_dic:
+            portfolio_dic = {"product_display": product_display_dic}
+            portfolio_dic.update(await self._afetch_products())
+        else:
+            portfolio_dic = {}
+
+        logger.debug("AsyncOverview.aget() ended\n")
+        return self._sort(portfolio_dic)
+
+
+class AsyncTransactions(Transactions):
+    """Transactions fetched via an AsyncSession"""
+
+    async def _afetch(self, transaction_url: str) -> Dict[str, str]:
+        """get transaction list"""
+        logger.debug("AsyncTransactions._afetch(%s)\n", transaction_url)
+
+        transaction_dic = {"data": [], "included": []}
+        async for page_dic in self._apages(transaction_url):
+            transaction_dic["data"].extend(page_dic.get("data", []))
+            transaction_dic["included"].extend(page_dic.get("included", []))
+
+        logger.debug(
+            "AsyncTransactions._afetch() ended with %s entries\n",
+            len(transaction_dic["data"]),
+        )
+        return transaction_dic
+
+    async def _apages(self, transaction_url: str) -> AsyncIterator[Dict[str, str]]:
+        """fetch transaction pages one after another"""
+        logger.debug("AsyncTransactions._apages(%s)\n", transaction_url)
+
+        while transaction_url:
+            response = await self.client.get(transaction_url)
+            if response.status_code == 200:
+                page_dic = response.json()
+                if "data" in page_dic:
+                    transaction_url = self._nextpage_url(page_dic)
+                else:
+                    logger.debug("fetch transactions: no data in response")
+                    transaction_url = None
+                yield page_dic
+            else:
+                self._status_error(response)
+                break
+
+        logger.debug("AsyncTransactions._apages() ended\n")
+
+    async def abackfill(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+        max_workers: int = 4,
+    ):
+        """fetch a long date range in concurrent monthly windows and merge the results"""
+        logger.debug("AsyncTransactions.abackfill()\n")
+
+        # reject unknown fields before fetching
+        self._projection(atype)
+
+        if atype not in ["account", "creditcard", "creditCard"]:
+            # depot positions cannot be filtered by date
+            return await self.aget(
+                transaction_url, atype, date_from, date_to, transaction_type
+            )
+
+        semaphore = asyncio.Semaphore(max(max_workers, 1))
+
+        async def _window(window):
+            async with semaphore:
+                return await self._afetch(
+                    self._url(transaction_url, atype, window[0], window[1])
+                )
+
+        transaction_dic_list = await asyncio.gather(
+            *(_window(window) for window in self._windows(date_from, date_to))
+        )
+
+        logger.debug("AsyncTransactions.abackfill() ended\n")
+        return self._merge(
+            transaction_dic_list, atype, date_from, date_to, transaction_type
+        )
+
+    async def aget(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+    ):
+        """fetch transactions"""
+        logger.debug("AsyncTransactions.aget()\n")
+
+        # reject unknown fields before fetching
+        self._projection(atype)
+
+        transaction_dic = await self._afetch(
+            self._url(transaction_url, atype, date_from, date_to)
+        )
+
+        logger.debug("AsyncTransactions.aget() ended\n")
+        return self._process(
+            transaction_dic, atype, date_from, date_to, transaction_type
+        )
+
+    async def aget_frame(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+        backend: Optional[str] = None,
+    ) -> TransactionFrame:
+        """fetch transactions into a columnar TransactionFrame"""
+        logger.debug("AsyncTransactions.aget_frame()\n")
+
+        if atype in ["account", "creditcard", "creditCard"]:
+            transaction_dic = await self._afetch(
+                self._url(transaction_url, atype, date_from, date_to)
+            )
+        else:
+            logger.error("AsyncTransactions.aget_frame(): %s is not supported", atype)
+            transaction_dic = {}
+
+        logger.debug("AsyncTransactions.aget_frame() ended\n")
+        return self._frame(
+            transaction_dic, atype, date_from, date_to, transaction_type, backend
+        )
+
+    async def aiter_pages(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+    ) -> AsyncIterator[List[Dict[str, str]]]:
+        """fetch transactions and yield them page by page"""
+        logger.debug("AsyncTransactions.aiter_pages()\n")
+
+        # reject unknown fields before fetching
+        self._projection(atype)
+
+        async for page_dic in self._apages(
+            self._url(transaction_url, atype, date_from, date_to)
+        ):
+            yield self._process(page_dic, atype, date_from, date_to, transaction_type)
+
+        logger.debug("AsyncTransactions.aiter_pages() ended\n")
+
+
+class AsyncStandingOrders(StandingOrders):
+    """StandingOrders fetched via an AsyncSession"""
+
+    async def afetch(self, uid) -> Dict:
+        """fetch standing orders"""
+        logger.debug("AsyncStandingOrders.afetch()\n")
+
+        if not uid:
+            raise ApiError("account-id is required to fetch standing orders")
+
+        so_list = []
+        response = await self.client.get(
+            self.base_url
+            + "/accounts/payments/recurring-credit-transfers"
+            + "?accountId="
+            + uid
+        )
+        if response.status_code == 200:
+            so_list = self._filter(response.json())
+
+        logger.debug("AsyncStandingOrders.afetch() ended\n")
+        return so_list
+
+
+class AsyncExemptionOrders(ExemptionOrders):
+    """ExemptionOrders fetched via an AsyncSession"""
+
+    async def afetch(self) -> Dict:
+        """fetch exemption orders from api"""
+        logger.debug("AsyncExemptionOrders.afetch()\n")
+
+        response = await self.client.get(self.base_url + "/customers/me/tax-exemptions")
+        if response.status_code != 200:
+            raise ApiError(
+                f"fetch exemption orders: http status code is not 200 but {response.status_code}"
+            )
+
+        logger.debug("AsyncExemptionOrders.afetch() ended\n")
+        return self._filter(response.json())
+
+
+class AsyncPostBox(PostBox):
+    """PostBox using an AsyncSession"""
+
+    async def adownload(
+        self, item: PostboxItem, target_file: Path, overwrite: bool = False
+    ):
+        """stream a document into the target file (see PostboxItem.download())"""
+        logger.debug("AsyncPostBox.adownload(): %s to %s", item.id, target_file)
+
+        if target_file.exists() and not overwrite:
+            return False
+
+        checksum_hash = item._checksum_hash() if item.document.checksum else None
+        async with self.client.stream(
+            "GET", item.document.link, headers={"Accept": item.document.contentType}
+        ) as resp:
+            resp.raise_for_status()
+            target_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_fd, tmp_name = tempfile.mkstemp(
+                dir=target_file.parent, prefix=f".{target_file.name}.", suffix=".part"
+            )
+            tmp_file = Path(tmp_name)
+            try:
+                with os.fdopen(tmp_fd, "wb") as file:
+                    async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                        file.write(chunk)
+                        if checksum_hash:
+                            checksum_hash.update(chunk)
+            except BaseException:
+                # includes the cancellation of the download
+                tmp_file.unlink()
+                raise
+
+        if not checksum_hash or item.check_checsum(
+            target_file, tmp_file, checksum_hash.hexdigest()
+        ):
+            os.replace(tmp_file, target_file)
+        return resp.status_code
+
+    async def afetch_items(self) -> Dict[str, PostboxItem]:
+        """Fetches all items from the postbox and merges document and message data."""
+        logger.debug("AsyncPostBox.afetch_items()")
+
+        (messages, documents) = await asyncio.gather(
+            self.client.get(PostBox.BASE_URL + "/messages"),
+            self.client.get(PostBox.BASE_URL + "/documents?page%5Blimit%5D=1000"),
+        )
+        messages.raise_for_status()
+        documents.raise_for_status()
+        return self._merge(messages.json(), documents.json())
+
+    async def amark_read(self, item: PostboxItem, read: bool):
+        """Marks the document as read or unread."""
+        logger.debug("AsyncPostBox.amark_read(): set document %s to %s", item.id, read)
+        resp = await self.client.patch(
+            item.message.link,
+            json={"data": {"attributes": {"read": read}, "type": "message"}},
+            headers={"Accept": JSON_CONTENT_TYPE, "Content-type": JSON_CONTENT_TYPE},
+        )
+        resp.raise_for_status()
+
+
+class AsyncAuthentication(Authentication):
+    """Authentication handing the session over to an AsyncSession after the login"""
+
+    aclient = None
+
+    async def alogin(self):
+        """login into DKB banking area"""
+        logger.debug("AsyncAuthentication.alogin()\n")
+
+        # the login waits for the confirmation in the banking app - keep it off the loop
+        await asyncio.get_running_loop().run_in_executor(None, self._session)
+        # the api calls after the login are sent as cors requests
+        self.client.headers.update(SSO_HEADERS)
+        self.aclient = AsyncSession(
+            self.client, self.transport.policy, self.max_workers
+        )
+        self.account_dic = await self.aoverview()
+
+        logger.debug("AsyncAuthentication.alogin() ended\n")
+        return self.account_dic, None
+
+    async def alogout(self):
+        """logout function"""
+        self.logout()
+        if self.aclient:
+            await self.aclient.aclose()
+
+    async def aoverview(self) -> Dict:
+        """fetch the account overview and persist it as snapshot"""
+        logger.debug("AsyncAuthentication.aoverview()\n")
+
+        overview = AsyncOverview(
+            client=self.aclient,
+            unfiltered=self.unfiltered,
+            max_workers=self.max_workers,
+        )
+        account_dic = await overview.aget()
+        self.latency_dic = overview.latency_dic
+        if self.snapshot_file and account_dic:
+            save_snapshot(self.snapshot_file, self.dkb_user, account_dic)
+
+        logger.debug("AsyncAuthentication.aoverview() ended\n")
+        return account_dic
+
+
+def _operation(method):
+    """run an exported coroutine within the deadline of the transport policy"""
+
+    @functools.wraps(method)
+    async def _wrapped(self, *args, **kwargs):
+        deadline = getattr(self.transport_policy, "deadline", None)
+        if not deadline:
+            return await method(self, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(method(self, *args, **kwargs), deadline)
+        except asyncio.TimeoutError as err:
+            raise DeadlineExceeded(
+                f"Deadline exceeded: {method.__name__}() did not complete within {deadline}s"
+            ) from err
+
+    return _wrapped
+
+
+class AsyncDKBRobo(DKBRobo):
+    """asyncio counterpart of DKBRobo
+
+    async with AsyncDKBRobo(dkb_user=..., dkb_password=...) as dkb:
+        (giro, card) = await asyncio.gather(
+            dkb.aget_transactions(...), dkb.aget_transactions(...)
+        )
+
+    The login (including the 2nd factor) runs in a worker thread, all api
+    calls afterwards share one httpx.AsyncClient. The coroutines carry an "a"
+    prefix, the inherited methods of DKBRobo keep working but block the loop.
+    """
+
+    def __enter__(self):
+        raise DKBRoboError("AsyncDKBRobo must be used with 'async with'")
+
+    async def __aenter__(self):
+        """login and fetch the account overview"""
+        self.wrapper = self._authentication(AsyncAuthentication)
+        (self.account_dic, self.last_login) = await self.wrapper.alogin()
+        return self
+
+    async def __aexit__(self, *args):
+        """Close the connections at the end of the context"""
+        await self.wrapper.alogout()
+
+    @_operation
+    async def abackfill_transactions(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+    ):
+        """exported method to fetch a long transaction history in concurrent monthly windows"""
+        self.logger.debug("AsyncDKBRobo.abackfill_transactions()\n")
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = AsyncTransactions(
+            client=self.wrapper.aclient, unfiltered=self.unfiltered, field_list=fields
+        )
+        return await transaction.abackfill(
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+            transaction_type,
+            max_workers=self.max_workers,
+        )
+
+    @_operation
+    async def adownload(
+        self,
+        path: Path,
+        download_all: bool,
+        prepend_date: bool = False,
+        mark_read: bool = True,
+        use_account_folders: bool = False,
+        list_only: bool = False,
+        concurrency: int = 1,
+        unfiltered: bool = None,
+    ):
+        """download postbox documents"""
+        if path is None:
+            list_only = True
+        postbox = AsyncPostBox(client=self.wrapper.aclient)
+        documents = await postbox.afetch_items()
+        if not download_all:
+            # only unread documents
+            documents = {
+                id: item
+                for id, item in documents.items()
+                if item.message and item.message.read is False
+            }
+
+        accounts_by_id = self._accounts_by_id()
+        if not list_only:
+            semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+            async def _download_doc(doc):
+                async with semaphore:
+                    await self.adownload_doc(
+                        path=path,
+                        doc=doc,
+                        prepend_date=prepend_date,
+                        mark_read=mark_read,
+                        use_account_folders=use_account_folders,
+                        accounts_by_id=accounts_by_id,
+                        postbox=postbox,
+                    )
+
+            await asyncio.gather(*(_download_doc(doc) for doc in documents.values()))
+
+        if not self._unfiltered(unfiltered):
+            documents = self.format_doc(
+                path=path,
+                documents=documents,
+                use_account_folders=use_account_folders,
+                prepend_date=prepend_date,
+                accounts_by_id=accounts_by_id,
+            )
+
+        return documents
+
+    async def adownload_doc(
+        self,
+        path: Path,
+        doc,
+        prepend_date: bool = False,
+        mark_read: bool = True,
+        use_account_folders: bool = False,
+        accounts_by_id: dict = None,
+        postbox: AsyncPostBox = None,
+    ):
+        """download a single document"""
+        postbox = postbox or AsyncPostBox(client=self.wrapper.aclient)
+        target = path / doc.category()
+        if use_account_folders:
+            target = target / doc.account(card_lookup=accounts_by_id)
+        filename = f"{doc.date()}_{doc.filename()}" if prepend_date else doc.filename()
+
+        self.logger.info('Downloading "%s" to %s...', doc.subject(), target)
+        download_rcode = await postbox.adownload(doc, target / filename)
+        if download_rcode:
+            if mark_read:
+                await postbox.amark_read(doc, True)
+            doc.rcode = download_rcode
+        else:
+            self.logger.info("File already exists. Skipping %s.", filename)
+            doc.rcode = "skipped"
+
+    @_operation
+    async def aget_all_transactions(
+        self,
+        account_dic,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        unfiltered=None,
+        fields=None,
+    ):
+        """exported method to fetch the transactions of all accounts, cards and depots concurrently"""
+        self.logger.debug(
+            "AsyncDKBRobo.aget_all_transactions(%s/%s)\n", date_from, date_to
+        )
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        unfiltered = self._unfiltered(unfiltered)
+        source_list = self._transaction_sources(
+            self.account_dic if account_dic is None else account_dic, unfiltered
+        )
+
+        semaphore = asyncio.Semaphore(max(self.max_workers, 1))
+
+        async def _get(source):
+            (account, atype, transaction_url) = source
+            transaction = AsyncTransactions(
+                client=self.wrapper.aclient,
+                unfiltered=unfiltered,
+                strict=True,
+                field_list=fields,
+            )
+            try:
+                async with semaphore:
+                    transaction_list = await transaction.aget(
+                        transaction_url, atype, date_from, date_to, transaction_type
+                    )
+            except Exception as err:  # pylint: disable=w0718
+                self.logger.error(
+                    "fetching transactions of %s failed: %s", account, err
+                )
+                return {"type": atype, "transactions": [], "error": str(err)}
+            return {"type": atype, "transactions": transaction_list, "error": None}
+
+        result_list = await asyncio.gather(*[_get(source) for source in source_list])
+        return {source[0]: result for source, result in zip(source_list, result_list)}
+
+    @_operation
+    async def aget_exemption_order(self):
+        """get get_exemption_order"""
+        self.logger.debug("AsyncDKBRobo.aget_exemption_order()\n")
+        exemptionorder = AsyncExemptionOrders(
+            client=self.wrapper.aclient, unfiltered=self.unfiltered
+        )
+        return await exemptionorder.afetch()
+
+    @_operation
+    async def aget_standing_orders(self, uid=None, unfiltered=None):
+        """get standing orders"""
+        self.logger.debug("AsyncDKBRobo.aget_standing_orders()\n")
+        standingorder = AsyncStandingOrders(
+            client=self.wrapper.aclient, unfiltered=self._unfiltered(unfiltered)
+        )
+        return await standingorder.afetch(uid)
+
+    @_operation
+    async def aget_transactions(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+        unfiltered=None,
+    ):
+        """exported method to get transactions"""
+        self.logger.debug(
+            "AsyncDKBRobo.aget_transactions(%s/%s: %s/%s)\n",
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+        )
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = AsyncTransactions(
+            client=self.wrapper.aclient,
+            unfiltered=self._unfiltered(unfiltered),
+            field_list=fields,
+        )
+        return await transaction.aget(
+            transaction_url, atype, date_from, date_to, transaction_type
+        )
+
+    @_operation
+    async def aget_transaction_frame(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        backend=None,
+    ):
+        """exported method to get transactions as columnar TransactionFrame"""
+        self.logger.debug("AsyncDKBRobo.aget_transaction_frame()\n")
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = AsyncTransactions(client=self.wrapper.aclient)
+        return await transaction.aget_frame(
+            transaction_url, atype, date_from, date_to, transaction_type, backend
+        )
+
+    async def aiter_transactions(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+    ):
+        """exported method to iterate over transactions while they get fetched"""
+        self.logger.debug("AsyncDKBRobo.aiter_transactions()\n")
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = AsyncTransactions(
+            client=self.wrapper.aclient, unfiltered=self.unfiltered, field_list=fields
+        )
+        async for transaction_list in transaction.aiter_pages(
+            transaction_url, atype, date_from, date_to, transaction_type
+        ):
+            for ele in transaction_list:
+                yield ele
+
+    @_operation
+    async def arefresh_accounts(self):
+        """fetch the account overview again (and update the snapshot)"""
+        self.logger.debug("AsyncDKBRobo.arefresh_accounts()\n")
+
+        account_dic = await self.wrapper.aoverview()
+        if account_dic:
+            self.account_dic = account_dic
+        else:
+            self.logger.error("Refreshing the account overview failed")
+        return self.account_dic
+
+    async def ascan_postbox(
+        self, path=None, download_all=False, _archive=False, prepend_date=False
+    ):
+        """scan posbox and return document dictionary"""
+        self.logger.debug("AsyncDKBRobo.ascan_postbox()\n")
+        return await self.adownload(
+            Path(path) if path is not None else None, download_all, prepend_date
+        )
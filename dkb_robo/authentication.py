@@ -1,19 +1,35 @@
-# pylint: disable=r0913
+# pylint: disable=c0415, r0913
 """ Module for handling dkb standing orders """
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 import time
 import json
 import base64
 import io
+import os
+import tempfile
 import threading
 import logging
 import requests
-from dkb_robo.legacy import Wrapper as Legacywrapper
+from urllib3.util.request import ACCEPT_ENCODING
+from dkb_robo.cache import CacheAdapter
 from dkb_robo.portfolio import Overview
-from dkb_robo.utilities import DKBRoboError, JSON_CONTENT_TYPE
+from dkb_robo.snapshot import save_snapshot
+from dkb_robo.transport import TransportAdapter
+from dkb_robo.utilities import DKBRoboError, JSON_CONTENT_TYPE, TransferStats
 
 
 BASE_URL = "https://banking.dkb.de/api"
+# lifetime of a persisted session if the token does not tell otherwise
+SESSION_TTL = 300
+# seconds to wait for the confirmation in the banking app
+MFA_DEADLINE = 55
+# headers of the sso redirect and of all api calls after the login
+SSO_HEADERS = {
+    "Content-Type": "application/json",
+    "Sec-Fetch-Dest": "empty",
+    "Sec-Fetch-Mode": "cors",
+    "Sec-Fetch-Site": "same-origin",
+}
 logger = logging.getLogger(__name__)
 
 
@@ -23,15 +39,24 @@ class Authentication:
     account_dic = {}
     base_url = BASE_URL
     chip_tan = False
+    cache_adapter = None
     client = None
     dkb_user = None
     dkb_password = None
-    dkb_br = None
+    _dkb_br = None
+    latency_dic = {}
     logger = None
+    max_workers = 1
+    mfa_deadline = MFA_DEADLINE
+    mfa_latency = None
     mfa_method = "seal_one"
     mfa_device = 0
     proxies = {}
+    session_file = None
+    snapshot_file = None
     token_dic = None
+    transfer_stats = None
+    transport = None
     unfiltered = False
 
     def __init__(
@@ -42,12 +67,35 @@ class Authentication:
         proxies: Dict[str, str] = None,
         mfa_device: int = None,
         unfiltered: bool = False,
+        max_workers: int = 1,
+        session_file: str = None,
+        mfa_deadline: float = MFA_DEADLINE,
+        http_cache=None,
+        snapshot_file: str = None,
+        transport_policy=None,
     ):
         """Constructor"""
+        if http_cache is not None:
+            # cache entries are kept per user as the backend may be shared
+            self.cache_adapter = CacheAdapter(
+                http_cache,
+                scope=dkb_user,
+                policy=transport_policy,
+                max_workers=max_workers,
+            )
+            self.transport = self.cache_adapter
+        else:
+            self.transport = TransportAdapter(transport_policy, max_workers=max_workers)
         self.chip_tan = chip_tan
         self.dkb_user = dkb_user
         self.dkb_password = dkb_password
+        self.max_workers = max_workers
+        self.mfa_deadline = mfa_deadline
         self.proxies = proxies
+        self.session_file = session_file
+        self.snapshot_file = snapshot_file
+        self.transfer_stats = TransferStats()
+        self._sso_lock = threading.Lock()
         self.unfiltered = unfiltered
         if chip_tan:
             logger.info("Using to chip_tan to login")
@@ -151,7 +199,9 @@ class Authentication:
         challenge_id = self._mfa_challenge_id(challenge_dic)
 
         if self.mfa_method == "seal_one":
-            mfa_auth = APPAuthentication(client=self.client, base_url=self.base_url)
+            mfa_auth = APPAuthentication(
+                client=self.client, base_url=self.base_url, deadline=self.mfa_deadline
+            )
         elif self.mfa_method in ("chip_tan_manual", "chip_tan_qr"):
             mfa_auth = TANAuthentication(
                 client=self.client, base_url=self.base_url, mfa_method=self.mfa_method
@@ -162,6 +212,7 @@ class Authentication:
         mfa_completed = False
         if mfa_auth:
             mfa_completed = mfa_auth.finalize(challenge_id, challenge_dic, devicename)
+            self.mfa_latency = getattr(mfa_auth, "detection_latency", None)
 
         logger.debug("Authentication._mfa_finalize() ended with %s\n", mfa_completed)
         return mfa_completed
@@ -274,6 +325,8 @@ class Authentication:
         logger.debug("Authentication._session_new()\n")
 
         headers = {
+            # gzip/deflate plus br/zstd if the decoders are installed
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Accept-Language": "en-US,en;q=0.5",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Cache-Control": "no-cache",
@@ -291,6 +344,9 @@ class Authentication:
 
         client = requests.session()
         client.headers = headers
+        client.hooks["response"].append(self.transfer_stats.hook)
+        # pool size, timeouts and retries (and the http cache if enabled)
+        client.mount("https://", self.transport)
         if self.proxies:
             client.proxies = self.proxies
             client.verify = False  # NOSONAR
@@ -311,13 +367,10 @@ class Authentication:
         logger.debug("Authentication._sso_redirect()\n")
 
         data_dic = {"data": {"cookieDomain": ".dkb.de"}}
-        self.client.headers["Content-Type"] = "application/json"
-        self.client.headers["Sec-Fetch-Dest"] = "empty"
-        self.client.headers["Sec-Fetch-Mode"] = "cors"
-        self.client.headers["Sec-Fetch-Site"] = "same-origin"
-
         response = self.client.post(
-            self.base_url + "/sso-redirect", data=json.dumps(data_dic)
+            self.base_url + "/sso-redirect",
+            data=json.dumps(data_dic),
+            headers=SSO_HEADERS,
         )
 
         if response.status_code != 200 or response.text != "OK":
@@ -326,13 +379,27 @@ class Authentication:
                 response.status_code,
                 response.text,
             )
-        clientcookies = self.client.cookies
 
-        legacywrappper = Legacywrapper()
+        # mechanicalsoup and bs4 get loaded only if the legacy page is needed
+        from dkb_robo.legacy import Wrapper as Legacywrapper
+
+        legacywrappper = Legacywrapper(proxies=self.proxies)
         # pylint: disable=w0212
-        self.dkb_br = legacywrappper._new_instance(clientcookies)
+        self.dkb_br = legacywrappper._new_instance(session=self.client)
         logger.debug("Authentication._sso_redirect() ended.\n")
 
+    @property
+    def dkb_br(self):
+        """legacy browser - the sso redirect happens on first access"""
+        with self._sso_lock:
+            if self._dkb_br is None and self.client is not None:
+                self._sso_redirect()
+        return self._dkb_br
+
+    @dkb_br.setter
+    def dkb_br(self, browser):
+        self._dkb_br = browser
+
     def _token_get(self):
         """get access token"""
         logger.debug("Authentication._token_get()\n")
@@ -370,9 +437,107 @@ class Authentication:
                 f"Login failed: token update failed. RC: {response.status_code}"
             )
 
-    def login(self) -> Tuple[Dict, None]:
-        """login into DKB banking area and perform an sso redirect"""
-        logger.debug("Authentication.login()\n")
+    def _session_load(self) -> bool:
+        """restore a persisted session and check if it is still alive"""
+        logger.debug("Authentication._session_load()\n")
+
+        try:
+            with open(self.session_file, "r", encoding="utf8") as fh:
+                session_dic = json.load(fh)
+        except (OSError, ValueError) as err:
+            logger.debug("Authentication._session_load(): %s\n", err)
+            return False
+
+        if session_dic.get("user") != self.dkb_user:
+            logger.info("Persisted session belongs to a different user")
+            return False
+
+        if session_dic.get("expires", 0) <= time.time():
+            logger.info("Persisted session expired")
+            return False
+
+        client = requests.session()
+        client.headers = session_dic.get("headers", {})
+        client.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        client.hooks["response"].append(self.transfer_stats.hook)
+        # pool size, timeouts and retries (and the http cache if enabled)
+        client.mount("https://", self.transport)
+        if self.proxies:
+            client.proxies = self.proxies
+            client.verify = False  # NOSONAR
+        for cookie in session_dic.get("cookies", []):
+            client.cookies.set(**cookie)
+
+        # cheap request to check if the session is still valid
+        response = client.get(
+            self.base_url + "/config/users/me/product-display-settings",
+            # a cached answer does not prove anything
+            headers={"Cache-Control": "max-age=0"},
+        )
+        if response.status_code != 200:
+            logger.info(
+                "Persisted session is not valid anymore. RC: %s", response.status_code
+            )
+            return False
+
+        self.client = client
+        self.token_dic = session_dic.get("token_dic", {})
+        # store cookies which got refreshed by the probe
+        self._session_save(session_dic["expires"])
+
+        logger.debug("Authentication._session_load() ended\n")
+        return True
+
+    def _session_save(self, expires: float = None):
+        """persist session cookies and token to a file only readable by the owner"""
+        logger.debug("Authentication._session_save()\n")
+
+        if not expires:
+            try:
+                expires = time.time() + int(self.token_dic["expires_in"])
+            except (KeyError, TypeError, ValueError):
+                expires = time.time() + SESSION_TTL
+
+        session_dic = {
+            "user": self.dkb_user,
+            "expires": expires,
+            "headers": dict(self.client.headers),
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "secure": cookie.secure,
+                    "expires": cookie.expires,
+                }
+                for cookie in self.client.cookies
+            ],
+            "token_dic": self.token_dic,
+        }
+
+        tmp_file = None
+        try:
+            # mkstemp() creates the file with mode 0600
+            (fd, tmp_file) = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.session_file)),
+                prefix=f".{os.path.basename(self.session_file)}.",
+                suffix=".part",
+            )
+            with os.fdopen(fd, "w", encoding="utf8") as fh:
+                json.dump(session_dic, fh)
+            os.replace(tmp_file, self.session_file)
+        except (OSError, TypeError, ValueError) as err:
+            # a session which cannot be persisted must not break the login
+            logger.error("Unable to persist session to %s: %s", self.session_file, err)
+            if tmp_file and os.path.exists(tmp_file):
+                os.unlink(tmp_file)
+
+        logger.debug("Authentication._session_save() ended\n")
+
+    def _login_mfa(self):
+        """create a new session and complete the 2fa login"""
+        logger.debug("Authentication._login_mfa()\n")
 
         mfa_dic = {}
 
@@ -424,26 +589,93 @@ class Authentication:
                 "Login failed: 2nd factor authentication did not complete"
             )
 
+        logger.debug("Authentication._login_mfa() ended\n")
+
+    def _session(self):
+        """reuse a persisted session or perform a full login including 2fa"""
+        logger.debug("Authentication._session()\n")
+
+        if self.session_file and self._session_load():
+            logger.info("Reusing persisted session from %s", self.session_file)
+        else:
+            self._login_mfa()
+            if self.session_file:
+                self._session_save()
+
+        logger.debug("Authentication._session() ended\n")
+
+    def login(self) -> Tuple[Dict, None]:
+        """login into DKB banking area"""
+        logger.debug("Authentication.login()\n")
+
+        self._session()
+
         # get account overview
-        overview = Overview(client=self.client, unfiltered=self.unfiltered)
-        self.account_dic = overview.get()
+        self.account_dic = self.overview()
+        # the api calls after the login are sent as cors requests
+        self.client.headers.update(SSO_HEADERS)
 
-        # redirect to legacy page
-        self._sso_redirect()
         logger.debug("Authentication.login() ended\n")
         return self.account_dic, None
 
+    def overview(self) -> Dict:
+        """fetch the account overview and persist it as snapshot"""
+        logger.debug("Authentication.overview()\n")
+
+        overview = Overview(
+            client=self.client,
+            unfiltered=self.unfiltered,
+            max_workers=self.max_workers,
+        )
+        account_dic = overview.get()
+        self.latency_dic = overview.latency_dic
+        if self.snapshot_file and account_dic:
+            save_snapshot(self.snapshot_file, self.dkb_user, account_dic)
+
+        logger.debug("Authentication.overview() ended\n")
+        return account_dic
+
     def logout(self):
         """logout function"""
         logger.debug("Authentication.logout()\n")
 
+        if self.transfer_stats:
+            for endpoint, stats_dic in self.transfer_stats.summary().items():
+                logger.debug(
+                    "transfer %s: %s requests, %s bytes on the wire, %s bytes decoded, %.3fs, encodings: %s",
+                    endpoint,
+                    stats_dic["requests"],
+                    stats_dic["wire_bytes"],
+                    stats_dic["content_bytes"],
+                    stats_dic["read_time"],
+                    stats_dic["encodings"],
+                )
+        if self.cache_adapter:
+            logger.debug("http cache: %s", self.cache_adapter.stats())
+
 
 class APPAuthentication:
     """APPAuthentication class"""
 
-    def __init__(self, client: requests.Session, base_url: str = BASE_URL):
+    def __init__(
+        self,
+        client: requests.Session,
+        base_url: str = BASE_URL,
+        deadline: float = MFA_DEADLINE,
+        interval: float = 0.5,
+        max_interval: float = 5,
+        backoff: float = 1.5,
+    ):
         self.client = client
         self.base_url = base_url
+        self.deadline = deadline
+        # polling starts fast and backs off to max_interval
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        # upper bound of the time between confirmation and its detection
+        self.detection_latency = None
+        self.elapsed = None
 
     def _check(self, polling_dic: Dict[str, str], cnt: 1) -> bool:
         logger.debug("APPAuthentication._check()\n")
@@ -487,6 +719,16 @@ class APPAuthentication:
         logger.debug("APPAuthentication._check() ended with: %s\n", mfa_completed)
         return mfa_completed
 
+    def _intervals(self) -> Iterator[float]:
+        """polling intervals backing off exponentially until the deadline is reached"""
+        interval = self.interval
+        waited = 0
+        while waited < self.deadline:
+            interval = min(interval, self.deadline - waited)
+            yield interval
+            waited += interval
+            interval = min(interval * self.backoff, self.max_interval)
+
     def _print(self, devicename: str):
         """2fa confirmation message"""
         logger.debug("api.Wrapper._print()\n")
@@ -505,11 +747,13 @@ class APPAuthentication:
 
         cnt = 0
         mfa_completed = False
-        # we give us 50 seconds to press a button on the phone
-        while cnt <= 10:
+        intervals = self._intervals()
+        start = last_poll = time.monotonic()
+        while True:
             response = self.client.get(
                 self.base_url + f"/mfa/mfa/challenges/{challenge_id}"
             )
+            poll = time.monotonic()
             cnt += 1
             if response.status_code == 200:
                 polling_dic = response.json()
@@ -521,14 +765,28 @@ class APPAuthentication:
                     # check processing status
                     mfa_completed = self._check(polling_dic, cnt)
                     if mfa_completed:
+                        # confirmation happened after the previous poll
+                        self.detection_latency = poll - last_poll
                         break
                 else:
                     logger.error("error parsing polling response: %s", polling_dic)
             else:
                 logger.error("Polling request failed. RC: %s", response.status_code)
-            time.sleep(5)
+            last_poll = poll
 
-        logger.debug("APPAuthentication.finalize(): %s\n", mfa_completed)
+            interval = next(intervals, None)
+            if interval is None or time.monotonic() - start >= self.deadline:
+                break
+            time.sleep(interval)
+
+        self.elapsed = time.monotonic() - start
+        logger.debug(
+            "APPAuthentication.finalize(): %s after %s polls in %.2fs (detection latency: %s)\n",
+            mfa_completed,
+            cnt,
+            self.elapsed,
+            self.detection_latency,
+        )
         return mfa_completed
 
 
@@ -0,0 +1,215 @@
+""" Module providing a transport level http cache for rarely changing api endpoints """
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from dkb_robo.transport import TransportAdapter
+
+
+# seconds a response is considered fresh, matched against the end of the url path
+CACHE_TTL = {
+    "/config/users/me/product-display-settings": 3600,
+    "/customers/me/tax-exemptions": 3600,
+    "/accounts/payments/recurring-credit-transfers": 600,
+    "/broker/brokerage-accounts": 60,
+}
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """cache backend keeping the entries in a dictionary"""
+
+    def __init__(self):
+        self.entry_dic = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        """drop all entries"""
+        with self.lock:
+            self.entry_dic = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        """get an entry"""
+        with self.lock:
+            entry = self.entry_dic.get(key, None)
+            return dict(entry) if entry else None
+
+    def set(self, key: str, entry: Dict):
+        """store an entry"""
+        with self.lock:
+            self.entry_dic[key] = dict(entry)
+
+
+class DiskCache:
+    """cache backend keeping one json file per entry in a directory"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        """name of the file holding an entry"""
+        return os.path.join(
+            self.path, hashlib.sha256(key.encode("utf8")).hexdigest() + ".json"
+        )
+
+    def clear(self):
+        """drop all entries"""
+        for file_name in os.listdir(self.path):
+            if file_name.endswith(".json"):
+                os.remove(os.path.join(self.path, file_name))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """get an entry"""
+        try:
+            with open(self._file(key), "r", encoding="utf8") as fh:
+                entry = json.load(fh)
+            entry["content"] = base64.b64decode(entry["content"])
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            logger.debug("DiskCache.get(): %s\n", err)
+            return None
+        return entry
+
+    def set(self, key: str, entry: Dict):
+        """store an entry"""
+        entry = dict(entry, content=base64.b64encode(entry["content"]).decode("ascii"))
+        try:
+            # cached responses contain account data - keep them private (0600)
+            (tmp_fd, tmp_file) = tempfile.mkstemp(dir=self.path, prefix=".cache.")
+            with os.fdopen(tmp_fd, "w", encoding="utf8") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp_file, self._file(key))
+        except OSError as err:
+            logger.error("Unable to write cache entry to %s: %s", self.path, err)
+
+
+class CacheAdapter(TransportAdapter):
+    """transport adapter answering GET requests of known endpoints from a cache
+
+    responses are fresh for the ttl of their endpoint. Stale entries get
+    revalidated by a conditional request based on their ETag/Last-Modified
+    header. A "Cache-Control: max-age=0" request header forces a revalidation.
+    Entries are kept per scope (the login user) so a shared backend never
+    answers with the data of another user.
+    Requests reaching the network follow the TransportPolicy of the adapter.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        ttl_dic: Dict[str, int] = None,
+        scope: str = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttl_dic = ttl_dic if ttl_dic is not None else CACHE_TTL
+        self.scope = scope
+        self.stats_dic = {"hits": 0, "misses": 0, "revalidated": 0}
+        self.lock = threading.Lock()
+
+    def _count(self, counter: str):
+        """increase a hit/miss counter"""
+        with self.lock:
+            self.stats_dic[counter] += 1
+
+    def _response(
+        self, request: requests.PreparedRequest, entry: Dict
+    ) -> requests.Response:
+        """build a response from a cache entry"""
+        response = requests.Response()
+        response.status_code = entry["status_code"]
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry["content"]  # pylint: disable=w0212
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def _key(self, url: str) -> str:
+        """cache key of an url within the scope of the adapter"""
+        return f"{self.scope or ''} {url}"
+
+    def _ttl(self, url: str) -> Optional[int]:
+        """ttl of the endpoint or None if it must not be cached"""
+        path = urlsplit(url).path
+        for suffix, ttl in self.ttl_dic.items():
+            if path.endswith(suffix):
+                return ttl
+        return None
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream=False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ):
+        """answer from the cache or send the request and store the response"""
+        kwargs = {
+            "stream": stream,
+            "timeout": timeout,
+            "verify": verify,
+            "cert": cert,
+            "proxies": proxies,
+        }
+        ttl = self._ttl(request.url) if request.method == "GET" and not stream else None
+        if ttl is None:
+            return super().send(request, **kwargs)
+
+        key = self._key(request.url)
+        entry = self.backend.get(key)
+        revalidate = "max-age=0" in request.headers.get("Cache-Control", "")
+        if entry and not revalidate and entry["expires"] > time.time():
+            logger.debug("CacheAdapter.send(): hit %s\n", request.url)
+            self._count("hits")
+            return self._response(request, entry)
+
+        if entry:
+            header_dic = CaseInsensitiveDict(entry["headers"])
+            if "ETag" in header_dic:
+                request.headers["If-None-Match"] = header_dic["ETag"]
+            if "Last-Modified" in header_dic:
+                request.headers["If-Modified-Since"] = header_dic["Last-Modified"]
+
+        response = super().send(request, **kwargs)
+        if entry and response.status_code == 304:
+            logger.debug("CacheAdapter.send(): revalidated %s\n", request.url)
+            # hand the connection back to the pool, the entry answers instead
+            response.close()
+            self._count("revalidated")
+            entry["expires"] = time.time() + ttl
+            self.backend.set(key, entry)
+            return self._response(request, entry)
+
+        self._count("misses")
+        if response.status_code == 200:
+            self.backend.set(
+                key,
+                {
+                    "status_code": response.status_code,
+                    "headers": dict(response.headers),
+                    "content": response.content,
+                    "expires": time.time() + ttl,
+                },
+            )
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """copy of the hit/miss counters"""
+        with self.lock:
+            return dict(self.stats_dic)
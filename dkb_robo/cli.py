@@ -1,21 +1,27 @@
-# pylint: disable=c3001, e1101, r0913, w0108, w0622
+# pylint: disable=c0415, c3001, e1101, r0913, w0108, w0622
 """ dkb_robo cli """
+from dataclasses import is_dataclass
 from datetime import date
 from pathlib import Path
 import pathlib
 from pprint import pprint
 import sys
-import csv
-import json
-import tabulate
 import click
 import dkb_robo
-from dkb_robo.utilities import object2dictionary
+from dkb_robo.snapshot import load_snapshot
+from dkb_robo.utilities import dataclass_fields, object2dictionary
 
 sys.path.append("..")
 
 DATE_FORMAT = "%d.%m.%Y"
 DATE_FORMAT_ALTERNATE = "%Y-%m-%d"
+# rows written between two flushes of streamed output
+FLUSH_ROWS = 100
+# commands living in other modules, imported when they get invoked
+LAZY_COMMANDS = {
+    "export": "dkb_robo.cli_sync:export",
+    "sync": "dkb_robo.cli_sync:sync",
+}
 
 
 def _account_lookup(ctx, name, account, account_dic, unfiltered):
@@ -62,6 +68,28 @@ def _account_lookup(ctx, name, account, account_dic, unfiltered):
     return filtered_accounts[0]
 
 
+def _field_list(ctx, fields, atype, unfiltered):
+    """parse the comma separated --fields of a transaction type"""
+    if not fields:
+        return None
+    if unfiltered:
+        raise click.UsageError("--fields cannot be combined with --unfiltered.", ctx)
+
+    from dkb_robo.transaction import transaction_fields
+
+    field_list = list(
+        dict.fromkeys(ele.strip() for ele in fields.split(",") if ele.strip())
+    )
+    known_list = transaction_fields(atype) or []
+    unknown_list = [ele for ele in field_list if ele not in known_list]
+    if unknown_list:
+        raise click.UsageError(
+            f"Unknown fields: {', '.join(unknown_list)}. Choose from: {', '.join(known_list)}",
+            ctx,
+        )
+    return field_list
+
+
 def _id_lookup(ctx, name, account, account_dic, unfiltered):
     """lookup id"""
     the_account = _account_lookup(ctx, name, account, account_dic, unfiltered)
@@ -91,7 +119,22 @@ def _transactionlink_lookup(ctx, name, account, account_dic, unfiltered):
     return output_dic
 
 
-@click.group()
+class LazyGroup(click.Group):
+    """command group importing the modules of LAZY_COMMANDS on first use"""
+
+    def list_commands(self, ctx):
+        return sorted([*super().list_commands(ctx), *LAZY_COMMANDS])
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in LAZY_COMMANDS:
+            import importlib
+
+            (module, name) = LAZY_COMMANDS[cmd_name].split(":")
+            return getattr(importlib.import_module(module), name)
+        return super().get_command(ctx, cmd_name)
+
+
+@click.group(cls=LazyGroup)
 @click.option(
     "--debug",
     "-d",
@@ -147,16 +190,96 @@ def _transactionlink_lookup(ctx, name, account, account_dic, unfiltered):
     help="corresponding login password",
     envvar="DKB_PASSWORD",
 )
+@click.option(
+    "--max-workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of parallel API requests",
+    envvar="DKB_MAX_WORKERS",
+)
+@click.option(
+    "--session-file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="File to persist the authenticated session to and reuse it on the next run",
+    envvar="DKB_SESSION_FILE",
+)
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory to cache rarely changing API responses in",
+    envvar="DKB_CACHE_DIR",
+)
+@click.option(
+    "--snapshot-file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="File to store the account overview in after each login",
+    envvar="DKB_SNAPSHOT_FILE",
+)
+@click.option(
+    "--timeout",
+    default=30.0,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds to wait for a response of the DKB API",
+    envvar="DKB_TIMEOUT",
+)
+@click.option(
+    "--deadline",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds a command may spend talking to the DKB API after the login",
+    envvar="DKB_DEADLINE",
+)
+@click.option(
+    "--retries",
+    default=3,
+    type=click.IntRange(min=0),
+    help="Number of retries of failed read requests (429/5xx responses, network errors)",
+    envvar="DKB_RETRIES",
+)
+@click.option(
+    "--server",
+    default=None,
+    type=str,
+    help='URL of a running "dkb serve" instance to send the requests to instead of logging in',
+    envvar="DKB_SERVER",
+)
+@click.option(
+    "--token-file",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help='File the access token of "dkb serve" is kept in (default: ~/.dkb_robo_server.token)',
+    envvar="DKB_SERVER_TOKEN_FILE",
+)
 @click.option(
     "--format",
     default="pprint",
-    type=click.Choice(["pprint", "table", "csv", "json"]),
+    type=click.Choice(["pprint", "table", "csv", "json", "ndjson"]),
     help="output format to use",
     envvar="DKB_FORMAT",
 )
 @click.pass_context
 def main(
-    ctx, debug, unfiltered, mfa_device, use_tan, chip_tan, username, password, format
+    ctx,
+    debug,
+    unfiltered,
+    mfa_device,
+    use_tan,
+    chip_tan,
+    username,
+    password,
+    max_workers,
+    session_file,
+    cache_dir,
+    snapshot_file,
+    timeout,
+    deadline,
+    retries,
+    server,
+    token_file,
+    format,
 ):  # pragma: no cover
     """main fuunction"""
 
@@ -166,6 +289,9 @@ def main(
             err=True,
         )
         chip_tan = True
+    if server and unfiltered:
+        # the server answers with json, the item objects are not rebuilt by the client
+        raise click.UsageError("--unfiltered cannot be combined with --server.", ctx)
     ctx.ensure_object(dict)
     ctx.obj["DEBUG"] = debug
     ctx.obj["UNFILTERED"] = unfiltered
@@ -173,25 +299,63 @@ def main(
     ctx.obj["MFA_DEVICE"] = mfa_device
     ctx.obj["USERNAME"] = username
     ctx.obj["PASSWORD"] = password
+    ctx.obj["MAX_WORKERS"] = max_workers
+    ctx.obj["SESSION_FILE"] = session_file
+    ctx.obj["CACHE_DIR"] = cache_dir
+    ctx.obj["SNAPSHOT_FILE"] = snapshot_file
+    ctx.obj["TIMEOUT"] = timeout
+    ctx.obj["DEADLINE"] = deadline
+    ctx.obj["RETRIES"] = retries
+    ctx.obj["SERVER"] = server
+    ctx.obj["TOKEN_FILE"] = token_file
     ctx.obj["FORMAT"] = _load_format(format)
 
 
 @main.command()
 @click.pass_context
-def accounts(ctx):
+@click.option(
+    "--stale-ok",
+    default=False,
+    is_flag=True,
+    help="Print the stored snapshot (see --snapshot-file) right away and refresh it afterwards, the refresh blocks until the login (including MFA) is done",
+    envvar="DKB_STALE_OK",
+)
+@click.option(
+    "--max-age",
+    default=3600,
+    type=click.IntRange(min=0),
+    help="Maximum age in seconds of a snapshot printed with --stale-ok",
+    envvar="DKB_MAX_AGE",
+)
+@click.option(
+    "--refresh/--no-refresh",
+    default=True,
+    help="Log in to refresh the snapshot printed with --stale-ok",
+    envvar="DKB_REFRESH",
+)
+def accounts(ctx, stale_ok, max_age, refresh):
     """get list of account"""
     try:
-        with _login(ctx) as dkb:
-            accounts_dict = dkb.account_dic
-            for id, value in accounts_dict.items():
-                if ctx.obj["UNFILTERED"]:
-                    value = object2dictionary(value)
-                    accounts_dict[id] = value
-                if "details" in value:
-                    del value["details"]
-                if "transactions" in value:
-                    del value["transactions"]
-            ctx.obj["FORMAT"](list(accounts_dict.values()))
+        snapshot = None
+        if stale_ok and ctx.obj.get("SNAPSHOT_FILE"):
+            snapshot = load_snapshot(
+                ctx.obj["SNAPSHOT_FILE"], ctx.obj["USERNAME"], max_age
+            )
+        if snapshot:
+            (accounts_dict, age) = snapshot
+            click.echo(f"Snapshot is {age:.0f} seconds old", err=True)
+            # snapshots contain dictionaries only
+            _print_accounts(ctx, accounts_dict, False)
+            # the snapshot must be visible while the login is still running
+            sys.stdout.flush()
+            if refresh and not ctx.obj.get("SERVER"):
+                # the login stores a fresh snapshot for the next run, it runs in
+                # the foreground and waits for the MFA like any other login
+                with _login(ctx):
+                    pass
+        else:
+            with _login(ctx) as dkb:
+                _print_accounts(ctx, dkb.account_dic, ctx.obj["UNFILTERED"])
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
 
@@ -230,24 +394,86 @@ def accounts(ctx):
     type=click.DateTime(formats=[DATE_FORMAT, DATE_FORMAT_ALTERNATE]),
     default=date.today().strftime(DATE_FORMAT),
 )
+@click.option(
+    "--backfill",
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Fetch the date range in parallel monthly windows (not with --store)",
+    envvar="DKB_TRANSACTIONS_BACKFILL",
+)
+@click.option(
+    "--store",
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    default=None,
+    help="SQLite file to keep transactions in; only newer bookings get fetched",
+    envvar="DKB_TRANSACTIONS_STORE",
+)
+@click.option(
+    "--fields",
+    "-f",
+    type=str,
+    default=None,
+    help="Comma separated columns to fetch (e.g. bdate,amount); others are not parsed",
+    envvar="DKB_TRANSACTIONS_FIELDS",
+)
 def transactions(
-    ctx, name, account, transaction_type, date_from, date_to
+    ctx, name, account, transaction_type, date_from, date_to, backfill, store, fields
 ):  # pragma: no cover
     """get list of transactions"""
+    if store and backfill:
+        # the store fetches the bookings newer than its latest one only
+        raise click.UsageError("--backfill cannot be combined with --store.", ctx)
 
     try:
         with _login(ctx) as dkb:
             the_account = _transactionlink_lookup(
                 ctx, name, account, dkb.account_dic, ctx.obj["UNFILTERED"]
             )
-            transactions_list = dkb.get_transactions(
-                the_account["transactions"],
-                the_account["type"],
-                date_from.strftime(DATE_FORMAT),
-                date_to.strftime(DATE_FORMAT),
-                transaction_type=transaction_type,
+            field_list = _field_list(
+                ctx, fields, the_account["type"], ctx.obj["UNFILTERED"]
+            )
+            if store:
+                from dkb_robo.store import TransactionStore
+
+                with TransactionStore(store) as transaction_store:
+                    transactions_list = dkb.sync_transactions(
+                        transaction_store,
+                        the_account["id"],
+                        the_account["transactions"],
+                        the_account["type"],
+                        date_from.strftime(DATE_FORMAT),
+                        date_to.strftime(DATE_FORMAT),
+                        transaction_type=transaction_type,
+                    )
+                if field_list:
+                    # the store keeps complete rows
+                    transactions_list = [
+                        {key: row[key] for key in field_list if key in row}
+                        for row in transactions_list
+                    ]
+            else:
+                if backfill:
+                    get_transactions = dkb.backfill_transactions
+                else:
+                    # rows get printed while further pages are fetched
+                    get_transactions = dkb.iter_transactions
+                transactions_list = get_transactions(
+                    the_account["transactions"],
+                    the_account["type"],
+                    date_from.strftime(DATE_FORMAT),
+                    date_to.strftime(DATE_FORMAT),
+                    transaction_type=transaction_type,
+                    fields=field_list,
+                )
+
+            from dkb_robo.transaction import transaction_fields
+
+            ctx.obj["FORMAT"](
+                transactions_list,
+                fieldnames=field_list
+                or transaction_fields(the_account["type"], ctx.obj["UNFILTERED"]),
             )
-            ctx.obj["FORMAT"](transactions_list)
 
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
@@ -259,7 +485,9 @@ def last_login(ctx):
     """get last login"""
     try:
         with _login(ctx) as dkb:
-            ctx.obj["FORMAT"]([{"last_login": dkb.last_login}])
+            ctx.obj["FORMAT"](
+                [{"last_login": dkb.last_login}], fieldnames=["last_login"]
+            )
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
 
@@ -272,7 +500,7 @@ def credit_limits(ctx):
         with _login(ctx) as dkb:
             limits = dkb.get_credit_limits()
             limits = [{"account": k, "limit": v} for k, v in limits.items()]
-            ctx.obj["FORMAT"](limits)
+            ctx.obj["FORMAT"](limits, fieldnames=["account", "limit"])
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
 
@@ -305,7 +533,12 @@ def standing_orders(ctx, name, account):  # pragma: no cover
                     standing_orders_list.append(object2dictionary(so))
                 else:
                     standing_orders_list.append(so)
-            ctx.obj["FORMAT"](standing_orders_list)
+            from dkb_robo.standingorder import StandingOrderItem
+
+            ctx.obj["FORMAT"](
+                standing_orders_list,
+                fieldnames=dataclass_fields([StandingOrderItem], ctx.obj["UNFILTERED"]),
+            )
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
 
@@ -358,7 +591,9 @@ def scan_postbox(ctx, path, download_all, archive, prepend_date):
                     documents_list.append(object2dictionary(doc))
             else:
                 documents_list = doc_list
-            ctx.obj["FORMAT"](documents_list)
+            ctx.obj["FORMAT"](
+                documents_list, fieldnames=_document_fields(ctx.obj["UNFILTERED"])
+            )
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
 
@@ -413,6 +648,22 @@ def scan_postbox(ctx, path, download_all, archive, prepend_date):
     help="Only list documents, do not download",
     envvar="DKB_LIST_ONLY",
 )
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=1,
+    help="Number of parallel downloads",
+    envvar="DKB_DOWNLOAD_CONCURRENCY",
+)
+@click.option(
+    "--rate",
+    type=click.FloatRange(min=0),
+    show_default=True,
+    default=2.0,
+    help="Maximum number of downloads per second (0 disables rate limiting)",
+    envvar="DKB_DOWNLOAD_RATE",
+)
 def download(
     ctx,
     path: Path,
@@ -421,6 +672,8 @@ def download(
     mark_read: bool,
     use_account_folders: bool,
     list_only: bool,
+    concurrency: int,
+    rate: float,
 ):
     """download document"""
     if path is None:
@@ -435,50 +688,215 @@ def download(
                     mark_read=mark_read,
                     use_account_folders=use_account_folders,
                     list_only=list_only,
-                )
+                    concurrency=concurrency,
+                    rate=rate,
+                ),
+                fieldnames=_document_fields(ctx.obj["UNFILTERED"]),
+            )
+    except dkb_robo.DKBRoboError as _err:
+        click.echo(_err.args[0], err=True)
+
+
+@main.command()
+@click.pass_context
+@click.option(
+    "--port",
+    type=click.IntRange(min=0, max=65535),
+    show_default=True,
+    default=8765,
+    help="Port to listen on",
+    envvar="DKB_SERVE_PORT",
+)
+@click.option(
+    "--keepalive",
+    type=click.IntRange(min=1),
+    show_default=True,
+    default=60,
+    help="Seconds between keepalive requests to the DKB API",
+    envvar="DKB_SERVE_KEEPALIVE",
+)
+@click.option(
+    "--download-dir",
+    type=click.Path(file_okay=False, path_type=pathlib.Path),
+    show_default=True,
+    default=".",
+    help="Directory documents requested via the api get downloaded to",
+    envvar="DKB_SERVE_DOWNLOAD_DIR",
+)
+def serve(ctx, port, keepalive, download_dir):  # pragma: no cover
+    """login once and serve requests via a local json api"""
+    from dkb_robo.server import Server
+
+    try:
+        with _login(ctx) as dkb:
+            server = Server(
+                dkb,
+                port=port,
+                keepalive=keepalive,
+                token_file=ctx.obj.get("TOKEN_FILE"),
+                download_dir=download_dir,
             )
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                click.echo("shutting down", err=True)
     except dkb_robo.DKBRoboError as _err:
         click.echo(_err.args[0], err=True)
 
 
-class DataclassJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if dataclasses.is_dataclass(obj):
-            return dataclasses.asdict(obj)
-        return super().default(obj)
+def _document_fields(unfiltered):
+    """columns of the postbox documents (categories unless unfiltered)"""
+    if unfiltered:
+        from dkb_robo.postbox import PostboxItem
+
+        return dataclass_fields([PostboxItem], unfiltered)
+    return ["documents", "count"]
+
+
+def _flush(row_count):
+    """flush streamed output after the first row and every FLUSH_ROWS rows"""
+    if row_count == 1 or row_count % FLUSH_ROWS == 0:
+        sys.stdout.flush()
+
+
+def _json_default(obj):
+    """serialize dataclasses in json output"""
+    import dataclasses
+
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _row(row):
+    """rows of unfiltered output are dataclasses"""
+    return object2dictionary(row) if is_dataclass(row) else row
+
+
+def _rows(data):
+    """materialize an iterator of rows, lists and dictionaries are kept as they are"""
+    return data if isinstance(data, (dict, list)) else list(data)
+
+
+def _values(data):
+    """rows of a dictionary are its values"""
+    return data.values() if isinstance(data, dict) else data
+
+
+def _csv_formatter(data, fieldnames=None):
+    """write the rows as csv while the iterator produces them"""
+    import csv
+    import itertools
+
+    row_iter = (_row(row) for row in _values(data))
+    if fieldnames is None:
+        # without a declared header the first row defines the columns
+        first_row = next(row_iter, None)
+        if first_row is None:
+            return
+        fieldnames = list(first_row)
+        row_iter = itertools.chain([first_row], row_iter)
+    writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    for row_count, row in enumerate(row_iter, start=1):
+        writer.writerow(row)
+        _flush(row_count)
+    sys.stdout.flush()
+
+
+def _json_formatter(data, fieldnames=None):  # pylint: disable=w0613
+    """print the rows as json document"""
+    import json
+
+    click.echo(json.dumps(_rows(data), indent=2, default=_json_default))
+
+
+def _ndjson_formatter(data, fieldnames=None):  # pylint: disable=w0613
+    """write one json object per row while the iterator produces them"""
+    import json
+
+    for row_count, row in enumerate(_values(data), start=1):
+        sys.stdout.write(json.dumps(row, default=_json_default) + "\n")
+        _flush(row_count)
+    sys.stdout.flush()
+
+
+def _pprint_formatter(data, fieldnames=None):  # pylint: disable=w0613
+    """pretty print the rows"""
+    pprint(_rows(data))
+
+
+def _table_formatter(data, fieldnames=None):  # pylint: disable=w0613
+    """print the rows as table"""
+    import tabulate
+
+    click.echo(tabulate.tabulate(_rows(data), headers="keys", tablefmt="grid"))
 
 
 def _load_format(output_format):
-    """select output format based on cli option"""
+    """select output format based on cli option
+
+    renderers get imported on first use to keep the startup of the cli fast.
+    Formatters take a list or an iterator of rows and optionally the names of
+    the columns; csv and ndjson write the rows while the iterator produces them.
+    """
     if output_format == "pprint":
-        return lambda data: pprint(data)
+        return _pprint_formatter
 
     if output_format == "table":
-        return lambda data: click.echo(
-            tabulate.tabulate(data, headers="keys", tablefmt="grid")
-        )
+        return _table_formatter
 
     if output_format == "csv":
-
-        def formatter(data):  # pragma: no cover
-            if len(data) == 0:
-                return
-            writer = csv.DictWriter(sys.stdout, fieldnames=max(data, key=len).keys())
-            writer.writeheader()
-            writer.writerows(data)
-
-        return formatter
+        return _csv_formatter
 
     if output_format == "json":
+        return _json_formatter
 
-        return lambda data: click.echo(
-            json.dumps(data, indent=2, cls=DataclassJSONEncoder)
-        )
+    if output_format == "ndjson":
+        return _ndjson_formatter
 
     raise ValueError(f"Unknown format: {output_format}")
 
 
+def _print_accounts(ctx, accounts_dict, unfiltered):
+    """print the account overview without details and transaction links"""
+    for id, value in accounts_dict.items():
+        if unfiltered:
+            value = object2dictionary(value)
+            accounts_dict[id] = value
+        if "details" in value:
+            del value["details"]
+        if "transactions" in value:
+            del value["transactions"]
+
+    from dkb_robo.portfolio import AccountItem, CardItem, DepotItem
+
+    column_list = dataclass_fields([AccountItem, CardItem, DepotItem], unfiltered)
+    if not unfiltered:
+        column_list.append("productgroup")
+    ctx.obj["FORMAT"](
+        list(accounts_dict.values()),
+        fieldnames=[
+            ele for ele in column_list if ele not in ("details", "transactions")
+        ],
+    )
+
+
 def _login(ctx):
+    if ctx.obj.get("SERVER"):
+        from dkb_robo.server import Client
+
+        # thin client to a running server keeping the session
+        return Client(ctx.obj["SERVER"], token_file=ctx.obj.get("TOKEN_FILE"))
+
+    from dkb_robo.cache import DiskCache
+    from dkb_robo.transport import TransportPolicy
+
+    transport_policy = TransportPolicy(
+        read_timeout=ctx.obj.get("TIMEOUT") or 30.0,
+        deadline=ctx.obj.get("DEADLINE"),
+        retries=ctx.obj.get("RETRIES", 3),
+    )
     return dkb_robo.DKBRobo(
         dkb_user=ctx.obj["USERNAME"],
         dkb_password=ctx.obj["PASSWORD"],
@@ -486,4 +904,11 @@ def _login(ctx):
         debug=ctx.obj["DEBUG"],
         unfiltered=ctx.obj["UNFILTERED"],
         mfa_device=ctx.obj["MFA_DEVICE"],
+        max_workers=ctx.obj["MAX_WORKERS"],
+        session_file=ctx.obj["SESSION_FILE"],
+        http_cache=DiskCache(ctx.obj["CACHE_DIR"])
+        if ctx.obj.get("CACHE_DIR")
+        else None,
+        snapshot_file=ctx.obj.get("SNAPSHOT_FILE"),
+        transport_policy=transport_policy,
     )
@@ -0,0 +1,303 @@
+# pylint: disable=c0415, r0913
+""" dkb_robo cli commands fetching several accounts within one login """
+from datetime import date
+from pathlib import Path
+import pathlib
+import click
+import dkb_robo
+from dkb_robo.cli import (
+    DATE_FORMAT,
+    DATE_FORMAT_ALTERNATE,
+    _account_lookup,
+    _login,
+)
+
+# export file formats derived from the file suffix
+EXPORT_SUFFIXES = {
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".parquet": "parquet",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+}
+
+
+@click.command()
+@click.pass_context
+@click.option(
+    "--all",
+    "all_accounts",
+    is_flag=True,
+    default=False,
+    help="Fetch the transactions of all accounts, cards and depots",
+    envvar="DKB_SYNC_ALL",
+)
+@click.option(
+    "--name",
+    "-n",
+    type=str,
+    help="Name of the account to fetch transactions for",
+    envvar="DKB_TRANSACTIONS_ACCOUNT_NAME",
+)
+@click.option(
+    "--account",
+    "-a",
+    type=str,
+    help="Account to fetch transactions for",
+    envvar="DKB_TRANSACTIONS_ACCOUNT",
+)
+@click.option(
+    "--transaction-type",
+    "-t",
+    default="booked",
+    type=click.Choice(["booked", "reserved"]),
+    help="The type of transactions to fetch",
+    envvar="DKB_TRANSACTIONS_TYPE",
+)
+@click.option(
+    "--date-from",
+    type=click.DateTime(formats=[DATE_FORMAT, DATE_FORMAT_ALTERNATE]),
+    default=date.today().strftime(DATE_FORMAT),
+)
+@click.option(
+    "--date-to",
+    type=click.DateTime(formats=[DATE_FORMAT, DATE_FORMAT_ALTERNATE]),
+    default=date.today().strftime(DATE_FORMAT),
+)
+def sync(ctx, all_accounts, name, account, transaction_type, date_from, date_to):
+    """get transactions of several accounts within one login"""
+
+    if not all_accounts and name is None and account is None:
+        raise click.UsageError(
+            "One of --all, --name or --account must be provided.", ctx
+        )
+
+    failed = False
+    try:
+        with _login(ctx) as dkb:
+            if all_accounts:
+                account_dic = dkb.account_dic
+            else:
+                account_dic = {
+                    0: _account_lookup(
+                        ctx, name, account, dkb.account_dic, ctx.obj["UNFILTERED"]
+                    )
+                }
+            transaction_dic = dkb.get_all_transactions(
+                account_dic,
+                date_from.strftime(DATE_FORMAT),
+                date_to.strftime(DATE_FORMAT),
+                transaction_type=transaction_type,
+            )
+            stream_dic = {}
+            for acc, result in transaction_dic.items():
+                if result["error"]:
+                    failed = True
+                    click.echo(f"{acc}: {result['error']}", err=True)
+                    continue
+                click.echo(
+                    f"{acc} ({result['type']}): {len(result['transactions'])} transactions",
+                    err=True,
+                )
+                stream_dic[acc] = result["transactions"]
+
+            from dkb_robo.transaction import merge_transactions, transaction_fields
+
+            fieldnames = ["account"]
+            for result in transaction_dic.values():
+                fieldnames.extend(
+                    transaction_fields(result["type"], ctx.obj["UNFILTERED"]) or []
+                )
+            # one feed tagged with the account, newest first like the api answers
+            ctx.obj["FORMAT"](
+                merge_transactions(stream_dic, reverse=True),
+                fieldnames=list(dict.fromkeys(fieldnames)),
+            )
+    except dkb_robo.DKBRoboError as _err:
+        click.echo(_err.args[0], err=True)
+        failed = True
+
+    if failed:
+        ctx.exit(1)
+
+
+@click.command()
+@click.pass_context
+@click.option(
+    "--model",
+    "-M",
+    default="transactions",
+    show_default=True,
+    type=click.Choice(
+        ["transactions", "positions", "accounts", "standing-orders", "postbox"]
+    ),
+    help="Data to export",
+    envvar="DKB_EXPORT_MODEL",
+)
+@click.option(
+    "--output",
+    "-o",
+    required=True,
+    type=click.Path(dir_okay=False, path_type=pathlib.Path),
+    help="File to write to",
+    envvar="DKB_EXPORT_OUTPUT",
+)
+@click.option(
+    "--file-format",
+    default=None,
+    type=click.Choice(["parquet", "arrow", "sqlite"]),
+    help="Format of the output file (default: derived from its suffix)",
+    envvar="DKB_EXPORT_FORMAT",
+)
+@click.option(
+    "--append",
+    is_flag=True,
+    default=False,
+    help="Append to the table of a sqlite file instead of replacing its rows",
+    envvar="DKB_EXPORT_APPEND",
+)
+@click.option(
+    "--name",
+    "-n",
+    type=str,
+    help="Name of the account to export (default: all accounts)",
+    envvar="DKB_TRANSACTIONS_ACCOUNT_NAME",
+)
+@click.option(
+    "--account",
+    "-a",
+    type=str,
+    help="Account to export (default: all accounts)",
+    envvar="DKB_TRANSACTIONS_ACCOUNT",
+)
+@click.option(
+    "--transaction-type",
+    "-t",
+    default="booked",
+    type=click.Choice(["booked", "reserved"]),
+    help="The type of transactions to fetch",
+    envvar="DKB_TRANSACTIONS_TYPE",
+)
+@click.option(
+    "--date-from",
+    type=click.DateTime(formats=[DATE_FORMAT, DATE_FORMAT_ALTERNATE]),
+    default=date.today().strftime(DATE_FORMAT),
+)
+@click.option(
+    "--date-to",
+    type=click.DateTime(formats=[DATE_FORMAT, DATE_FORMAT_ALTERNATE]),
+    default=date.today().strftime(DATE_FORMAT),
+)
+def export(
+    ctx,
+    model,
+    output,
+    file_format,
+    append,
+    name,
+    account,
+    transaction_type,
+    date_from,
+    date_to,
+):
+    """export typed data to a parquet, arrow ipc or sqlite file"""
+    if file_format is None:
+        file_format = EXPORT_SUFFIXES.get(output.suffix.lower())
+        if file_format is None:
+            raise click.UsageError(
+                f"Cannot derive the file format from '{output.name}', use --file-format.",
+                ctx,
+            )
+    if append and file_format != "sqlite":
+        raise click.UsageError("--append requires a sqlite file.", ctx)
+
+    from dkb_robo.export import export as export_rows
+
+    failed = False
+    try:
+        with _login(ctx) as dkb:
+            # the export is built from the formatted rows
+            account_dic = {
+                uid: acc.format() if hasattr(acc, "format") else acc
+                for uid, acc in dkb.account_dic.items()
+            }
+            if name is not None or account is not None:
+                account_dic = {
+                    0: _account_lookup(ctx, name, account, account_dic, False)
+                }
+            error_list = []
+            row_count = export_rows(
+                model.replace("-", "_"),
+                _export_rows(
+                    dkb,
+                    model,
+                    account_dic,
+                    date_from.strftime(DATE_FORMAT),
+                    date_to.strftime(DATE_FORMAT),
+                    transaction_type,
+                    error_list,
+                ),
+                output,
+                file_format,
+                append=append,
+            )
+            for error in error_list:
+                click.echo(error, err=True)
+            failed = bool(error_list)
+            click.echo(f"{row_count} rows written to {output}", err=True)
+    except dkb_robo.DKBRoboError as _err:
+        click.echo(_err.args[0], err=True)
+        failed = True
+    except ImportError as _err:
+        click.echo(str(_err), err=True)
+        failed = True
+
+    if failed:
+        ctx.exit(1)
+
+
+def _export_rows(
+    dkb, model, account_dic, date_from, date_to, transaction_type, error_list
+):
+    """formatted rows of a model, failures get appended to error_list"""
+    if model == "accounts":
+        yield from account_dic.values()
+    elif model in ("transactions", "positions"):
+        from dkb_robo.transaction import merge_transactions
+
+        depot = model == "positions"
+        transaction_dic = dkb.get_all_transactions(
+            {
+                uid: acc
+                for uid, acc in account_dic.items()
+                if (acc.get("type") == "depot") is depot
+            },
+            date_from,
+            date_to,
+            transaction_type=transaction_type,
+            unfiltered=False,
+        )
+        stream_dic = {}
+        for acc, result in transaction_dic.items():
+            if result["error"]:
+                error_list.append(f"{acc}: {result['error']}")
+            else:
+                stream_dic[acc] = result["transactions"]
+        yield from merge_transactions(stream_dic, reverse=True)
+    elif model == "standing-orders":
+        for acc in account_dic.values():
+            if acc.get("type") != "account":
+                continue
+            for standing_order in dkb.get_standing_orders(acc["id"], unfiltered=False):
+                yield {"account": acc["account"], **standing_order}
+    else:
+        from dkb_robo.export import postbox_documents
+
+        # list the documents without downloading them
+        yield from postbox_documents(
+            dkb.download(
+                path=Path("."), download_all=True, list_only=True, unfiltered=False
+            )
+        )
@@ -1,23 +1,71 @@
 # pylint: disable=c0415, r0913
 """ dkb internet banking automation library """
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import inspect
 from pathlib import Path
-import time
 from dkb_robo.postbox import PostBox
 from dkb_robo.authentication import Authentication
 from dkb_robo.exemptionorder import ExemptionOrders
 from dkb_robo.standingorder import StandingOrders
+from dkb_robo.store import TransactionStore
 from dkb_robo.transaction import Transactions
-from dkb_robo.utilities import logger_setup, validate_dates, get_dateformat
+from dkb_robo.transport import TransportAdapter
+from dkb_robo.utilities import (
+    RateLimiter,
+    logger_setup,
+    validate_dates,
+    get_dateformat,
+)
 
 
 LEGACY_DATE_FORMAT, API_DATE_FORMAT = get_dateformat()
+# product types offering transactions (accounts, credit cards) or positions (depots)
+TRANSACTION_TYPES = (
+    "account",
+    "creditcard",
+    "creditCard",
+    "depot",
+    "brokerageAccount",
+)
 
 
 class DKBRoboError(Exception):
     """dkb-robo exception class"""
 
 
+def _operation(method):
+    """run an exported method within the deadline of the transport policy"""
+
+    def _transport(dkb):
+        transport = getattr(dkb.wrapper, "transport", None)
+        return transport if isinstance(transport, TransportAdapter) else None
+
+    if inspect.isgeneratorfunction(method):
+
+        @functools.wraps(method)
+        def _generator(self, *args, **kwargs):
+            transport = _transport(self)
+            if transport is None:
+                yield from method(self, *args, **kwargs)
+            else:
+                with transport.operation():
+                    yield from method(self, *args, **kwargs)
+
+        return _generator
+
+    @functools.wraps(method)
+    def _wrapped(self, *args, **kwargs):
+        transport = _transport(self)
+        if transport is None:
+            return method(self, *args, **kwargs)
+        with transport.operation():
+            return method(self, *args, **kwargs)
+
+    return _wrapped
+
+
 class DKBRobo(object):
     """dkb_robo class"""
 
@@ -32,6 +80,12 @@ class DKBRobo(object):
     tan_insert = False
     chip_tan = False
     logger = None
+    http_cache = None
+    max_workers = 1
+    mfa_deadline = 55
+    session_file = None
+    snapshot_file = None
+    transport_policy = None
     wrapper = None
     unfiltered = False
 
@@ -45,6 +99,12 @@ class DKBRobo(object):
         mfa_device=None,
         chip_tan=False,
         unfiltered=False,
+        max_workers=1,
+        session_file=None,
+        mfa_deadline=55,
+        http_cache=None,
+        snapshot_file=None,
+        transport_policy=None,
     ):
         self.dkb_user = dkb_user
         self.dkb_password = dkb_password
@@ -54,9 +114,28 @@ class DKBRobo(object):
         self.logger = logger_setup(debug)
         self.mfa_device = mfa_device
         self.unfiltered = unfiltered
+        self.max_workers = max_workers
+        self.session_file = session_file
+        self.mfa_deadline = mfa_deadline
+        self.http_cache = http_cache
+        self.snapshot_file = snapshot_file
+        self.transport_policy = transport_policy
 
     def __enter__(self):
         """Makes DKBRobo a Context Manager"""
+        self.wrapper = self._authentication(Authentication)
+
+        # login and get the account overview
+        (self.account_dic, self.last_login) = self.wrapper.login()
+
+        return self
+
+    def __exit__(self, *args):
+        """Close the connection at the end of the context"""
+        self.wrapper.logout()
+
+    def _authentication(self, auth_class):
+        """check the login options and create the authentication object"""
         # tan usage requires legacy login
         if self.tan_insert:
             self.logger.info(
@@ -72,24 +151,21 @@ class DKBRobo(object):
         if self.mfa_device == "m":
             self.mfa_device = 1
 
-        self.wrapper = Authentication(
+        return auth_class(
             dkb_user=self.dkb_user,
             dkb_password=self.dkb_password,
             proxies=self.proxies,
             chip_tan=self.chip_tan,
             mfa_device=self.mfa_device,
             unfiltered=self.unfiltered,
+            max_workers=self.max_workers,
+            session_file=self.session_file,
+            mfa_deadline=self.mfa_deadline,
+            http_cache=self.http_cache,
+            snapshot_file=self.snapshot_file,
+            transport_policy=self.transport_policy,
         )
 
-        # login and get the account overview
-        (self.account_dic, self.last_login) = self.wrapper.login()
-
-        return self
-
-    def __exit__(self, *args):
-        """Close the connection at the end of the context"""
-        self.wrapper.logout()
-
     def _accounts_by_id(self):
         self.logger.debug("DKBRobo._accounts_by_id()\n")
 
@@ -114,6 +190,137 @@ class DKBRobo(object):
         )
         return accounts_by_id
 
+    def _unfiltered(self, unfiltered=None):
+        """per call setting of unfiltered falling back to the one of the instance"""
+        return self.unfiltered if unfiltered is None else unfiltered
+
+    def _transaction_sources(self, account_dic, unfiltered=None):
+        """list account number, type and transaction url of the products offering transactions"""
+        self.logger.debug("DKBRobo._transaction_sources()\n")
+
+        source_list = []
+        for acc in account_dic.values():
+            if self._unfiltered(unfiltered):
+                source = (
+                    getattr(acc, "iban", None)
+                    or getattr(acc, "maskedPan", None)
+                    or getattr(acc, "depositAccountId", None),
+                    getattr(acc, "type", None),
+                    getattr(acc, "transactions", None),
+                )
+            else:
+                source = (acc.get("account"), acc.get("type"), acc.get("transactions"))
+            if source[1] in TRANSACTION_TYPES and source[2]:
+                source_list.append(source)
+            else:
+                # debit cards are booked on their reference account
+                self.logger.debug(
+                    "DKBRobo._transaction_sources(): skip %s (%s)\n",
+                    source[0],
+                    source[1],
+                )
+
+        self.logger.debug(
+            "DKBRobo._transaction_sources(): returned %s elements\n", len(source_list)
+        )
+        return source_list
+
+    @_operation
+    def backfill_transactions(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+    ):
+        """exported method to fetch a long transaction history in parallel monthly windows"""
+        self.logger.debug(
+            "DKBRobo.backfill_transactions(%s/%s: %s/%s)\n",
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+        )
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = Transactions(
+            client=self.wrapper.client, unfiltered=self.unfiltered, field_list=fields
+        )
+        transaction_list = transaction.backfill(
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+            transaction_type,
+            max_workers=self.max_workers,
+        )
+
+        self.logger.debug(
+            "DKBRobo.backfill_transactions(): %s transactions returned\n",
+            len(transaction_list),
+        )
+        return transaction_list
+
+    @_operation
+    def get_all_transactions(
+        self,
+        account_dic,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        unfiltered=None,
+        fields=None,
+    ):
+        """exported method to fetch the transactions of all accounts, cards and depots concurrently
+
+        returns a dictionary keyed by account number containing type, transactions and
+        error per account; a failing account does not abort the others. An account_dic
+        of None selects all accounts of the overview. unfiltered overrides the setting
+        of the instance for this call, fields limits the keys of the transactions.
+        """
+        self.logger.debug("DKBRobo.get_all_transactions(%s/%s)\n", date_from, date_to)
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        unfiltered = self._unfiltered(unfiltered)
+        source_list = self._transaction_sources(
+            self.account_dic if account_dic is None else account_dic, unfiltered
+        )
+
+        def _get(source):
+            (account, atype, transaction_url) = source
+            transaction = Transactions(
+                client=self.wrapper.client,
+                unfiltered=unfiltered,
+                strict=True,
+                field_list=fields,
+            )
+            try:
+                transaction_list = transaction.get(
+                    transaction_url, atype, date_from, date_to, transaction_type
+                )
+            except Exception as err:  # pylint: disable=w0718
+                self.logger.error(
+                    "fetching transactions of %s failed: %s", account, err
+                )
+                return {"type": atype, "transactions": [], "error": str(err)}
+            return {"type": atype, "transactions": transaction_list, "error": None}
+
+        transaction_dic = {}
+        if source_list:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(source_list))
+            ) as executor:
+                for source, result in zip(source_list, executor.map(_get, source_list)):
+                    transaction_dic[source[0]] = result
+
+        self.logger.debug(
+            "DKBRobo.get_all_transactions(): %s accounts returned\n",
+            len(transaction_dic),
+        )
+        return transaction_dic
+
     def get_credit_limits(self):
         """create a dictionary of credit limits of the different accounts"""
         self.logger.debug("DKBRobo.get_credit_limits()\n")
@@ -128,6 +335,7 @@ class DKBRobo(object):
 
         return limit_dic
 
+    @_operation
     def get_exemption_order(self):
         """get get_exemption_order"""
         self.logger.debug("DKBRobo.get_exemption_order()\n")
@@ -141,16 +349,25 @@ class DKBRobo(object):
         self.logger.debug("DKBRobo.get_points()\n")
         raise DKBRoboError("Method not supported...")
 
-    def get_standing_orders(self, uid=None):
+    @_operation
+    def get_standing_orders(self, uid=None, unfiltered=None):
         """get standing orders"""
         self.logger.debug("DKBRobo.get_standing_orders()\n")
         standingorder = StandingOrders(
-            client=self.wrapper.client, unfiltered=self.unfiltered
+            client=self.wrapper.client, unfiltered=self._unfiltered(unfiltered)
         )
         return standingorder.fetch(uid)
 
+    @_operation
     def get_transactions(
-        self, transaction_url, atype, date_from, date_to, transaction_type="booked"
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+        unfiltered=None,
     ):
         """exported method to get transactions"""
         self.logger.debug(
@@ -163,7 +380,9 @@ class DKBRobo(object):
 
         (date_from, date_to) = validate_dates(date_from, date_to)
         transaction = Transactions(
-            client=self.wrapper.client, unfiltered=self.unfiltered
+            client=self.wrapper.client,
+            unfiltered=self._unfiltered(unfiltered),
+            field_list=fields,
         )
         transaction_list = transaction.get(
             transaction_url, atype, date_from, date_to, transaction_type
@@ -175,6 +394,78 @@ class DKBRobo(object):
         )
         return transaction_list
 
+    @_operation
+    def get_transaction_frame(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        backend=None,
+    ):
+        """exported method to get transactions as columnar TransactionFrame"""
+        self.logger.debug(
+            "DKBRobo.get_transaction_frame(%s/%s: %s/%s)\n",
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+        )
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = Transactions(client=self.wrapper.client)
+        frame = transaction.get_frame(
+            transaction_url, atype, date_from, date_to, transaction_type, backend
+        )
+
+        self.logger.debug(
+            "DKBRobo.get_transaction_frame(): %s transactions returned\n", len(frame)
+        )
+        return frame
+
+    @_operation
+    def iter_transactions(
+        self,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+    ):
+        """exported method to iterate over transactions while they get fetched"""
+        self.logger.debug(
+            "DKBRobo.iter_transactions(%s/%s: %s/%s)\n",
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+        )
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        transaction = Transactions(
+            client=self.wrapper.client, unfiltered=self.unfiltered, field_list=fields
+        )
+        for transaction_list in transaction.iter_pages(
+            transaction_url, atype, date_from, date_to, transaction_type
+        ):
+            yield from transaction_list
+
+    @_operation
+    def refresh_accounts(self):
+        """fetch the account overview again (and update the snapshot)"""
+        self.logger.debug("DKBRobo.refresh_accounts()\n")
+
+        account_dic = self.wrapper.overview()
+        if account_dic:
+            self.account_dic = account_dic
+        else:
+            self.logger.error("Refreshing the account overview failed")
+
+        self.logger.debug("DKBRobo.refresh_accounts() ended\n")
+        return self.account_dic
+
     def scan_postbox(
         self, path=None, download_all=False, _archive=False, prepend_date=False
     ):
@@ -184,6 +475,50 @@ class DKBRobo(object):
             Path(path) if path is not None else None, download_all, prepend_date
         )
 
+    @_operation
+    def sync_transactions(
+        self,
+        store: TransactionStore,
+        account_id,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+    ):
+        """exported method to sync transactions into a local store and answer from there"""
+        self.logger.debug(
+            "DKBRobo.sync_transactions(%s/%s: %s/%s)\n",
+            transaction_url,
+            atype,
+            date_from,
+            date_to,
+        )
+
+        (date_from, date_to) = validate_dates(date_from, date_to)
+        # a failed page must not be stored as a completely synced range
+        transaction = Transactions(
+            client=self.wrapper.client, unfiltered=self.unfiltered, strict=True
+        )
+        store.sync(transaction, account_id, transaction_url, atype, date_from, date_to)
+        if atype in ["account", "creditcard", "creditCard"]:
+            transaction_list = store.transactions(
+                account_id,
+                atype,
+                date_from,
+                date_to,
+                transaction_type,
+                unfiltered=self.unfiltered,
+            )
+        else:
+            transaction_list = store.positions(account_id, unfiltered=self.unfiltered)
+
+        self.logger.debug(
+            "DKBRobo.sync_transactions(): %s transactions returned\n",
+            len(transaction_list),
+        )
+        return transaction_list
+
     def download_doc(
         self,
         path: Path,
@@ -193,6 +528,7 @@ class DKBRobo(object):
         use_account_folders: bool = False,
         list_only: bool = False,
         accounts_by_id: dict = None,
+        rate_limiter: RateLimiter = None,
     ):
         """download a single document"""
         target = path / doc.category()
@@ -205,11 +541,13 @@ class DKBRobo(object):
         if not list_only:
             self.logger.info('Downloading "%s" to %s...', doc.subject(), target)
 
-            download_rcode = doc.download(self.wrapper.client, target / filename)
+            download_rcode = doc.download(
+                self.wrapper.client, target / filename, rate_limiter=rate_limiter
+            )
             if download_rcode:
                 if mark_read:
+                    # rides on the token of the download - rate counts documents
                     doc.mark_read(self.wrapper.client, True)
-                time.sleep(0.5)
                 doc.rcode = download_rcode
             else:
                 self.logger.info("File already exists. Skipping %s.", filename)
@@ -249,6 +587,7 @@ class DKBRobo(object):
             document_dic[category]["count"] += 1
         return document_dic
 
+    @_operation
     def download(
         self,
         path: Path,
@@ -257,6 +596,9 @@ class DKBRobo(object):
         mark_read: bool = True,
         use_account_folders: bool = False,
         list_only: bool = False,
+        concurrency: int = 1,
+        rate: float = 2.0,
+        unfiltered: bool = None,
     ):
         """download postbox documents"""
         if path is None:
@@ -275,7 +617,9 @@ class DKBRobo(object):
         accounts_by_id = self._accounts_by_id()
         if not list_only:
             # download the documents if required
-            for doc in documents.values():
+            rate_limiter = RateLimiter(rate=rate, capacity=max(concurrency, 1))
+
+            def _download_doc(doc):
                 self.download_doc(
                     path=path,
                     doc=doc,
@@ -284,10 +628,19 @@ class DKBRobo(object):
                     use_account_folders=use_account_folders,
                     list_only=list_only,
                     accounts_by_id=accounts_by_id,
+                    rate_limiter=rate_limiter,
                 )
 
+            if concurrency > 1:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    # consume the iterator to re-raise exceptions from the workers
+                    list(executor.map(_download_doc, documents.values()))
+            else:
+                for doc in documents.values():
+                    _download_doc(doc)
+
         # format the documents
-        if not self.unfiltered:
+        if not self._unfiltered(unfiltered):
             documents = self.format_doc(
                 path=path,
                 documents=documents,
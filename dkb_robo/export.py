@@ -0,0 +1,314 @@
+""" Module providing typed columnar export to Parquet, Arrow IPC and SQLite """
+# pylint: disable=c0415
+import datetime
+import itertools
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+logger = logging.getLogger(__name__)
+# rows converted and written at once
+BATCH_SIZE = 1000
+# column name, type and the keys leading to the value in a formatted row.
+# Products naming a value differently list one key path per product.
+SCHEMAS = {
+    "transactions": (
+        ("account", "string", (("account",),)),
+        ("bdate", "date", (("bdate",),)),
+        ("vdate", "date", (("vdate",),)),
+        ("amount", "float", (("amount",),)),
+        ("currencycode", "string", (("currencycode",),)),
+        ("peer", "string", (("peer",),)),
+        ("peeraccount", "string", (("peeraccount",),)),
+        ("peerbic", "string", (("peerbic",),)),
+        ("peerid", "string", (("peerid",),)),
+        ("postingtext", "string", (("postingtext",),)),
+        ("reasonforpayment", "string", (("reasonforpayment",),)),
+        ("customerreference", "string", (("customerreference",),)),
+        ("mandatereference", "string", (("mandatereference",),)),
+        ("text", "string", (("text",),)),
+    ),
+    "positions": (
+        ("account", "string", (("account",),)),
+        ("isin_wkn", "string", (("isin_wkn",),)),
+        ("text", "string", (("text",),)),
+        ("text_long", "string", (("text_long",),)),
+        ("quantity", "float", (("quantity",),)),
+        ("shares", "float", (("shares",),)),
+        ("shares_unit", "string", (("shares_unit",),)),
+        ("price", "float", (("price",),)),
+        ("price_euro", "float", (("price_euro",),)),
+        ("currencycode", "string", (("currencyCode",),)),
+        ("market", "string", (("market",),)),
+        ("lastorderdate", "date", (("lastorderdate",),)),
+    ),
+    "accounts": (
+        ("id", "string", (("id",),)),
+        ("account", "string", (("account",),)),
+        ("type", "string", (("type",),)),
+        ("name", "string", (("name",),)),
+        # card output comes with a typo in the key
+        ("holdername", "string", (("holderName",), ("holdername:",))),
+        ("amount", "float", (("amount",),)),
+        ("currencycode", "string", (("currencyCode",), ("currencycode",))),
+        ("limit", "float", (("limit",),)),
+        ("date", "date", (("date",),)),
+        ("expirydate", "date", (("expirydate",),)),
+    ),
+    "standing_orders": (
+        ("account", "string", (("account",),)),
+        ("amount", "float", (("amount",),)),
+        ("currencycode", "string", (("currencycode",),)),
+        ("recipient", "string", (("recipient",),)),
+        ("purpose", "string", (("purpose",),)),
+        ("creditor_iban", "string", (("creditoraccount", "iban"),)),
+        ("creditor_bic", "string", (("creditoraccount", "bic"),)),
+        ("frequency", "string", (("interval", "frequency"),)),
+        ("date_from", "date", (("interval", "from"),)),
+        ("date_until", "date", (("interval", "until"),)),
+        ("next_execution", "date", (("interval", "nextExecutionAt"),)),
+    ),
+    "postbox": (
+        ("id", "string", (("id",),)),
+        ("category", "string", (("category",),)),
+        ("subject", "string", (("subject",),)),
+        ("date", "date", (("date",),)),
+        ("link", "string", (("link",),)),
+        ("fname", "string", (("fname",),)),
+        ("rcode", "int", (("rcode",),)),
+    ),
+}
+SQLITE_TYPES = {
+    "bool": "INTEGER",
+    "date": "TEXT",
+    "float": "REAL",
+    "int": "INTEGER",
+    "string": "TEXT",
+}
+
+
+def _date(value) -> datetime.date:
+    """convert a date or timestamp into a date"""
+    if isinstance(value, datetime.date):
+        return value
+    # timestamps get cut down to their day
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+CONVERTERS = {
+    "bool": bool,
+    "date": _date,
+    "float": float,
+    "int": int,
+    "string": str,
+}
+
+
+def _convert(value, ctype: str):
+    """convert a value into the type of its column (None if impossible)"""
+    if value is None or value == "":
+        return None
+    try:
+        return CONVERTERS[ctype](value)
+    except (TypeError, ValueError):
+        logger.debug("_convert(): cannot convert %s to %s\n", value, ctype)
+        return None
+
+
+def _lookup(row: Dict, path_list: Tuple[Tuple[str, ...], ...]):
+    """value of the first key path present in a row"""
+    for path in path_list:
+        value = row
+        for key in path:
+            if not isinstance(value, dict):
+                value = None
+                break
+            value = value.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+def _schema(model: str) -> Tuple[Tuple[str, str, Tuple], ...]:
+    """column definitions of a model"""
+    if model not in SCHEMAS:
+        raise ValueError(f"Unknown model: {model}")
+    return SCHEMAS[model]
+
+
+def columns(model: str) -> List[str]:
+    """column names of a model"""
+    return [name for (name, _ctype, _path_list) in _schema(model)]
+
+
+def rows(model: str, data: Iterable[Dict]) -> Iterator[Tuple]:
+    """convert formatted rows into tuples of typed values"""
+    schema = _schema(model)
+    for row in data:
+        if hasattr(row, "format"):
+            # unfiltered output
+            row = row.format()
+        yield tuple(
+            _convert(_lookup(row, path_list), ctype)
+            for (_name, ctype, path_list) in schema
+        )
+
+
+def postbox_documents(document_dic: Dict[str, Dict]) -> Iterator[Dict[str, str]]:
+    """flatten the categorized documents returned by DKBRobo.download()"""
+    for category, category_dic in document_dic.items():
+        for subject, doc_dic in category_dic.get("documents", {}).items():
+            yield {"category": category, "subject": subject, **doc_dic}
+
+
+def _batches(model: str, data: Iterable[Dict], batch_size: int) -> Iterator[List]:
+    """typed rows in lists of batch_size"""
+    row_iterator = rows(model, data)
+    while True:
+        batch = list(itertools.islice(row_iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def arrow_schema(model: str):
+    """pyarrow schema of a model"""
+    if pyarrow is None:
+        raise ImportError(
+            "Arrow export requires pyarrow, install it by running 'pip install dkb_robo[arrow]'"
+        )
+    arrow_types = {
+        "bool": pyarrow.bool_(),
+        "date": pyarrow.date32(),
+        "float": pyarrow.float64(),
+        "int": pyarrow.int64(),
+        "string": pyarrow.string(),
+    }
+    return pyarrow.schema(
+        [(name, arrow_types[ctype]) for (name, ctype, _path_list) in _schema(model)]
+    )
+
+
+def export_arrow(
+    model: str,
+    data: Iterable[Dict],
+    path: Union[str, Path],
+    file_format: str = "parquet",
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """write rows of a model into a parquet or arrow ipc file"""
+    logger.debug("export_arrow(%s, %s)\n", model, file_format)
+
+    schema = arrow_schema(model)
+    # the writers come with submodules of pyarrow, arrow_schema() made sure it is installed
+    if file_format == "parquet":
+        from pyarrow import parquet  # pylint: disable=e0401
+
+        writer = parquet.ParquetWriter(str(path), schema)
+    elif file_format == "arrow":
+        from pyarrow import ipc  # pylint: disable=e0401
+
+        writer = ipc.new_file(str(path), schema)
+    else:
+        raise ValueError(f"Unknown file format: {file_format}")
+
+    row_count = 0
+    try:
+        for batch in _batches(model, data, batch_size):
+            writer.write_batch(
+                pyarrow.RecordBatch.from_arrays(
+                    [
+                        pyarrow.array(column, type=field.type)
+                        for (column, field) in zip(zip(*batch), schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            row_count += len(batch)
+    finally:
+        writer.close()
+
+    logger.debug("export_arrow() ended with %s rows\n", row_count)
+    return row_count
+
+
+def export_sqlite(
+    model: str,
+    data: Iterable[Dict],
+    path: Union[str, Path],
+    table: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    append: bool = False,
+) -> int:
+    """bulk insert rows of a model into a table of a sqlite database
+
+    the table gets created if needed and its rows get replaced unless
+    append is set, dates are stored as iso strings
+    """
+    logger.debug("export_sqlite(%s)\n", model)
+
+    schema = _schema(model)
+    table = table or model
+    if not table.isidentifier():
+        raise ValueError(f"Invalid table name: {table}")
+    date_index_list = [
+        index for (index, (_name, ctype, _path)) in enumerate(schema) if ctype == "date"
+    ]
+
+    row_count = 0
+    db = sqlite3.connect(str(path))
+    try:
+        with db:
+            column_list = ", ".join(
+                f'"{name}" {SQLITE_TYPES[ctype]}' for (name, ctype, _path) in schema
+            )
+            db.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({column_list})')
+            if not append:
+                # deleted in the same transaction as the insert, a failed
+                # export keeps the rows of the previous run
+                db.execute(f'DELETE FROM "{table}"')
+            statement = f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(schema))})'
+            for batch in _batches(model, data, batch_size):
+                if date_index_list:
+                    batch = [
+                        tuple(
+                            value.isoformat()
+                            if index in date_index_list and value is not None
+                            else value
+                            for (index, value) in enumerate(row)
+                        )
+                        for row in batch
+                    ]
+                db.executemany(statement, batch)
+                row_count += len(batch)
+    finally:
+        db.close()
+
+    logger.debug("export_sqlite() ended with %s rows\n", row_count)
+    return row_count
+
+
+def export(
+    model: str,
+    data: Iterable[Dict],
+    path: Union[str, Path],
+    file_format: str = "parquet",
+    batch_size: int = BATCH_SIZE,
+    append: bool = False,
+) -> int:
+    """write rows of a model into a parquet, arrow ipc or sqlite file
+
+    only sqlite tables can be appended to, other files get replaced
+    """
+    if file_format == "sqlite":
+        return export_sqlite(model, data, path, batch_size=batch_size, append=append)
+    if append:
+        raise ValueError(f"Cannot append to a {file_format} file")
+    return export_arrow(model, data, path, file_format, batch_size=batch_size)
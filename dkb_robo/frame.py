@@ -0,0 +1,290 @@
+""" Module providing a columnar container for large transaction lists """
+# pylint: disable=c0103
+import datetime
+import logging
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dkb_robo.projection import normalize, raw_peer
+
+
+logger = logging.getLogger(__name__)
+# columns holding ids of dictionary encoded values
+DICTIONARY_COLUMNS = ("currency", "peer", "transaction_type")
+GROUP_KEYS = ("date", "month") + DICTIONARY_COLUMNS
+
+
+def _load_numpy():
+    """numpy module or None if it is not installed (imported on first use only)"""
+    try:
+        import numpy  # pylint: disable=c0415
+    except ImportError:
+        return None
+    return numpy
+
+
+def _peer(attributes: Dict, amount: int, atype: str) -> Optional[str]:
+    """name of the counterpart as shown by AccountTransactionItem.format()"""
+    if atype != "account":
+        return normalize(attributes.get("description")) or None
+    return raw_peer(attributes, amount > 0)[2] or None
+
+
+class TransactionFrame:
+    """transactions stored column by column
+
+    amounts are kept as integer cents, booking dates as day ordinals and
+    currencies, peers and transaction types as ids into per-frame dictionaries
+    """
+
+    def __init__(self, backend: Optional[str] = None):
+        numpy = _load_numpy() if backend in (None, "numpy") else None
+        if backend is None:
+            backend = "numpy" if numpy else "python"
+        if backend == "numpy" and not numpy:
+            raise ImportError("numpy backend requested but numpy is not installed")
+        self.backend = backend
+        # module of the numpy backend
+        self.np = numpy
+        self.ids = []
+        self.columns = {
+            "amount": array("q"),
+            "date": array("i"),
+            "currency": array("i"),
+            "peer": array("i"),
+            "transaction_type": array("i"),
+        }
+        self.dictionaries = {name: [] for name in DICTIONARY_COLUMNS}
+        # ids of the values in the dictionaries
+        self.codes = {name: {} for name in DICTIONARY_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _encode(self, name: str, value: Optional[str]) -> int:
+        """get the id of a value in a column dictionary"""
+        code_dic = self.codes[name]
+        try:
+            return code_dic[value]
+        except KeyError:
+            code_dic[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+            return code_dic[value]
+
+    def _numpy(self, name: str):
+        """zero-copy numpy view on a column"""
+        return self.np.frombuffer(
+            self.columns[name],
+            dtype=self.np.int64 if name == "amount" else self.np.int32,
+        )
+
+    def _select(self, index_list) -> "TransactionFrame":
+        """new frame containing the given rows and sharing the dictionaries"""
+        frame = TransactionFrame(backend=self.backend)
+        frame.dictionaries = self.dictionaries
+        frame.codes = self.codes
+        frame.ids = [self.ids[idx] for idx in index_list]
+        for name, column in self.columns.items():
+            if self.backend == "numpy":
+                frame.columns[name].frombytes(self._numpy(name)[index_list].tobytes())
+            else:
+                frame.columns[name] = array(
+                    column.typecode, (column[idx] for idx in index_list)
+                )
+        return frame
+
+    def _sums(self, name: str) -> Dict[int, int]:
+        """sum up the amounts per value of a date or dictionary column"""
+        if self.backend == "numpy":
+            key_list, inverse = self.np.unique(self._numpy(name), return_inverse=True)
+            sum_list = self.np.zeros(len(key_list), dtype=self.np.int64)
+            self.np.add.at(sum_list, inverse, self._numpy("amount"))
+            return dict(zip(key_list.tolist(), sum_list.tolist()))
+
+        sum_dic = {}
+        for key, amount in zip(self.columns[name], self.columns["amount"]):
+            sum_dic[key] = sum_dic.get(key, 0) + amount
+        return sum_dic
+
+    def append(self, transaction: Dict, atype: str = "account") -> bool:
+        """add a raw api transaction"""
+        attributes = transaction.get("attributes", None)
+        if not attributes or "id" not in transaction:
+            return False
+
+        try:
+            amount = round(float(attributes["amount"]["value"]) * 100)
+            date = datetime.date.fromisoformat(attributes["bookingDate"]).toordinal()
+        except (KeyError, TypeError, ValueError) as err:
+            logger.error(
+                "TransactionFrame.append(): skipping %s: %s", transaction["id"], err
+            )
+            return False
+
+        self.ids.append(transaction["id"])
+        self.columns["amount"].append(amount)
+        self.columns["date"].append(date)
+        self.columns["currency"].append(
+            self._encode("currency", attributes["amount"].get("currencyCode"))
+        )
+        self.columns["peer"].append(
+            self._encode("peer", _peer(attributes, amount, atype))
+        )
+        self.columns["transaction_type"].append(
+            self._encode("transaction_type", attributes.get("transactionType"))
+        )
+        return True
+
+    @classmethod
+    def from_api(
+        cls,
+        transaction_list: List[Dict],
+        atype: str = "account",
+        backend: Optional[str] = None,
+    ) -> "TransactionFrame":
+        """build a frame from raw api transactions (e.g. Transactions._filter() output)"""
+        logger.debug("TransactionFrame.from_api()\n")
+
+        frame = cls(backend=backend)
+        for transaction in transaction_list:
+            frame.append(transaction, atype)
+
+        logger.debug("TransactionFrame.from_api() ended with %s rows\n", len(frame))
+        return frame
+
+    def column(self, name: str) -> List:
+        """decoded values of a column"""
+        if name == "id":
+            return list(self.ids)
+        if name == "amount":
+            return [amount / 100 for amount in self.columns["amount"]]
+        if name == "date":
+            return [
+                datetime.date.fromordinal(date).isoformat()
+                for date in self.columns["date"]
+            ]
+        return [self.dictionaries[name][code] for code in self.columns[name]]
+
+    def filter(
+        self,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        currency: Optional[str] = None,
+        peer: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        incoming: Optional[bool] = None,
+    ) -> "TransactionFrame":
+        """select rows matching all given conditions (dates in api format)"""
+        logger.debug("TransactionFrame.filter()\n")
+
+        condition_list = []
+        if date_from:
+            condition_list.append(
+                ("date", ">=", datetime.date.fromisoformat(date_from).toordinal())
+            )
+        if date_to:
+            condition_list.append(
+                ("date", "<=", datetime.date.fromisoformat(date_to).toordinal())
+            )
+        for name, value in (
+            ("currency", currency),
+            ("peer", peer),
+            ("transaction_type", transaction_type),
+        ):
+            if value is not None:
+                # a value unknown to the dictionary cannot match any row
+                condition_list.append((name, "==", self.codes[name].get(value, -1)))
+        if incoming is not None:
+            condition_list.append(("amount", ">" if incoming else "<=", 0))
+
+        if self.backend == "numpy":
+            mask = self.np.ones(len(self), dtype=bool)
+            for name, operator, value in condition_list:
+                view = self._numpy(name)
+                if operator == ">=":
+                    mask &= view >= value
+                elif operator == "<=":
+                    mask &= view <= value
+                elif operator == ">":
+                    mask &= view > value
+                else:
+                    mask &= view == value
+            index_list = self.np.flatnonzero(mask)
+        else:
+            index_list = range(len(self))
+            for name, operator, value in condition_list:
+                column = self.columns[name]
+                if operator == ">=":
+                    index_list = [idx for idx in index_list if column[idx] >= value]
+                elif operator == "<=":
+                    index_list = [idx for idx in index_list if column[idx] <= value]
+                elif operator == ">":
+                    index_list = [idx for idx in index_list if column[idx] > value]
+                else:
+                    index_list = [idx for idx in index_list if column[idx] == value]
+
+        frame = self._select(index_list)
+        logger.debug("TransactionFrame.filter() ended with %s rows\n", len(frame))
+        return frame
+
+    def sum(self) -> float:
+        """total amount (does not care about currencies)"""
+        if self.backend == "numpy":
+            return int(self._numpy("amount").sum()) / 100
+        return sum(self.columns["amount"]) / 100
+
+    def group_by(self, key: str) -> Dict[Optional[str], float]:
+        """sum up amounts per date, month, currency, peer or transaction type"""
+        logger.debug("TransactionFrame.group_by(%s)\n", key)
+
+        if key not in GROUP_KEYS:
+            raise ValueError(f"cannot group by {key}, use one of {GROUP_KEYS}")
+
+        if key in DICTIONARY_COLUMNS:
+            group_dic = {
+                self.dictionaries[key][code]: amount / 100
+                for code, amount in self._sums(key).items()
+            }
+        else:
+            group_dic = {}
+            for date, amount in sorted(self._sums("date").items()):
+                date_str = datetime.date.fromordinal(date).isoformat()
+                if key == "month":
+                    date_str = date_str[:7]
+                group_dic[date_str] = group_dic.get(date_str, 0) + amount
+            group_dic = {
+                date_str: amount / 100 for date_str, amount in group_dic.items()
+            }
+
+        logger.debug("TransactionFrame.group_by() ended\n")
+        return group_dic
+
+    def balance(self, opening: float = 0.0) -> List[Tuple[str, float]]:
+        """closing balance per booking date starting from an opening balance"""
+        logger.debug("TransactionFrame.balance()\n")
+
+        balance = round(opening * 100)
+        balance_list = []
+        for date, amount in sorted(self._sums("date").items()):
+            balance += amount
+            balance_list.append(
+                (datetime.date.fromordinal(date).isoformat(), balance / 100)
+            )
+
+        logger.debug("TransactionFrame.balance() ended\n")
+        return balance_list
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        """iterate over the frame as dictionaries"""
+        for idx, uid in enumerate(self.ids):
+            yield {
+                "id": uid,
+                "amount": self.columns["amount"][idx] / 100,
+                "date": datetime.date.fromordinal(
+                    self.columns["date"][idx]
+                ).isoformat(),
+                **{
+                    name: self.dictionaries[name][self.columns[name][idx]]
+                    for name in DICTIONARY_COLUMNS
+                },
+            }
@@ -11,6 +11,7 @@ import csv
 from typing import Dict, List, Tuple
 from urllib import parse
 import mechanicalsoup
+import requests
 import bs4
 from dkb_robo.utilities import string2float, generate_random_string
 
@@ -579,13 +580,20 @@ class Wrapper(object):
         return login_confirmed
 
     def _new_instance(
-        self, clientcookies=None
+        self, clientcookies=None, session: requests.Session = None
     ) -> mechanicalsoup.stateful_browser.StatefulBrowser:
-        """creates a new browser instance"""
+        """creates a new browser instance (on top of an existing session if given)"""
         logger.debug("Wrapper._new_instance()\n")
 
+        # mechanicalsoup replaces the user agent of the session it gets handed
+        header_dic = dict(session.headers) if session is not None else None
+
         # create browser and cookiestore objects
-        self.dkb_br = mechanicalsoup.StatefulBrowser()
+        self.dkb_br = mechanicalsoup.StatefulBrowser(session=session)
+        if header_dic is not None:
+            # keep the headers of the api calls sharing the session untouched
+            session.headers.clear()
+            session.headers.update(header_dic)
 
         # set proxies
         if self.proxies:
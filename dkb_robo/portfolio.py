@@ -1,14 +1,17 @@
 """ Module for handling dkb transactions """
 # pylint: disable=c0415, r0913, c0103
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional, Union
 from dataclasses import dataclass, asdict
 import logging
+import time
 import requests
 from dkb_robo.utilities import (
     Amount,
     Person,
     get_dateformat,
     filter_unexpected_fields,
+    slotted,
     ulal,
     BASE_URL,
 )
@@ -70,15 +73,26 @@ class ProductGroup:
 class Overview:
     """Overview class"""
 
+    # product endpoints which can be fetched independently from each other
+    PRODUCT_ENDPOINTS = {
+        "accounts": "/accounts/accounts",
+        "cards": "/credit-card/cards?filter%5Btype%5D=creditCard&filter%5Bportfolio%5D=dkb&filter%5Btype%5D=debitCard",
+        "depots": "/broker/brokerage-accounts",
+        "loans": "/loans/loans",
+    }
+
     def __init__(
         self,
         client: requests.Session,
         unfiltered: bool = False,
         base_url: str = BASE_URL,
+        max_workers: int = 1,
     ):
         self.client = client
         self.base_url = base_url
         self.unfiltered = unfiltered
+        self.max_workers = max_workers
+        self.latency_dic = {}
 
     def _add(
         self,
@@ -138,7 +152,9 @@ class Overview:
         """fetch data via API"""
         logger.debug("Overview._fetch()\n")
 
+        start = time.perf_counter()
         response = self.client.get(self.base_url + url_path)
+        self.latency_dic[url_path] = time.perf_counter() - start
         if response.status_code == 200:
             response_dic = response.json()
         else:
@@ -150,6 +166,30 @@ class Overview:
         logger.debug("Overview._fetch() ended\n")
         return response_dic
 
+    def _fetch_products(self) -> Dict[str, Dict[str, str]]:
+        """fetch product endpoints either sequentially or via a thread pool"""
+        logger.debug("Overview._fetch_products(%s)\n", self.max_workers)
+
+        if self.max_workers > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(self.PRODUCT_ENDPOINTS))
+            ) as executor:
+                future_dic = {
+                    product: executor.submit(self._fetch, url_path)
+                    for product, url_path in self.PRODUCT_ENDPOINTS.items()
+                }
+                product_dic = {
+                    product: future.result() for product, future in future_dic.items()
+                }
+        else:
+            product_dic = {
+                product: self._fetch(url_path)
+                for product, url_path in self.PRODUCT_ENDPOINTS.items()
+            }
+
+        logger.debug("Overview._fetch_products() ended\n")
+        return product_dic
+
     def _sort(self, portfolio_dic: Dict[str, str]) -> Dict[str, str]:
         """format and sort data"""
         logger.debug("Overview._sort()\n")
@@ -223,29 +263,42 @@ class Overview:
 
         # we calm the IDS system of DKB with two calls without sense
         # self._fetch('/terms-consent/consent-requests??filter%5Bportfolio%5D=DKB')
+        self.latency_dic = {}
         product_display_dic = self._fetch("/config/users/me/product-display-settings")
         if product_display_dic:
-            portfolio_dic = {
-                "product_display": product_display_dic,
-                "accounts": self._fetch("/accounts/accounts"),
-                "cards": self._fetch(
-                    "/credit-card/cards?filter%5Btype%5D=creditCard&filter%5Bportfolio%5D=dkb&filter%5Btype%5D=debitCard"
-                ),
-                "depots": self._fetch("/broker/brokerage-accounts"),
-                "loans": self._fetch("/loans/loans"),
-            }
+            portfolio_dic = {"product_display": product_display_dic}
+            portfolio_dic.update(self._fetch_products())
         else:
             portfolio_dic = {}
 
+        for url_path, latency in self.latency_dic.items():
+            logger.debug("Overview.get(): latency %s: %.3fs", url_path, latency)
+
         logger.debug("Overview.get() ended\n")
         return self._sort(portfolio_dic)
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class AccountItem:
     """Account dataclass"""
 
+    # keys of format()
+    FIELDS = (
+        "account",
+        "amount",
+        "currencyCode",
+        "date",
+        "holderName",
+        "iban",
+        "id",
+        "limit",
+        "name",
+        "transactions",
+        "type",
+    )
+
     availableBalance: Optional[Union[Dict, str]] = None
     balance: Optional[Union[Dict, str]] = None
     currencyCode: Optional[str] = None
@@ -281,6 +334,7 @@ class AccountItem:
             self.overdraftLimit = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class InterestsItem:
         """interests class"""
@@ -293,6 +347,7 @@ class AccountItem:
             self.details = [self.DetailsItem(**detail) for detail in self.details]
 
         @filter_unexpected_fields
+        @slotted
         @dataclass
         class DetailsItem:
             """details class"""
@@ -304,6 +359,7 @@ class AccountItem:
                 self.condition = ulal(self.Condition, self.condition)
 
             @filter_unexpected_fields
+            @slotted
             @dataclass
             class Condition:
                 """condition class"""
@@ -325,6 +381,7 @@ class AccountItem:
                             self.maximumAmount = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Product:
         """Product class"""
@@ -357,10 +414,28 @@ class AccountItem:
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class CardItem:
     """Card class"""
 
+    # keys of format()
+    FIELDS = (
+        "account",
+        "expirydate",
+        "holdername:",
+        "id",
+        "name",
+        "limit",
+        "maskedpan",
+        "status",
+        "type",
+        "transactions",
+        "amount",
+        "currencycode",
+        "date",
+    )
+
     activationDate: Optional[str] = None
     authorizedAmount: Optional[Union[Dict, str]] = None
     availableLimit: Optional[Union[Dict, str]] = None
@@ -368,6 +443,7 @@ class CardItem:
     billingDetails: Optional[Union[Dict, str]] = None
     blockedSince: Optional[str] = None
     creationDate: Optional[str] = None
+    displayName: Optional[str] = None
     engravedLine1: Optional[str] = None
     engravedLine2: Optional[str] = None
     expiryDate: Optional[str] = None
@@ -380,6 +456,7 @@ class CardItem:
     network: Optional[str] = None
     owner: Optional[Union[Dict, str]] = None
     product: Optional[Union[Dict, str]] = None
+    productGroup: Optional[str] = None
     referenceAccount: Optional[str] = None
     state: Optional[str] = None
     status: Optional[Union[Dict, str]] = None
@@ -404,6 +481,7 @@ class CardItem:
             )
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Account:
         """Account class"""
@@ -412,6 +490,7 @@ class CardItem:
         bic: Optional[str] = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class BillingDetails:
         """BillingDetails class"""
@@ -421,6 +500,7 @@ class CardItem:
         cycle: Optional[str] = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Holder:
         """Holder class"""
@@ -431,6 +511,7 @@ class CardItem:
             self.person = ulal(Person, self.person)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Limit:
         """Limit class"""
@@ -452,6 +533,7 @@ class CardItem:
                 ]
 
         @filter_unexpected_fields
+        @slotted
         @dataclass
         class CategoryItem:
             """Category class"""
@@ -463,6 +545,7 @@ class CardItem:
                 self.amount = ulal(Amount, self.amount)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Product:
         """Product class"""
@@ -476,6 +559,7 @@ class CardItem:
         type: Optional[str] = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Status:
         """Status class"""
@@ -517,15 +601,30 @@ class CardItem:
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class DepotItem:
     """Depot class"""
 
+    # keys of format()
+    FIELDS = (
+        "account",
+        "amount",
+        "currencyCode",
+        "holderName",
+        "id",
+        "name",
+        "type",
+        "transactions",
+    )
+
     brokerageAccountPerformance: Optional[Union[Dict, str]] = None
     depositAccountId: Optional[str] = None
+    displayName: Optional[str] = None
     holder: Optional[Union[Dict, str]] = None
     holderName: Optional[str] = None
     id: Optional[str] = None
+    productGroup: Optional[str] = None
     referenceAccounts: Optional[List] = None
     riskClasses: Optional[List] = None
     tradingEnabled: Optional[bool] = None
@@ -547,6 +646,7 @@ class DepotItem:
         )
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class BrokerageAccountPerformance:
         """BrokerageAccountPerformance class"""
@@ -563,6 +663,7 @@ class DepotItem:
             self.overallAbsolute = ulal(Amount, self.overallAbsolute)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class ReferenceAccountItem:
         """ReferenceAccount class"""
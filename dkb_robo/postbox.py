@@ -2,6 +2,8 @@
 import datetime
 import hashlib
 import logging
+import os
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Optional, Union
@@ -9,14 +11,19 @@ import requests
 from dkb_robo.utilities import (
     get_valid_filename,
     filter_unexpected_fields,
+    slotted,
     DKBRoboError,
     JSON_CONTENT_TYPE,
+    RateLimiter,
 )
 
 logger = logging.getLogger(__name__)
+# size of the chunks written to disk while streaming a document
+CHUNK_SIZE = 65536
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class Document:
     """Document data class, roughly based on the JSON API response."""
@@ -36,6 +43,7 @@ class Document:
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class Message:
     """Message data class, roughly based on the JSON API response."""
@@ -79,61 +87,106 @@ class PostboxItem:
         )
         resp.raise_for_status()
 
-    def check_checsum(self, target_file: Path):
+    def _checksum_hash(self):
+        """Returns a hash object matching the checksum from the document metadata."""
+        if len(self.document.checksum) == 32:
+            return hashlib.md5()
+        if len(self.document.checksum) == 128:
+            return hashlib.sha512()
+        raise DKBRoboError(
+            f"Unsupported checksum length: {len(self.document.checksum)}, {self.document.checksum}"
+        )
+
+    def check_checsum(
+        self, target_file: Path, tmp_file: Path, computed_checksum: str
+    ) -> bool:
+        """
+        Compares the computed checksum with the checksum from the document metadata.
+
+        A mismatching download gets moved next to the target file with a ".checksum_mismatch" suffix.
+
+        :return: True if the checksums match, False otherwise.
+        """
         logger.debug("PostboxItem.check_checsum(): %s", self.id)
-        with target_file.open("rb") as file:
-            if len(self.document.checksum) == 32:
-                computed_checksum = hashlib.md5(file.read()).hexdigest()
-            elif len(self.document.checksum) == 128:
-                computed_checksum = hashlib.sha512(file.read()).hexdigest()
-            else:
-                raise DKBRoboError(
-                    f"Unsupported checksum length: {len(self.document.checksum)}, {self.document.checksum}"
-                )
-        if computed_checksum != self.document.checksum:
+        if computed_checksum == self.document.checksum:
+            return True
+
+        logger.warning(
+            "Checksum mismatch for %s: %s != %s. Renaming file.",
+            target_file,
+            computed_checksum,
+            self.document.checksum,
+        )
+        suffix = ".checksum_mismatch"
+        if not target_file.with_name(target_file.name + suffix).exists():
+            # rename file to indicate checksum mismatch
+            os.replace(tmp_file, target_file.with_name(target_file.name + suffix))
+        else:
             logger.warning(
-                "Checksum mismatch for %s: %s != %s. Renaming file.",
-                target_file,
-                computed_checksum,
-                self.document.checksum,
+                "File %s%s already exists. Not renaming.", target_file, suffix
             )
-            # rename file to indicate checksum mismatch
-            suffix = ".checksum_mismatch"
-            if not target_file.with_name(target_file.name + suffix).exists():
-                # rename file to indicate checksum mismatch
-                target_file.rename(target_file.with_name(target_file.name + suffix))
-            else:
-                logger.warning(
-                    "File %s%s already exists. Not renaming.", target_file, suffix
-                )
+            tmp_file.unlink()
+        return False
 
     def download(
-        self, client: requests.Session, target_file: Path, overwrite: bool = False
+        self,
+        client: requests.Session,
+        target_file: Path,
+        overwrite: bool = False,
+        rate_limiter: RateLimiter = None,
     ):
         """
         Downloads the document from the provided link and saves it to the target file.
 
+        The document is streamed into a temporary file while its checksum gets computed. The temporary file
+        replaces the target file only if the checksum matches.
+
         :param client: The requests session to use for downloading the document.
         :param target_file: The path where the document should be saved.
         :param overwrite: Whether to overwrite the file if it already exists.
+        :param rate_limiter: Optional rate limiter shared between concurrent downloads.
         :return: True if the file was downloaded and saved, False if the file already exists and overwrite is False.
         """
         logger.debug("PostboxItem.download(): %s to %s", self.id, target_file)
         if not target_file.exists() or overwrite:
+            checksum_hash = self._checksum_hash() if self.document.checksum else None
+
+            if rate_limiter:
+                rate_limiter.acquire()
             resp = client.get(
-                self.document.link, headers={"Accept": self.document.contentType}
+                self.document.link,
+                headers={"Accept": self.document.contentType},
+                stream=True,
             )
-            resp.raise_for_status()
-
-            # create directories if necessary
-            target_file.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                resp.raise_for_status()
 
-            with target_file.open("wb") as file:
-                file.write(resp.content)
+                # create directories if necessary
+                target_file.parent.mkdir(parents=True, exist_ok=True)
 
-            if self.document.checksum:
-                # compare checksums of file with checksum from document metadata
-                self.check_checsum(target_file)
+                tmp_fd, tmp_name = tempfile.mkstemp(
+                    dir=target_file.parent,
+                    prefix=f".{target_file.name}.",
+                    suffix=".part",
+                )
+                tmp_file = Path(tmp_name)
+                try:
+                    with os.fdopen(tmp_fd, "wb") as file:
+                        for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                            file.write(chunk)
+                            if checksum_hash:
+                                checksum_hash.update(chunk)
+                except BaseException:
+                    tmp_file.unlink()
+                    raise
+            finally:
+                resp.close()
+
+            # compare checksums of file with checksum from document metadata
+            if not checksum_hash or self.check_checsum(
+                target_file, tmp_file, checksum_hash.hexdigest()
+            ):
+                os.replace(tmp_file, target_file)
 
             return resp.status_code
         return False
@@ -230,23 +283,13 @@ class PostBox:
     def __init__(self, client: requests.Session):
         self.client = client
 
-    def fetch_items(self) -> Dict[str, PostboxItem]:
-        """Fetches all items from the postbox and merges document and message data."""
-        logger.debug("PostBox.fetch_items(): Fetching messages")
+    def _merge(self, messages: Dict, documents: Dict) -> Dict[str, PostboxItem]:
+        """Merges the raw messages and documents from the JSON API."""
 
         def __fix_link_url(url: str) -> str:
             # print(f'old: {url}')
             return url.replace("https://api.dkb.de/documentstorage/", PostBox.BASE_URL)
 
-        response = self.client.get(PostBox.BASE_URL + "/messages")
-        response.raise_for_status()
-        messages = response.json()
-
-        logger.debug("PostBox.fetch_items(): Fetching documents")
-        response = self.client.get(PostBox.BASE_URL + "/documents?page%5Blimit%5D=1000")
-        response.raise_for_status()
-        documents = response.json()
-
         if messages and documents:
             # Merge raw messages and documents from JSON API (left join with documents as base).
             items = {
@@ -272,3 +315,18 @@ class PostBox:
 
             return items
         raise DKBRoboError("Could not fetch messages/documents.")
+
+    def fetch_items(self) -> Dict[str, PostboxItem]:
+        """Fetches all items from the postbox and merges document and message data."""
+        logger.debug("PostBox.fetch_items(): Fetching messages")
+
+        response = self.client.get(PostBox.BASE_URL + "/messages")
+        response.raise_for_status()
+        messages = response.json()
+
+        logger.debug("PostBox.fetch_items(): Fetching documents")
+        response = self.client.get(PostBox.BASE_URL + "/documents?page%5Blimit%5D=1000")
+        response.raise_for_status()
+        documents = response.json()
+
+        return self._merge(messages, documents)
@@ -0,0 +1,142 @@
+""" Module providing the values of formatted transactions computed from raw api data """
+from typing import Dict, Iterable, Optional, Tuple
+from dkb_robo.utilities import DKBRoboError
+
+
+# keys of formatted account transactions taken from a single attribute
+ACCOUNT_ATTRIBUTES = {
+    "date": "bookingDate",
+    # for backwards compatibility
+    "bdate": "bookingDate",
+    "vdate": "valueDate",
+    "customerreference": "endToEndId",
+    "mandatereference": "mandateId",
+    "postingtext": "transactionType",
+}
+# keys of formatted creditcard transactions taken from a single attribute
+CREDITCARD_ATTRIBUTES = {
+    "bdate": "bookingDate",
+    "text": "description",
+    "vdate": "authorizationDate",
+}
+# keys of formatted account transactions depending on the peer
+PEER_FIELDS = {"peeraccount", "peerbic", "peerid", "peer", "text"}
+
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    """collapse whitespace the way the dataclasses do"""
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def amount_value(amount_dic: Optional[Dict]) -> Optional[float]:
+    """amount value as float (None if it cannot be converted)"""
+    try:
+        return float((amount_dic or {}).get("value"))
+    except (TypeError, ValueError):
+        return None
+
+
+def debit_card_payment(description: Optional[str]) -> bool:
+    """check if a booking is a payment by visa debit card"""
+    return "visa debitkartenumsatz" in (normalize(description) or "").lower()
+
+
+def peer_name(
+    name: Optional[str], intermediary_name: Optional[str], debit_card: bool = False
+) -> Optional[str]:
+    """name of the counterpart shown in formatted account transactions
+
+    an intermediary replaces the name unless the payment got done by debit card
+    """
+    if intermediary_name and not debit_card:
+        return intermediary_name
+    return name
+
+
+def raw_peer(attributes: Dict, incoming: bool) -> Tuple[Dict, Dict, Optional[str]]:
+    """peer, peer account and name of the counterpart of a raw account transaction"""
+    if incoming:
+        peer_dic = attributes.get("debtor") or {}
+        account_dic = peer_dic.get("debtorAccount") or {}
+        debit_card = False
+    else:
+        peer_dic = attributes.get("creditor") or {}
+        account_dic = peer_dic.get("creditorAccount") or {}
+        debit_card = debit_card_payment(attributes.get("description"))
+
+    # an intermediary of the peer replaces the one of the account
+    if peer_dic.get("intermediaryName"):
+        intermediary_name = normalize(peer_dic["intermediaryName"])
+    else:
+        intermediary_name = account_dic.get("intermediaryName")
+
+    return (
+        peer_dic,
+        account_dic,
+        peer_name(normalize(peer_dic.get("name")), intermediary_name, debit_card),
+    )
+
+
+def transaction_text(postingtext: str, peer: str, reasonforpayment: str) -> str:
+    """text of a formatted account transaction (kept for backwards compatibility)"""
+    return f"{postingtext} {peer} {reasonforpayment}"
+
+
+def select(
+    transaction_dic: Dict, field_list: Iterable[str], known_list: Iterable[str]
+) -> Dict:
+    """given keys of a formatted transaction, keys without value get skipped"""
+    unknown_list = [key for key in field_list if key not in known_list]
+    if unknown_list:
+        raise DKBRoboError(f"Unknown fields: {', '.join(unknown_list)}")
+    return {key: transaction_dic[key] for key in field_list if key in transaction_dic}
+
+
+def project_account(
+    attributes: Dict, field_list: Iterable[str], known_list: Iterable[str]
+) -> Dict:
+    """given keys of a formatted account transaction computed from raw api data
+
+    values are the same as the ones of format() but neither the nested
+    dataclasses get build nor the strings of other keys get normalized
+    """
+    field_set = set(field_list)
+    transaction_dic = {
+        "currencycode": (attributes.get("amount") or {}).get("currencyCode"),
+        **{key: attributes.get(name) for key, name in ACCOUNT_ATTRIBUTES.items()},
+    }
+    if field_set & PEER_FIELDS or "amount" in field_set:
+        transaction_dic["amount"] = amount_value(attributes.get("amount"))
+    if field_set & PEER_FIELDS or "reasonforpayment" in field_set:
+        transaction_dic["reasonforpayment"] = normalize(attributes.get("description"))
+
+    if field_set & PEER_FIELDS:
+        (peer_dic, account_dic, transaction_dic["peer"]) = raw_peer(
+            attributes,
+            transaction_dic["amount"] is not None and transaction_dic["amount"] > 0,
+        )
+        transaction_dic["peeraccount"] = account_dic.get("iban")
+        transaction_dic["peerbic"] = (peer_dic.get("agent") or {}).get("bic")
+        transaction_dic["peerid"] = peer_dic.get("id")
+        transaction_dic["text"] = transaction_text(
+            transaction_dic["postingtext"],
+            transaction_dic["peer"],
+            transaction_dic["reasonforpayment"],
+        )
+
+    return select(transaction_dic, field_list, known_list)
+
+
+def project_creditcard(
+    attributes: Dict, field_list: Iterable[str], known_list: Iterable[str]
+) -> Dict:
+    """given keys of a formatted creditcard transaction computed from raw api data"""
+    transaction_dic = {
+        "currencycode": (attributes.get("amount") or {}).get("currencyCode"),
+        **{key: attributes.get(name) for key, name in CREDITCARD_ATTRIBUTES.items()},
+    }
+    if "amount" in field_list:
+        transaction_dic["amount"] = amount_value(attributes.get("amount"))
+    return select(transaction_dic, field_list, known_list)
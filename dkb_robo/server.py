@@ -0,0 +1,422 @@
+""" Module providing a local json api for a logged in DKBRobo session """
+# pylint: disable=c0103, r0913
+import hmac
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+from dataclasses import is_dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import requests
+from dkb_robo.dkb_robo import TRANSACTION_TYPES, DKBRobo, DKBRoboError
+from dkb_robo.utilities import DKBRoboError as UtilitiesError, object2dictionary
+
+
+# the server is reachable from this machine only
+HOST = "127.0.0.1"
+KEEPALIVE_URL = "/config/users/me/product-display-settings"
+# file handing the access token of the running server over to its clients
+TOKEN_FILE = os.path.join(os.path.expanduser("~"), ".dkb_robo_server.token")
+logger = logging.getLogger(__name__)
+
+
+def _serialize(data):
+    """convert dataclasses and paths into json serializable objects"""
+    if is_dataclass(data):
+        return object2dictionary(data)
+    if isinstance(data, dict):
+        return {key: _serialize(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_serialize(value) for value in data]
+    if isinstance(data, Path):
+        return str(data)
+    return data
+
+
+def _write_token(token_file: str, token: str):
+    """write the token into a file only readable by the current user"""
+    # mkstemp() creates the file with mode 0600
+    (fd, tmp_file) = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(token_file)),
+        prefix=f".{os.path.basename(token_file)}.",
+        suffix=".part",
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as fh:
+            fh.write(token)
+        os.replace(tmp_file, token_file)
+    except OSError:
+        os.unlink(tmp_file)
+        raise
+
+
+class Server:
+    """serve the operations of a logged in DKBRobo instance over http
+
+    the server listens on the loopback interface only. Each request has to
+    carry the token written to token_file as bearer token and a Host header
+    naming the server (to fend off dns rebinding). Documents get downloaded
+    into download_dir only.
+    """
+
+    # operations callable via POST /<operation> with keyword arguments as json body
+    OPERATIONS = (
+        "backfill_transactions",
+        "download",
+        "get_credit_limits",
+        "get_exemption_order",
+        "get_standing_orders",
+        "get_transactions",
+    )
+
+    def __init__(
+        self,
+        dkb: DKBRobo,
+        port: int = 8765,
+        keepalive: int = 60,
+        token_file: Optional[str] = None,
+        download_dir: Union[str, Path] = ".",
+    ):
+        self.dkb = dkb
+        self.port = port
+        self.keepalive = keepalive
+        self.token_file = token_file or TOKEN_FILE
+        self.token = secrets.token_urlsafe(32)
+        self.download_dir = Path(download_dir).resolve()
+        # the session is shared between all request threads
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.httpd = None
+
+    def _call(self, operation: str, kwargs_dic: Dict[str, str]):
+        """run a DKBRobo operation"""
+        logger.debug("Server._call(%s)\n", operation)
+
+        if operation == "download" and kwargs_dic.get("path"):
+            path = (self.download_dir / kwargs_dic["path"]).resolve()
+            try:
+                path.relative_to(self.download_dir)
+            except ValueError as err:
+                raise ValueError(
+                    f"path must be within the download directory {self.download_dir}"
+                ) from err
+            kwargs_dic["path"] = path
+
+        with self.lock:
+            result = getattr(self.dkb, operation)(**kwargs_dic)
+
+        logger.debug("Server._call() ended\n")
+        return result
+
+    def _keepalive(self):
+        """keep the session alive by sending a cheap request periodically"""
+        logger.debug("Server._keepalive()\n")
+
+        while not self.stopped.wait(self.keepalive):
+            with self.lock:
+                try:
+                    if self.dkb.snapshot_file:
+                        # refreshing the overview keeps session and snapshot up to date
+                        self.dkb.refresh_accounts()
+                        continue
+                    response = self.dkb.wrapper.client.get(
+                        self.dkb.wrapper.base_url + KEEPALIVE_URL,
+                        # bypass the http cache, the request has to hit the server
+                        headers={"Cache-Control": "max-age=0"},
+                    )
+                    if response.status_code != 200:
+                        logger.error("keepalive failed. RC: %s", response.status_code)
+                except requests.exceptions.RequestException as err:
+                    logger.error("keepalive failed: %s", err)
+
+        logger.debug("Server._keepalive() ended\n")
+
+    def authorize(self, headers) -> Optional[Tuple[int, Dict[str, str]]]:
+        """status code and response of a rejected request (None if authorized)"""
+        if headers.get("Host") not in (f"{HOST}:{self.port}", f"localhost:{self.port}"):
+            return 403, {"error": "invalid host header"}
+        if not hmac.compare_digest(
+            headers.get("Authorization", "").encode("utf8"),
+            f"Bearer {self.token}".encode("utf8"),
+        ):
+            return 401, {"error": "invalid or missing token"}
+        return None
+
+    def dispatch(
+        self, method: str, path: str, body: bytes = None
+    ) -> Tuple[int, Dict[str, str]]:
+        """map a request to a DKBRobo operation and return status code and response"""
+        logger.debug("Server.dispatch(%s %s)\n", method, path)
+
+        operation = urlsplit(path).path.strip("/")
+        try:
+            if method == "GET" and operation == "accounts":
+                code, response_dic = 200, {"data": _serialize(self.dkb.account_dic)}
+            elif method == "GET" and operation == "last_login":
+                code, response_dic = 200, {"data": _serialize(self.dkb.last_login)}
+            elif method == "POST" and operation in self.OPERATIONS:
+                kwargs_dic = json.loads(body) if body else {}
+                if not isinstance(kwargs_dic, dict):
+                    raise ValueError("request body must be a json object")
+                code, response_dic = 200, {
+                    "data": _serialize(self._call(operation, kwargs_dic))
+                }
+            else:
+                code, response_dic = 404, {
+                    "error": f"unknown operation: {method} {operation}"
+                }
+        except (ValueError, TypeError) as err:
+            code, response_dic = 400, {"error": str(err)}
+        except (DKBRoboError, UtilitiesError) as err:
+            code, response_dic = 500, {"error": str(err)}
+        except Exception as err:  # pylint: disable=w0718
+            # the client gets an answer instead of a dropped connection
+            logger.error("Server.dispatch(): %s %s failed: %r", method, operation, err)
+            code, response_dic = 500, {"error": f"{type(err).__name__}: {err}"}
+
+        logger.debug("Server.dispatch() ended with %s\n", code)
+        return code, response_dic
+
+    def serve_forever(self):
+        """start keepalive thread and serve requests until shutdown() got called"""
+        logger.debug("Server.serve_forever()\n")
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """request handler passing everything to Server.dispatch()"""
+
+            def _handle(self, method):
+                rejection = server.authorize(self.headers)
+                if rejection:
+                    (code, response_dic) = rejection
+                else:
+                    body = None
+                    if method == "POST":
+                        body = self.rfile.read(
+                            int(self.headers.get("Content-Length") or 0)
+                        )
+                    code, response_dic = server.dispatch(method, self.path, body)
+                payload = json.dumps(response_dic).encode("utf8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                """handle get requests"""
+                self._handle("GET")
+
+            def do_POST(self):
+                """handle post requests"""
+                self._handle("POST")
+
+            def log_message(self, format, *args):  # pylint: disable=w0622
+                logger.debug("Server: " + format, *args)
+
+        self.httpd = ThreadingHTTPServer((HOST, self.port), Handler)
+        # in case port 0 got requested
+        self.port = self.httpd.server_address[1]
+        try:
+            _write_token(self.token_file, self.token)
+            keepalive_thread = threading.Thread(target=self._keepalive, daemon=True)
+            keepalive_thread.start()
+            logger.info(
+                "serving on http://%s:%s, token in %s", HOST, self.port, self.token_file
+            )
+            self.httpd.serve_forever()
+        finally:
+            self.stopped.set()
+            self.httpd.server_close()
+            if os.path.exists(self.token_file):
+                os.unlink(self.token_file)
+
+        logger.debug("Server.serve_forever() ended\n")
+
+    def shutdown(self):
+        """stop serving"""
+        self.stopped.set()
+        if self.httpd:
+            self.httpd.shutdown()
+
+
+class Client:
+    """thin client to a running Server offering the DKBRobo interface"""
+
+    account_dic = {}
+    last_login = None
+
+    def __init__(
+        self,
+        url: str = "http://127.0.0.1:8765",
+        timeout: int = 300,
+        token_file: Optional[str] = None,
+    ):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.session()
+        token_file = token_file or TOKEN_FILE
+        try:
+            with open(token_file, "r", encoding="utf8") as fh:
+                self.session.headers["Authorization"] = f"Bearer {fh.read().strip()}"
+        except OSError as err:
+            # the server will reject the requests
+            logger.error("Unable to read server token from %s: %s", token_file, err)
+
+    def __enter__(self):
+        """fetch the account overview from the server"""
+        self.account_dic = self._request("GET", "accounts")
+        self.last_login = self._request("GET", "last_login")
+        return self
+
+    def __exit__(self, *args):
+        """the session stays with the server"""
+        self.session.close()
+
+    def _request(self, method: str, operation: str, **kwargs):
+        """send a request to the server"""
+        logger.debug("Client._request(%s %s)\n", method, operation)
+
+        try:
+            response = self.session.request(
+                method,
+                f"{self.url}/{operation}",
+                data=json.dumps(_serialize(kwargs)) if method == "POST" else None,
+                timeout=self.timeout,
+            )
+            response_dic = response.json()
+        except (requests.exceptions.RequestException, ValueError) as err:
+            raise DKBRoboError(f"Server request failed: {err}") from err
+
+        if response.status_code != 200:
+            raise DKBRoboError(
+                response_dic.get(
+                    "error", f"Server request failed: {response.status_code}"
+                )
+            )
+
+        logger.debug("Client._request() ended\n")
+        return response_dic.get("data", None)
+
+    def _transactions(
+        self,
+        operation,
+        transaction_url,
+        atype,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        fields=None,
+        unfiltered=None,
+    ):
+        """fetch transactions via the server"""
+        kwargs_dic = {
+            "transaction_url": transaction_url,
+            "atype": atype,
+            "date_from": date_from,
+            "date_to": date_to,
+            "transaction_type": transaction_type,
+        }
+        if fields:
+            # older servers do not know about fields
+            kwargs_dic["fields"] = fields
+        if unfiltered is not None:
+            kwargs_dic["unfiltered"] = unfiltered
+        return self._request("POST", operation, **kwargs_dic)
+
+    def backfill_transactions(self, *args, **kwargs):
+        """fetch transactions in monthly windows"""
+        return self._transactions("backfill_transactions", *args, **kwargs)
+
+    def download(self, **kwargs):
+        """download postbox documents"""
+        return self._request("POST", "download", **kwargs)
+
+    def get_all_transactions(
+        self,
+        account_dic,
+        date_from,
+        date_to,
+        transaction_type="booked",
+        unfiltered=None,
+        fields=None,
+    ):
+        """get the transactions of all accounts one after another
+
+        the server runs one operation at a time, so there is nothing to gain
+        from sending the requests concurrently
+        """
+        transaction_dic = {}
+        for acc in (self.account_dic if account_dic is None else account_dic).values():
+            account = (
+                acc.get("account")
+                or acc.get("iban")
+                or acc.get("maskedPan")
+                or acc.get("depositAccountId")
+            )
+            if acc.get("type") not in TRANSACTION_TYPES or not acc.get("transactions"):
+                continue
+            try:
+                transaction_list = self.get_transactions(
+                    acc["transactions"],
+                    acc["type"],
+                    date_from,
+                    date_to,
+                    transaction_type=transaction_type,
+                    fields=fields,
+                    unfiltered=unfiltered,
+                )
+            except DKBRoboError as err:
+                logger.error("fetching transactions of %s failed: %s", account, err)
+                transaction_dic[account] = {
+                    "type": acc["type"],
+                    "transactions": [],
+                    "error": str(err),
+                }
+                continue
+            transaction_dic[account] = {
+                "type": acc["type"],
+                "transactions": transaction_list,
+                "error": None,
+            }
+        return transaction_dic
+
+    def get_credit_limits(self):
+        """get credit limits"""
+        return self._request("POST", "get_credit_limits")
+
+    def get_exemption_order(self):
+        """get exemption orders"""
+        return self._request("POST", "get_exemption_order")
+
+    def get_standing_orders(self, uid=None, unfiltered=None):
+        """get standing orders"""
+        if unfiltered is None:
+            return self._request("POST", "get_standing_orders", uid=uid)
+        return self._request(
+            "POST", "get_standing_orders", uid=uid, unfiltered=unfiltered
+        )
+
+    def get_transactions(self, *args, **kwargs):
+        """get transactions"""
+        return self._transactions("get_transactions", *args, **kwargs)
+
+    def iter_transactions(self, *args, **kwargs):
+        """the server answers with the complete list of transactions"""
+        yield from self.get_transactions(*args, **kwargs)
+
+    def scan_postbox(self, path=None, download_all=False, prepend_date=False):
+        """scan posbox and return document dictionary"""
+        return self.download(
+            path=path, download_all=download_all, prepend_date=prepend_date
+        )
+
+    def sync_transactions(self, *args, **kwargs):
+        """a local store cannot be synced through the server"""
+        raise DKBRoboError("sync_transactions() is not supported by the server")
@@ -0,0 +1,72 @@
+""" Module persisting the account overview for a quick start """
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import is_dataclass
+from typing import Dict, Optional, Tuple
+from dkb_robo.utilities import object2dictionary
+
+
+logger = logging.getLogger(__name__)
+
+
+def load_snapshot(
+    path: str, user: str, max_age: float = None
+) -> Optional[Tuple[Dict, float]]:
+    """return account overview and its age in seconds if the snapshot is usable"""
+    logger.debug("load_snapshot(%s)\n", path)
+
+    try:
+        with open(path, "r", encoding="utf8") as fh:
+            snapshot_dic = json.load(fh)
+        age = time.time() - snapshot_dic["created"]
+        account_dic = snapshot_dic["accounts"]
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        logger.debug("load_snapshot(): %s\n", err)
+        return None
+
+    if snapshot_dic.get("user") != user:
+        logger.info("Snapshot belongs to a different user")
+        return None
+
+    if max_age is not None and age > max_age:
+        logger.info("Snapshot is outdated (%.0fs old)", age)
+        return None
+
+    logger.debug("load_snapshot() ended\n")
+    return account_dic, age
+
+
+def save_snapshot(path: str, user: str, account_dic: Dict):
+    """persist the account overview to a file only readable by the owner"""
+    logger.debug("save_snapshot(%s)\n", path)
+
+    snapshot_dic = {
+        "user": user,
+        "created": time.time(),
+        "accounts": {
+            aid: object2dictionary(account) if is_dataclass(account) else account
+            for aid, account in account_dic.items()
+        },
+    }
+
+    tmp_file = None
+    try:
+        # mkstemp() creates the file with mode 0600
+        (fd, tmp_file) = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=f".{os.path.basename(path)}.",
+            suffix=".part",
+        )
+        with os.fdopen(fd, "w", encoding="utf8") as fh:
+            json.dump(snapshot_dic, fh)
+        os.replace(tmp_file, path)
+    except (OSError, TypeError, ValueError) as err:
+        # a snapshot which cannot be written must not break the login
+        logger.error("Unable to write snapshot to %s: %s", path, err)
+        if tmp_file and os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+
+    logger.debug("save_snapshot() ended\n")
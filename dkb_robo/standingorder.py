@@ -21,6 +21,16 @@ logger = logging.getLogger(__name__)
 class StandingOrderItem:
     """class for a single standing order"""
 
+    # keys of the filtered output of StandingOrders
+    FIELDS = (
+        "amount",
+        "currencycode",
+        "purpose",
+        "recipient",
+        "creditoraccount",
+        "interval",
+    )
+
     amount: Optional[Dict] = None
     creditor: Optional[Union[Dict, str]] = None
     debtor: Optional[Union[Dict, str]] = None
@@ -0,0 +1,325 @@
+""" Module for a persistent local transaction store """
+# pylint: disable=r0913, w0212
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from dkb_robo.transaction import Transactions
+from dkb_robo.utilities import get_dateformat
+
+
+LEGACY_DATE_FORMAT, API_DATE_FORMAT = get_dateformat()
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    account_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    atype TEXT NOT NULL,
+    status TEXT,
+    booking_date TEXT,
+    attributes TEXT NOT NULL,
+    PRIMARY KEY (account_id, id)
+);
+CREATE INDEX IF NOT EXISTS transactions_booking_date
+    ON transactions (account_id, status, booking_date);
+CREATE TABLE IF NOT EXISTS positions (
+    account_id TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    id TEXT NOT NULL,
+    attributes TEXT NOT NULL,
+    PRIMARY KEY (account_id, snapshot_date, id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT PRIMARY KEY,
+    synced_from TEXT NOT NULL,
+    synced_to TEXT NOT NULL
+);
+"""
+
+
+def _isodate(date_str: str) -> str:
+    """normalize a date given in legacy or api format to api format"""
+    try:
+        return (
+            datetime.datetime.strptime(date_str, LEGACY_DATE_FORMAT)
+            .date()
+            .strftime(API_DATE_FORMAT)
+        )
+    except ValueError:
+        return (
+            datetime.datetime.strptime(date_str, API_DATE_FORMAT)
+            .date()
+            .strftime(API_DATE_FORMAT)
+        )
+
+
+class TransactionStore:
+    """sqlite based store for transactions and depot position snapshots"""
+
+    def __init__(self, path: str, overlap: int = 7):
+        self.path = str(path)
+        # number of days re-fetched below the high-water mark on every sync
+        self.overlap = overlap
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _since(self, account_id: str, date_from: str) -> str:
+        """get the first date to be fetched from the api"""
+        logger.debug("TransactionStore._since(%s)\n", account_id)
+
+        state = self.db.execute(
+            "SELECT synced_from FROM sync_state WHERE account_id = ?", (account_id,)
+        ).fetchone()
+        (high_water_mark,) = self.db.execute(
+            "SELECT MAX(booking_date) FROM transactions WHERE account_id = ? AND status = 'booked'",
+            (account_id,),
+        ).fetchone()
+
+        if state and state[0] <= date_from and high_water_mark:
+            since = (
+                datetime.datetime.strptime(high_water_mark, API_DATE_FORMAT).date()
+                - datetime.timedelta(days=self.overlap)
+            ).strftime(API_DATE_FORMAT)
+            # pending transactions need to be re-checked until they got booked
+            (pending_date,) = self.db.execute(
+                "SELECT MIN(booking_date) FROM transactions WHERE account_id = ? AND status = 'pending'",
+                (account_id,),
+            ).fetchone()
+            if pending_date:
+                since = min(since, pending_date)
+            since = max(since, date_from)
+        else:
+            since = date_from
+
+        logger.debug("TransactionStore._since() ended with %s\n", since)
+        return since
+
+    def add_positions(
+        self,
+        account_id: str,
+        position_list: List[Dict[str, str]],
+        snapshot_date: Optional[str] = None,
+    ) -> int:
+        """store a snapshot of depot positions"""
+        logger.debug("TransactionStore.add_positions(%s)\n", account_id)
+
+        if snapshot_date:
+            snapshot_date = _isodate(snapshot_date)
+        else:
+            snapshot_date = datetime.date.today().strftime(API_DATE_FORMAT)
+
+        row_list = [
+            (account_id, snapshot_date, ele["id"], json.dumps(ele["attributes"]))
+            for ele in position_list
+            if "id" in ele and "attributes" in ele
+        ]
+        with self.lock, self.db:
+            # a snapshot replaces an earlier one taken on the same day
+            self.db.execute(
+                "DELETE FROM positions WHERE account_id = ? AND snapshot_date = ?",
+                (account_id, snapshot_date),
+            )
+            self.db.executemany(
+                "INSERT INTO positions (account_id, snapshot_date, id, attributes) VALUES (?, ?, ?, ?)",
+                row_list,
+            )
+
+        logger.debug(
+            "TransactionStore.add_positions() ended with %s entries\n", len(row_list)
+        )
+        return len(row_list)
+
+    def add_transactions(
+        self,
+        account_id: str,
+        atype: str,
+        transaction_list: List[Dict[str, str]],
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+    ) -> int:
+        """store raw transactions as returned by the api"""
+        logger.debug("TransactionStore.add_transactions(%s)\n", account_id)
+
+        row_list = [
+            (
+                account_id,
+                ele["id"],
+                atype,
+                ele["attributes"].get("status", None),
+                ele["attributes"].get("bookingDate", None),
+                json.dumps(ele["attributes"]),
+            )
+            for ele in transaction_list
+            if "id" in ele and "attributes" in ele
+        ]
+        with self.lock, self.db:
+            if date_from:
+                # pending transactions of the range got either booked or are part of the new data
+                self.db.execute(
+                    "DELETE FROM transactions WHERE account_id = ? AND status = 'pending' AND booking_date >= ?",
+                    (account_id, _isodate(date_from)),
+                )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO transactions (account_id, id, atype, status, booking_date, attributes) VALUES (?, ?, ?, ?, ?, ?)",
+                row_list,
+            )
+            if date_from and date_to:
+                # the synced range only grows by ranges adjacent to or overlapping it
+                self.db.execute(
+                    "INSERT INTO sync_state (account_id, synced_from, synced_to) VALUES (?, ?, ?) "
+                    "ON CONFLICT (account_id) DO UPDATE SET "
+                    "synced_from = MIN(synced_from, excluded.synced_from), "
+                    "synced_to = MAX(synced_to, excluded.synced_to) "
+                    "WHERE excluded.synced_from <= DATE(synced_to, '+1 day') "
+                    "AND excluded.synced_to >= DATE(synced_from, '-1 day')",
+                    (account_id, _isodate(date_from), _isodate(date_to)),
+                )
+
+        logger.debug(
+            "TransactionStore.add_transactions() ended with %s entries\n",
+            len(row_list),
+        )
+        return len(row_list)
+
+    def close(self):
+        """close database connection"""
+        self.db.close()
+
+    def coverage(self, account_id: str) -> Optional[Tuple[str, str]]:
+        """get the date range synced for an account"""
+        return self.db.execute(
+            "SELECT synced_from, synced_to FROM sync_state WHERE account_id = ?",
+            (account_id,),
+        ).fetchone()
+
+    def positions(
+        self,
+        account_id: str,
+        snapshot_date: Optional[str] = None,
+        unfiltered: bool = False,
+    ) -> List[Dict[str, str]]:
+        """get a snapshot of depot positions (latest if no date is given)"""
+        logger.debug("TransactionStore.positions(%s)\n", account_id)
+
+        if snapshot_date:
+            snapshot_date = _isodate(snapshot_date)
+        else:
+            (snapshot_date,) = self.db.execute(
+                "SELECT MAX(snapshot_date) FROM positions WHERE account_id = ?",
+                (account_id,),
+            ).fetchone()
+
+        row_list = self.db.execute(
+            "SELECT id, attributes FROM positions WHERE account_id = ? AND snapshot_date = ? ORDER BY rowid",
+            (account_id, snapshot_date),
+        ).fetchall()
+        raw_position_list = [
+            {"id": uid, "attributes": json.loads(attributes)}
+            for (uid, attributes) in row_list
+        ]
+        position_list = Transactions(client=None, unfiltered=unfiltered)._format(
+            raw_position_list, "depot"
+        )
+
+        logger.debug(
+            "TransactionStore.positions() ended with %s entries\n", len(position_list)
+        )
+        return position_list
+
+    def sync(
+        self,
+        transaction: Transactions,
+        account_id: str,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: Optional[str] = None,
+    ) -> int:
+        """fetch transactions newer than the stored high-water mark"""
+        logger.debug("TransactionStore.sync(%s)\n", account_id)
+
+        if not date_to:
+            date_to = datetime.date.today().strftime(API_DATE_FORMAT)
+
+        if atype not in ["account", "creditcard", "creditCard"]:
+            # depot positions cannot be filtered by date - take a snapshot
+            count = self.add_positions(
+                account_id, transaction._correlate(transaction._fetch(transaction_url))
+            )
+        else:
+            date_from = _isodate(date_from)
+            date_to = _isodate(date_to)
+            coverage = self.coverage(account_id)
+            if coverage and date_from < coverage[0]:
+                # fetch through to the synced range to avoid gaps in the store
+                date_to = max(date_to, coverage[1])
+            elif coverage and date_from > coverage[1]:
+                # fetch from the end of the synced range to avoid gaps in the store
+                date_from = max(
+                    coverage[0],
+                    (
+                        datetime.datetime.strptime(coverage[1], API_DATE_FORMAT).date()
+                        - datetime.timedelta(days=self.overlap)
+                    ).strftime(API_DATE_FORMAT),
+                )
+            since = self._since(account_id, date_from)
+            if since <= date_to:
+                transaction_dic = transaction._fetch(
+                    transaction._url(transaction_url, atype, since, date_to)
+                )
+                count = self.add_transactions(
+                    account_id, atype, transaction_dic["data"], since, date_to
+                )
+            else:
+                count = 0
+
+        logger.debug("TransactionStore.sync() ended with %s entries\n", count)
+        return count
+
+    def transactions(
+        self,
+        account_id: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+        unfiltered: bool = False,
+    ) -> List[Dict[str, str]]:
+        """get stored transactions"""
+        logger.debug("TransactionStore.transactions(%s)\n", account_id)
+
+        # support transation type 'reserved' for backwards compatibility
+        transaction_type = (
+            "pending" if transaction_type == "reserved" else transaction_type
+        )
+        row_list = self.db.execute(
+            "SELECT id, attributes FROM transactions WHERE account_id = ? AND status = ? "
+            "AND booking_date BETWEEN ? AND ? ORDER BY booking_date DESC, rowid",
+            (account_id, transaction_type, _isodate(date_from), _isodate(date_to)),
+        ).fetchall()
+        raw_transaction_list = [
+            {"id": uid, "attributes": json.loads(attributes)}
+            for (uid, attributes) in row_list
+        ]
+        transaction_list = Transactions(client=None, unfiltered=unfiltered)._format(
+            raw_transaction_list, atype
+        )
+
+        logger.debug(
+            "TransactionStore.transactions() ended with %s entries\n",
+            len(transaction_list),
+        )
+        return transaction_list
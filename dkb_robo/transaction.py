@@ -1,23 +1,100 @@
 """ Module for handling dkb transactions """
 # pylint: disable=c0415, r0913, c0103
 import datetime
+import heapq
 import time
-from typing import Dict, List, Optional, Union
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass, field, fields, is_dataclass
 import logging
 import requests
+from dkb_robo.frame import TransactionFrame
+from dkb_robo.projection import (
+    ACCOUNT_ATTRIBUTES,
+    CREDITCARD_ATTRIBUTES,
+    debit_card_payment,
+    peer_name,
+    project_account,
+    project_creditcard,
+    select,
+    transaction_text,
+)
 from dkb_robo.utilities import (
     Account,
     Amount,
     PerformanceValue,
     get_dateformat,
     filter_unexpected_fields,
+    slotted,
+    included_index,
+    included_lookup,
+    intern_fields,
+    DKBRoboError,
+    object2dictionary,
     ulal,
 )
 
 
 LEGACY_DATE_FORMAT, API_DATE_FORMAT = get_dateformat()
 logger = logging.getLogger(__name__)
+# dataclass holding the transactions of an account type
+ITEM_MAPPING = {
+    "account": "AccountTransactionItem",
+    "creditcard": "CreditCardTransactionItem",
+    "creditCard": "CreditCardTransactionItem",
+    "brokerageAccount": "DepotTransactionItem",
+    "depot": "DepotTransactionItem",
+}
+
+
+def _booking_date(transaction: Dict[str, str]) -> str:
+    """merge key of a tagged transaction (undated depot positions get an empty one)"""
+    return (
+        transaction.get("bdate")
+        or transaction.get("bookingDate")
+        or transaction.get("date")
+        or ""
+    )
+
+
+def _tag(account: str, transaction_list: Iterable) -> Iterator[Dict[str, str]]:
+    """add the source account to the transactions of an iterator"""
+    for transaction in transaction_list:
+        if is_dataclass(transaction):
+            transaction = object2dictionary(transaction)
+        yield {"account": account, **transaction}
+
+
+def merge_transactions(
+    transaction_dic: Dict[str, Iterable], reverse: bool = False
+) -> Iterator[Dict[str, str]]:
+    """merge per-account transaction streams into one stream ordered by booking date
+
+    every stream has to be sorted by booking date already, oldest first or with
+    reverse=True newest first (the order of the api). A heap holds one pending
+    transaction per account only, each transaction gets the key "account" of its
+    source. Transactions of the same day keep the order of the accounts.
+    """
+    logger.debug("merge_transactions(%s)\n", len(transaction_dic))
+
+    return heapq.merge(
+        *[
+            _tag(account, transaction_list)
+            for account, transaction_list in transaction_dic.items()
+        ],
+        key=_booking_date,
+        reverse=reverse,
+    )
+
+
+def transaction_fields(atype: str, unfiltered: bool = False) -> Optional[List[str]]:
+    """columns of the transactions of an account type (None for unknown types)"""
+    if atype not in ITEM_MAPPING:
+        return None
+    item_class = globals()[ITEM_MAPPING[atype]]
+    if unfiltered:
+        return [ele.name for ele in fields(item_class)]
+    return list(item_class.FIELDS)
 
 
 class Transactions:
@@ -28,11 +105,17 @@ class Transactions:
         client: requests.Session,
         unfiltered: bool = False,
         base_url: str = "https://banking.dkb.de/api",
+        strict: bool = False,
+        field_list: Optional[List[str]] = None,
     ):
         self.client = client
         self.base_url = base_url
         self.uid = None
         self.unfiltered = unfiltered
+        # raise instead of returning what has been fetched so far
+        self.strict = strict
+        # keys of the formatted transactions to build (None for all)
+        self.field_list = field_list
 
     def _correlate(self, transaction_dic: Dict[str, str]) -> List[Dict[str, str]]:
         """correlate transactions"""
@@ -43,10 +126,13 @@ class Transactions:
         else:
             included_list = []
 
+        # build the lookup index once instead of scanning the list per position
+        included_dic = included_index(included_list)
+
         position_list = []
         if "data" in transaction_dic:
             for position in transaction_dic["data"]:
-                position_dic = self._map(position, included_list)
+                position_dic = self._map(position, included_dic)
                 if position_dic:
                     position_list.append(position_dic)
 
@@ -55,32 +141,21 @@ class Transactions:
         )
         return position_list
 
+    def _date(self, date_str: str) -> datetime.date:
+        """parse a date given either in legacy or api format"""
+        try:
+            return datetime.datetime.strptime(date_str, LEGACY_DATE_FORMAT).date()
+        except ValueError:
+            return datetime.datetime.strptime(date_str, API_DATE_FORMAT).date()
+
     def _fetch(self, transaction_url: str) -> Dict[str, str]:
         """get transaction list"""
         logger.debug("Transactions.fetch(%s)\n", transaction_url)
 
         transaction_dic = {"data": [], "included": []}
-        while transaction_url:
-            response = self.client.get(transaction_url)
-            if response.status_code == 200:
-                _transaction_dic = response.json()
-                if "data" in _transaction_dic:
-                    transaction_dic["data"].extend(_transaction_dic["data"])
-                    transaction_url = self._nextpage_url(
-                        _transaction_dic
-                    )  # get next page
-                else:
-                    logger.debug("fetch transactions: no data in response")
-                    transaction_url = None
-
-                if "included" in _transaction_dic:
-                    transaction_dic["included"].extend(_transaction_dic["included"])
-            else:
-                logger.error(
-                    "fetch transactions: http status code is not 200 but %s",
-                    response.status_code,
-                )
-                break
+        for page_dic in self._pages(transaction_url):
+            transaction_dic["data"].extend(page_dic.get("data", []))
+            transaction_dic["included"].extend(page_dic.get("included", []))
 
         logger.debug(
             "Transactions.fetch() ended with %s entries\n", len(transaction_dic["data"])
@@ -161,22 +236,22 @@ class Transactions:
         """format transaction list"""
         logger.debug("Transactions._format()\n")
 
-        mapping_dic = {
-            "account": "AccountTransactionItem",
-            "creditcard": "CreditCardTransactionItem",
-            "creditCard": "CreditCardTransactionItem",
-            "brokerageAccount": "DepotTransactionItem",
-            "depot": "DepotTransactionItem",
-        }
-
+        projection = self._projection(atype)
         transaction_list = []
         if raw_transaction_list:
+            item_class = globals()[ITEM_MAPPING[atype]]
             for ele in raw_transaction_list:
                 if "attributes" not in ele or "id" not in ele:
                     continue
                 # add id to attributes tree
                 ele["attributes"]["id"] = ele["id"]
-                transaction = globals()[mapping_dic[atype]](**ele["attributes"])
+                if projection:
+                    # build the requested keys only
+                    transaction_list.append(
+                        item_class.project(ele["attributes"], projection)
+                    )
+                    continue
+                transaction = item_class(**ele["attributes"])
                 if self.unfiltered:
                     transaction_list.append(transaction)
                 else:
@@ -187,33 +262,71 @@ class Transactions:
         )
         return transaction_list
 
-    def _map(self, position: Dict[str, str], included_list: List[Dict[str, str]]):
+    def _frame(
+        self,
+        transaction_dic: Dict[str, str],
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str,
+        backend: Optional[str] = None,
+    ) -> TransactionFrame:
+        """filter fetched transactions into a TransactionFrame"""
+        raw_transaction_list = self._filter(
+            transaction_list=transaction_dic.get("data", []),
+            date_from=date_from,
+            date_to=date_to,
+            transaction_type=transaction_type,
+        )
+        return TransactionFrame.from_api(
+            raw_transaction_list,
+            "account" if atype == "account" else "creditcard",
+            backend=backend,
+        )
+
+    def _map(self, position: Dict[str, str], included_dic: Dict[tuple, Dict]):
         """add details from depot transaction"""
         logger.debug("DepotTransaction._map()\n")
 
-        instrument_id = (
-            position.get("relationships", {})
-            .get("instrument", {})
-            .get("data", {})
-            .get("id", None)
-        )
-        quote_id = (
-            position.get("relationships", {})
-            .get("quote", {})
-            .get("data", {})
-            .get("id", None)
-        )
-        for ele in included_list:
-            if "id" in ele and ele["id"] == instrument_id:
-                position["attributes"]["instrument"] = ele["attributes"]
-                position["attributes"]["instrument"]["id"] = ele["id"]
-            if "id" in ele and ele["id"] == quote_id:
-                position["attributes"]["quote"] = ele["attributes"]
-                position["attributes"]["quote"]["id"] = ele["id"]
+        for relationship in ("instrument", "quote"):
+            ele = included_lookup(position, relationship, included_dic)
+            if ele:
+                position["attributes"][relationship] = ele["attributes"]
+                position["attributes"][relationship]["id"] = ele["id"]
 
         logger.debug("DepotTransaction._map() ended\n")
         return position
 
+    def _merge(
+        self,
+        transaction_dic_list: List[Dict[str, str]],
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str,
+    ) -> List[Dict[str, str]]:
+        """merge the transactions of several date windows in chronological order"""
+        logger.debug("Transactions._merge()\n")
+
+        # transactions at the window edges may show up twice
+        raw_transaction_dic = {}
+        for transaction_dic in transaction_dic_list:
+            for ele in transaction_dic["data"]:
+                if "id" in ele:
+                    raw_transaction_dic.setdefault(ele["id"], ele)
+
+        raw_transaction_list = self._filter(
+            transaction_list=list(raw_transaction_dic.values()),
+            date_from=date_from,
+            date_to=date_to,
+            transaction_type=transaction_type,
+        )
+        # chronological order (stable to keep the api order within a day)
+        raw_transaction_list.sort(key=lambda ele: ele["attributes"]["bookingDate"])
+
+        logger.debug("Transactions._merge() ended\n")
+        return self._format(raw_transaction_list, atype)
+
     def _nextpage_url(self, tr_dic):
         """get transaction url"""
         logger.debug("Transactions._nextpage_url()\n")
@@ -231,16 +344,101 @@ class Transactions:
         logger.debug("Transactions._nextpage_url() ended\n")
         return transaction_url
 
-    def get(
+    def _pages(self, transaction_url: str) -> Iterator[Dict[str, str]]:
+        """fetch transaction pages one after another"""
+        logger.debug("Transactions._pages(%s)\n", transaction_url)
+
+        while transaction_url:
+            response = self.client.get(transaction_url)
+            if response.status_code == 200:
+                page_dic = response.json()
+                if "data" in page_dic:
+                    transaction_url = self._nextpage_url(page_dic)  # get next page
+                else:
+                    logger.debug("fetch transactions: no data in response")
+                    transaction_url = None
+                yield page_dic
+            else:
+                self._status_error(response)
+                break
+
+        logger.debug("Transactions._pages() ended\n")
+
+    def _process(
         self,
-        transaction_url: str,
+        transaction_dic: Dict[str, str],
         atype: str,
         date_from: str,
         date_to: str,
-        transaction_type: str = "booked",
-    ):
-        """fetch transactions"""
-        logger.debug("Transactions.get()\n")
+        transaction_type: str,
+    ) -> List[Dict[str, str]]:
+        """filter, correlate and format fetched transactions"""
+        logger.debug("Transactions._process()\n")
+
+        if atype in ["account", "creditcard", "creditCard"]:
+            raw_transaction_list = self._filter(
+                transaction_list=transaction_dic.get("data", []),
+                date_from=date_from,
+                date_to=date_to,
+                transaction_type=transaction_type,
+            )
+        else:
+            raw_transaction_list = self._correlate(transaction_dic)
+
+        # format output
+        return self._format(raw_transaction_list, atype)
+
+    def _windows(self, date_from: str, date_to: str) -> List[Tuple[str, str]]:
+        """split a date range into calendar month windows"""
+        logger.debug("Transactions._windows(%s/%s)\n", date_from, date_to)
+
+        window_start = self._date(date_from)
+        end = self._date(date_to)
+        window_list = []
+        while window_start <= end:
+            next_month = (
+                window_start.replace(day=1) + datetime.timedelta(days=32)
+            ).replace(day=1)
+            window_end = min(next_month - datetime.timedelta(days=1), end)
+            window_list.append(
+                (
+                    window_start.strftime(API_DATE_FORMAT),
+                    window_end.strftime(API_DATE_FORMAT),
+                )
+            )
+            window_start = window_end + datetime.timedelta(days=1)
+
+        logger.debug(
+            "Transactions._windows() ended with %s windows\n", len(window_list)
+        )
+        return window_list
+
+    def _projection(self, atype: str) -> Optional[Tuple[str, ...]]:
+        """validated keys to format the transactions of an account type with"""
+        if not self.field_list or self.unfiltered:
+            # unfiltered output consists of the complete dataclasses
+            return None
+
+        field_list = transaction_fields(atype) or []
+        unknown_list = [ele for ele in self.field_list if ele not in field_list]
+        if unknown_list:
+            raise DKBRoboError(
+                f"Unknown fields for {atype} transactions: {', '.join(unknown_list)}"
+            )
+        return tuple(dict.fromkeys(self.field_list))
+
+    def _status_error(self, response: requests.Response):
+        """report a failed page request"""
+        error = f"fetch transactions: http status code is not 200 but {response.status_code}"
+        if self.strict:
+            raise DKBRoboError(error)
+        logger.error(error)
+
+    def _url(
+        self, transaction_url: str, atype: str, date_from: str, date_to: str
+    ) -> str:
+        """add date filter and paging parameters to the transaction url"""
+        logger.debug("Transactions._url()\n")
 
         if transaction_url:
             if atype == "account":
@@ -263,30 +461,148 @@ class Transactions:
                     + date_to
                     + "&expand=Merchant&page[size]=400"
                 )
-        transaction_dic = self._fetch(transaction_url)
 
-        if atype in ["account", "creditcard", "creditCard"]:
-            raw_transaction_list = self._filter(
-                transaction_list=transaction_dic["data"],
-                date_from=date_from,
-                date_to=date_to,
-                transaction_type=transaction_type,
+        logger.debug("Transactions._url() ended\n")
+        return transaction_url
+
+    def backfill(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+        max_workers: int = 4,
+    ):
+        """fetch a long date range in monthly windows concurrently and merge the results"""
+        logger.debug("Transactions.backfill()\n")
+
+        # reject unknown fields before fetching
+        self._projection(atype)
+
+        if atype not in ["account", "creditcard", "creditCard"]:
+            # depot positions cannot be filtered by date
+            return self.get(
+                transaction_url, atype, date_from, date_to, transaction_type
             )
-        else:
-            raw_transaction_list = self._correlate(transaction_dic)
 
-        # format output
-        transaction_list = self._format(raw_transaction_list, atype)
+        window_list = self._windows(date_from, date_to)
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            transaction_dic_list = list(
+                executor.map(
+                    lambda window: self._fetch(
+                        self._url(transaction_url, atype, window[0], window[1])
+                    ),
+                    window_list,
+                )
+            )
+        transaction_list = self._merge(
+            transaction_dic_list, atype, date_from, date_to, transaction_type
+        )
+
+        logger.debug(
+            "Transactions.backfill() ended with %s entries from %s windows\n",
+            len(transaction_list),
+            len(window_list),
+        )
+        return transaction_list
+
+    def get(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+    ):
+        """fetch transactions"""
+        logger.debug("Transactions.get()\n")
+
+        # reject unknown fields before fetching
+        self._projection(atype)
+
+        transaction_dic = self._fetch(
+            self._url(transaction_url, atype, date_from, date_to)
+        )
+        transaction_list = self._process(
+            transaction_dic, atype, date_from, date_to, transaction_type
+        )
 
         logger.debug("Transactions.get() ended\n")
         return transaction_list
 
+    def get_frame(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+        backend: Optional[str] = None,
+    ) -> TransactionFrame:
+        """fetch transactions into a columnar TransactionFrame"""
+        logger.debug("Transactions.get_frame()\n")
+
+        if atype in ["account", "creditcard", "creditCard"]:
+            transaction_dic = self._fetch(
+                self._url(transaction_url, atype, date_from, date_to)
+            )
+        else:
+            logger.error("Transactions.get_frame(): %s is not supported", atype)
+            transaction_dic = {}
+        frame = self._frame(
+            transaction_dic, atype, date_from, date_to, transaction_type, backend
+        )
+
+        logger.debug("Transactions.get_frame() ended\n")
+        return frame
+
+    def iter_pages(
+        self,
+        transaction_url: str,
+        atype: str,
+        date_from: str,
+        date_to: str,
+        transaction_type: str = "booked",
+    ) -> Iterator[List[Dict[str, str]]]:
+        """fetch transactions and yield them page by page as soon as a page got decoded"""
+        logger.debug("Transactions.iter_pages()\n")
+
+        # reject unknown fields before fetching
+        self._projection(atype)
+
+        for page_dic in self._pages(
+            self._url(transaction_url, atype, date_from, date_to)
+        ):
+            yield self._process(page_dic, atype, date_from, date_to, transaction_type)
+
+        logger.debug("Transactions.iter_pages() ended\n")
+
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class AccountTransactionItem:
     """dataclass for a single AccountTransaction"""
 
+    # keys of format()
+    FIELDS = (
+        "amount",
+        "currencycode",
+        "date",
+        "bdate",
+        "vdate",
+        "customerreference",
+        "mandatereference",
+        "postingtext",
+        "reasonforpayment",
+        "peeraccount",
+        "peerbic",
+        "peerid",
+        "peer",
+        "text",
+    )
+
     id: Optional[str] = None
     status: Optional[str] = None
     bookingDate: Optional[str] = None
@@ -303,6 +619,9 @@ class AccountTransactionItem:
     isRevocable: bool = False
 
     def __post_init__(self):
+        intern_fields(
+            self, "status", "transactionType", "purposeCode", "businessTransactionCode"
+        )
         self.amount = ulal(Amount, self.amount)
         # regroup creditor information allowing simpler access
         self.creditor = ulal(
@@ -337,6 +656,13 @@ class AccountTransactionItem:
         logger.debug("AccountTransaction._peer_information() ended\n")
         return peer_dic[peer_type]
 
+    @classmethod
+    def project(
+        cls, attributes: Dict[str, str], field_list: Iterable[str]
+    ) -> Dict[str, str]:
+        """format only the given keys of a raw transaction"""
+        return project_account(attributes, field_list, cls.FIELDS)
+
     def format(self):
         """format format transaction list ot a useful output"""
         logger.debug("AccountTransaction.format()\n")
@@ -344,13 +670,7 @@ class AccountTransactionItem:
         transaction_dic = {
             "amount": self.amount.value,
             "currencycode": self.amount.currencyCode,
-            "date": self.bookingDate,
-            # for backwards compatibility
-            "bdate": self.bookingDate,
-            "vdate": self.valueDate,
-            "customerreference": self.endToEndId,
-            "mandatereference": self.mandateId,
-            "postingtext": self.transactionType,
+            **{key: getattr(self, name) for key, name in ACCOUNT_ATTRIBUTES.items()},
             "reasonforpayment": self.description,
         }
 
@@ -359,38 +679,39 @@ class AccountTransactionItem:
             transaction_dic["peeraccount"] = self.debtor.iban
             transaction_dic["peerbic"] = self.debtor.bic
             transaction_dic["peerid"] = self.debtor.id
-            if self.debtor.intermediaryName:
-                transaction_dic["peer"] = self.debtor.intermediaryName
-            else:
-                transaction_dic["peer"] = self.debtor.name
+            transaction_dic["peer"] = peer_name(
+                self.debtor.name, self.debtor.intermediaryName
+            )
         else:
             # outgoing transaction
             transaction_dic["peeraccount"] = self.creditor.iban
             transaction_dic["peerbic"] = self.creditor.bic
             transaction_dic["peerid"] = self.creditor.id
+            transaction_dic["peer"] = peer_name(
+                self.creditor.name,
+                self.creditor.intermediaryName,
+                debit_card_payment(self.description),
+            )
 
-            if (
-                self.creditor.intermediaryName
-                and "visa debitkartenumsatz" not in self.description.lower()
-            ):
-                transaction_dic["peer"] = self.creditor.intermediaryName
-            else:
-                transaction_dic["peer"] = self.creditor.name
-
-        # this is for backwards compatibility
-        transaction_dic[
-            "text"
-        ] = f"{transaction_dic['postingtext']} {transaction_dic['peer']} {transaction_dic['reasonforpayment']}"
+        transaction_dic["text"] = transaction_text(
+            transaction_dic["postingtext"],
+            transaction_dic["peer"],
+            transaction_dic["reasonforpayment"],
+        )
 
         logger.debug("AccountTransaction.format() ended\n")
         return transaction_dic
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class CreditCardTransactionItem:
     """dataclass for a single CreditCardTransaction"""
 
+    # keys of format()
+    FIELDS = ("amount", "bdate", "currencycode", "text", "vdate")
+
     amount: Optional[Dict] = None
     id: Optional[str] = None
     authorizationDate: Optional[str] = None
@@ -404,39 +725,62 @@ class CreditCardTransactionItem:
     transactionType: Optional[str] = None
 
     def __post_init__(self):
+        intern_fields(self, "status", "transactionType")
         self.amount = ulal(Amount, self.amount)
         self.merchantAmount = ulal(Amount, self.merchantAmount)
         self.merchantCategory = ulal(self.MerchantCategory, self.merchantCategory)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class MerchantCategory:
         """dataclass for a single merchantCategory"""
 
         code: Optional[str] = None
 
+    @classmethod
+    def project(
+        cls, attributes: Dict[str, str], field_list: Iterable[str]
+    ) -> Dict[str, str]:
+        """format only the given keys of a raw transaction without building the dataclasses"""
+        return project_creditcard(attributes, field_list, cls.FIELDS)
+
     def format(self):
         """format format transaction list ot a useful output"""
         logger.debug("CreditCardTransaction.format()\n")
 
-        transaction_dic = {
+        value_dic = {
             # fixing strange behaviour of DKB API
             "amount": self.amount.value,  # * -1,
-            "bdate": self.bookingDate,
             "currencycode": self.amount.currencyCode,
-            "text": self.description,
-            "vdate": self.authorizationDate,
+            **{key: getattr(self, name) for key, name in CREDITCARD_ATTRIBUTES.items()},
         }
 
         logger.debug("CreditCardTransaction.format() ended\n")
-        return transaction_dic
+        return {key: value_dic[key] for key in self.FIELDS}
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class DepotTransactionItem:
     """DepotTransaction class"""
 
+    # keys of format()
+    FIELDS = (
+        "isin_wkn",
+        "lastorderdate",
+        "price_euro",
+        "quantity",
+        "shares",
+        "shares_unit",
+        "text",
+        "text_long",
+        "currencyCode",
+        "market",
+        "price",
+    )
+
     id: Optional[str] = None
     availableQuantity: Optional[Union[Dict, str]] = None
     custody: Optional[Union[Dict, str]] = None
@@ -455,6 +799,7 @@ class DepotTransactionItem:
         self.quote = ulal(self.Quote, self.quote)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Custody:
         """dataclass for custody"""
@@ -466,6 +811,7 @@ class DepotTransactionItem:
         custodyTypeId: Optional[str] = None
 
         @filter_unexpected_fields
+        @slotted
         @dataclass
         class Block:
             """dataclass for block"""
@@ -473,6 +819,7 @@ class DepotTransactionItem:
             blockType: Optional[str] = None
 
         @filter_unexpected_fields
+        @slotted
         @dataclass
         class Characteristic:
             """dataclass for characteristic"""
@@ -484,6 +831,7 @@ class DepotTransactionItem:
             self.characteristic = ulal(self.Characteristic, self.characteristic)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Instrument:
         """dataclass for instrument"""
@@ -500,6 +848,7 @@ class DepotTransactionItem:
             ]
 
         @filter_unexpected_fields
+        @slotted
         @dataclass
         class IdentifierItem:
             """dataclass for identifier"""
@@ -508,6 +857,7 @@ class DepotTransactionItem:
             value: Optional[str] = None
 
         @filter_unexpected_fields
+        @slotted
         @dataclass
         class Name:
             """dataclass for name"""
@@ -516,6 +866,7 @@ class DepotTransactionItem:
             short: Optional[str] = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Performance:
         """dataclass for performance"""
@@ -527,6 +878,7 @@ class DepotTransactionItem:
             self.currentValue = ulal(PerformanceValue, self.currentValue)
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Quantity:
         """dataclass for quantity"""
@@ -535,12 +887,14 @@ class DepotTransactionItem:
         value: Optional[float] = None
 
         def __post_init__(self):
+            intern_fields(self, "unit")
             try:
                 self.value = float(self.value)
             except Exception:
                 self.value = None
 
     @filter_unexpected_fields
+    @slotted
     @dataclass
     class Quote:
         """dataclass for quote"""
@@ -553,6 +907,14 @@ class DepotTransactionItem:
         def __post_init__(self):
             self.price = ulal(PerformanceValue, self.price)
 
+    @classmethod
+    def project(
+        cls, attributes: Dict[str, str], field_list: Iterable[str]
+    ) -> Dict[str, str]:
+        """format only the given keys of a position"""
+        # depots hold a handful of positions, not worth a shortcut
+        return select(cls(**attributes).format(), field_list, cls.FIELDS)
+
     def format(self) -> Dict[str, str]:
         """format  transaction list ot a useful output"""
         logger.debug("DepotTransaction.format()\n")
@@ -0,0 +1,192 @@
+""" Module providing pool, timeout, deadline and retry policy for the api session """
+import contextlib
+import logging
+import random
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.util.retry import Retry
+from dkb_robo.utilities import DKBRoboError
+
+
+# responses worth another try of an idempotent request
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# upper limit of a single back-off in seconds
+BACKOFF_MAX = 120
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(DKBRoboError):
+    """an operation did not complete within its deadline"""
+
+
+class TransportPolicy:
+    """pool size, timeouts, deadline and retries of the api session
+
+    timeouts and the deadline are given in seconds, a deadline of None lets
+    an operation run as long as its requests make progress. A pool size of
+    None gets derived from the number of parallel workers.
+    """
+
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        deadline: Optional[float] = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+    ):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+    def __repr__(self) -> str:
+        return (
+            f"TransportPolicy(pool_size={self.pool_size}, "
+            f"connect_timeout={self.connect_timeout}, read_timeout={self.read_timeout}, "
+            f"deadline={self.deadline}, retries={self.retries}, "
+            f"backoff_factor={self.backoff_factor})"
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """full jitter back-off before the given retry (first retry is 1)"""
+        return random.uniform(
+            0, min(BACKOFF_MAX, self.backoff_factor * (2 ** (attempt - 1)))
+        )
+
+    def connections(self, max_workers: int = 1) -> int:
+        """size of the connection pool"""
+        return self.pool_size or max(DEFAULT_POOLSIZE, max_workers)
+
+    def retry(self, remaining: Callable[[], Optional[float]] = None) -> "JitterRetry":
+        """retry configuration for the connection pools"""
+        retry = JitterRetry(
+            total=self.retries,
+            read=self.retries,
+            connect=self.retries,
+            status=self.retries,
+            # retry only requests which can be repeated without side effects
+            allowed_methods=frozenset(["GET"]),
+            status_forcelist=RETRY_STATUS,
+            backoff_factor=self.backoff_factor,
+            respect_retry_after_header=True,
+            # hand out the last response instead of raising MaxRetryError
+            raise_on_status=False,
+        )
+        retry.remaining = remaining
+        return retry
+
+
+class JitterRetry(Retry):
+    """urllib3 retry with full jitter back-off honouring the operation deadline"""
+
+    remaining = None
+
+    def new(self, **kwargs) -> "JitterRetry":
+        retry = super().new(**kwargs)
+        retry.remaining = self.remaining
+        return retry
+
+    def _check_deadline(self, wait: float) -> float:
+        """refuse to sleep beyond the deadline of the running operation"""
+        remaining = self.remaining() if self.remaining else None
+        if remaining is not None and wait >= remaining:
+            raise DeadlineExceeded(
+                f"Deadline exceeded: retry in {wait:.1f}s but only {max(remaining, 0):.1f}s left"
+            )
+        return wait
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        # full jitter spreads the retries of parallel workers
+        return self._check_deadline(random.uniform(0, backoff))
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return self._check_deadline(retry_after)
+
+
+class TransportAdapter(HTTPAdapter):
+    """transport adapter applying a TransportPolicy to all requests
+
+    requests without an explicit timeout get the connect/read timeouts of the
+    policy, cut down to what is left of the deadline of the running operation.
+    """
+
+    def __init__(self, policy: TransportPolicy = None, max_workers: int = 1, **kwargs):
+        self.policy = policy if policy is not None else TransportPolicy()
+        self.deadline_list = []
+        self.deadline_lock = threading.Lock()
+        pool_size = self.policy.connections(max_workers)
+        kwargs.setdefault("pool_connections", pool_size)
+        kwargs.setdefault("pool_maxsize", pool_size)
+        kwargs.setdefault("max_retries", self.policy.retry(self.remaining))
+        super().__init__(**kwargs)
+
+    @contextlib.contextmanager
+    def operation(self, deadline: Optional[float] = None) -> Iterator[None]:
+        """run the requests of the block within a deadline (default: the policy one)"""
+        deadline = self.policy.deadline if deadline is None else deadline
+        if not deadline:
+            yield
+            return
+
+        expires = time.monotonic() + deadline
+        with self.deadline_lock:
+            self.deadline_list.append(expires)
+        try:
+            yield
+        finally:
+            with self.deadline_lock:
+                self.deadline_list.remove(expires)
+
+    def remaining(self) -> Optional[float]:
+        """seconds left for the running operations or None without deadline"""
+        with self.deadline_lock:
+            if not self.deadline_list:
+                return None
+            # overlapping operations (e.g. worker threads) share the latest deadline
+            return max(self.deadline_list) - time.monotonic()
+
+    def timeout(self) -> Tuple[float, float]:
+        """connect and read timeout for the next request"""
+        remaining = self.remaining()
+        if remaining is None:
+            return (self.policy.connect_timeout, self.policy.read_timeout)
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded")
+        return (
+            min(self.policy.connect_timeout, remaining),
+            min(self.policy.read_timeout, remaining),
+        )
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream=False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ):
+        """send the request with the timeouts of the policy"""
+        if timeout is None:
+            timeout = self.timeout()
+        return super().send(
+            request,
+            stream=stream,
+            timeout=timeout,
+            verify=verify,
+            cert=cert,
+            proxies=proxies,
+        )
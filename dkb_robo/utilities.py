@@ -4,11 +4,14 @@ import logging
 from pathlib import Path
 import random
 from string import digits, ascii_letters
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timezone
 from dataclasses import dataclass, fields, asdict, is_dataclass
+import threading
 import time
 import re
+import sys
+from urllib.parse import urlsplit
 
 
 logger = logging.getLogger(__name__)
@@ -27,19 +30,59 @@ BASE_URL = "https://banking.dkb.de/api"
 def filter_unexpected_fields(cls):
     """filter undefined fields (not defined as class variable) before import to dataclass"""
     original_init = cls.__init__
+    # computed once per class instead of on every instantiation
+    expected_fields = frozenset(field.name for field in fields(cls))
 
     def new_init(self, *args, **kwargs):
-        expected_fields = {field.name for field in fields(cls)}
-        cleaned_kwargs = {
-            key: value for key, value in kwargs.items() if key in expected_fields
-        }
-        original_init(self, *args, **cleaned_kwargs)
+        if kwargs.keys() <= expected_fields:
+            original_init(self, *args, **kwargs)
+        else:
+            cleaned_kwargs = {
+                key: value for key, value in kwargs.items() if key in expected_fields
+            }
+            original_init(self, *args, **cleaned_kwargs)
+
+    def from_api(klass, data_dic: Dict):
+        """create an instance from an api dictionary"""
+        obj = klass.__new__(klass)
+        original_init(
+            obj, **{key: data_dic[key] for key in data_dic.keys() & expected_fields}
+        )
+        return obj
 
     cls.__init__ = new_init
+    cls.from_api = classmethod(from_api)
+    cls.api_fields = expected_fields
     return cls
 
 
+def slotted(cls):
+    """rebuild a dataclass with __slots__ to drop the per-instance __dict__
+
+    dataclass(slots=True) is only available from python 3.10 on
+    """
+    field_names = tuple(field.name for field in fields(cls))
+    # defaults are part of the generated __init__ and would collide with the slots
+    cls_dict = {
+        key: value
+        for key, value in cls.__dict__.items()
+        if key not in field_names + ("__dict__", "__weakref__")
+    }
+    cls_dict["__slots__"] = field_names
+    cls_dict["__qualname__"] = cls.__qualname__
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+def intern_fields(obj, *field_names: str):
+    """intern highly repetitive string values (currencies, status, bics...)"""
+    for field_name in field_names:
+        value = getattr(obj, field_name)
+        if isinstance(value, str):
+            setattr(obj, field_name, sys.intern(value))
+
+
 @filter_unexpected_fields
+@slotted
 @dataclass
 class Account:
     """dataclass to build peer account structure"""
@@ -54,8 +97,12 @@ class Account:
     intermediaryName: Optional[str] = None
     name: Optional[str] = None
 
+    def __post_init__(self):
+        intern_fields(self, "bic", "blz", "iban")
+
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class Amount:
     """Amount data class, roughly based on the JSON API response."""
@@ -68,6 +115,7 @@ class Amount:
     unit: Optional[str] = None
 
     def __post_init__(self):
+        intern_fields(self, "currencyCode", "unit")
         # convert value to float
         try:
             self.value = float(self.value)
@@ -86,6 +134,7 @@ class Amount:
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class PerformanceValue:
     """PerformanceValue data class, roughly based on the JSON API response."""
@@ -96,6 +145,7 @@ class PerformanceValue:
     unit: Optional[str] = None
 
     def __post_init__(self):
+        intern_fields(self, "currencyCode", "unit")
         # convert value to float
         try:
             self.value = float(self.value)
@@ -107,6 +157,7 @@ class PerformanceValue:
 
 
 @filter_unexpected_fields
+@slotted
 @dataclass
 class Person:
     """Person class"""
@@ -124,6 +175,118 @@ class DKBRoboError(Exception):
     """dkb-robo exception class"""
 
 
+class RateLimiter:
+    """thread-safe token bucket limiting the number of requests per second"""
+
+    def __init__(self, rate: float = 2.0, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """take a token from the bucket and wait until it is available"""
+        if not self.rate or self.rate <= 0:
+            # rate limiting disabled
+            return 0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.timestamp) * self.rate
+            )
+            self.timestamp = now
+            # reserve the token; a negative balance queues up further callers
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class TransferStats:
+    """thread-safe per-endpoint counters of response sizes and body read times"""
+
+    UUID_REGEX = re.compile(
+        r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE
+    )
+
+    def __init__(self):
+        self.endpoint_dic = {}
+        self.lock = threading.Lock()
+
+    def _endpoint(self, url: str) -> str:
+        """group urls by path with ids replaced by a placeholder"""
+        return self.UUID_REGEX.sub("{id}", urlsplit(url).path)
+
+    def hook(self, response, *_args, **kwargs):
+        """requests response hook reading the body and counting its size on the wire"""
+        if kwargs.get("stream"):
+            # streamed bodies get consumed by the caller
+            return response
+
+        start = time.perf_counter()
+        content = response.content
+        duration = time.perf_counter() - start
+        encoding = response.headers.get("Content-Encoding", None)
+        if getattr(response, "from_cache", False):
+            # answered by dkb_robo.cache.CacheAdapter without touching the wire
+            (wire_bytes, encoding) = (0, "cache")
+        else:
+            try:
+                wire_bytes = response.raw.tell()
+            except Exception:
+                wire_bytes = len(content or b"")
+        self.record(
+            response.url,
+            wire_bytes,
+            len(content or b""),
+            duration,
+            encoding,
+        )
+        return response
+
+    def record(
+        self,
+        url: str,
+        wire_bytes: int,
+        content_bytes: int,
+        duration: float,
+        encoding: str = None,
+    ):
+        """add a response to the counters"""
+        endpoint = self._endpoint(url)
+        with self.lock:
+            stats_dic = self.endpoint_dic.setdefault(
+                endpoint,
+                {
+                    "requests": 0,
+                    "wire_bytes": 0,
+                    "content_bytes": 0,
+                    "read_time": 0.0,
+                    "encodings": {},
+                },
+            )
+            stats_dic["requests"] += 1
+            stats_dic["wire_bytes"] += wire_bytes
+            stats_dic["content_bytes"] += content_bytes
+            stats_dic["read_time"] += duration
+            encoding = encoding or "identity"
+            stats_dic["encodings"][encoding] = (
+                stats_dic["encodings"].get(encoding, 0) + 1
+            )
+
+    def summary(self) -> Dict[str, Dict[str, str]]:
+        """copy of the counters"""
+        with self.lock:
+            return {
+                endpoint: dict(stats_dic, encodings=dict(stats_dic["encodings"]))
+                for endpoint, stats_dic in self.endpoint_dic.items()
+            }
+
+
 def _convert_date_format(
     input_date: str, input_format_list: List[str], output_format: str
 ) -> str:
@@ -149,6 +312,46 @@ def _convert_date_format(
     return output_date
 
 
+def included_index(included_list: List[Dict[str, str]]) -> Dict[Tuple, Dict]:
+    """index JSON:API "included" resources by (type, id) for constant time lookups"""
+    logger.debug("included_index()")
+
+    index_dic = {}
+    for ele in included_list:
+        if isinstance(ele, dict) and "id" in ele:
+            index_dic[(ele.get("type", None), ele["id"])] = ele
+            # fallback for relationships not carrying a type
+            index_dic[(None, ele["id"])] = ele
+
+    logger.debug("included_index() ended with %s entries", len(index_dic))
+    return index_dic
+
+
+def included_lookup(
+    resource: Dict[str, str], relationship: str, index_dic: Dict[Tuple, Dict]
+) -> Optional[Dict[str, str]]:
+    """resolve a JSON:API relationship of a resource via an index built by included_index()"""
+    data_dic = resource.get("relationships", {}).get(relationship, {}).get("data", {})
+    if not isinstance(data_dic, dict) or "id" not in data_dic:
+        return None
+
+    return index_dic.get(
+        (data_dic.get("type", None), data_dic["id"]),
+        index_dic.get((None, data_dic["id"]), None),
+    )
+
+
+def dataclass_fields(class_list: List, unfiltered: bool = False) -> List[str]:
+    """columns of the output of one or more dataclasses (keys of FIELDS unless unfiltered)"""
+    name_list = []
+    for cls in class_list:
+        if unfiltered:
+            name_list.extend(ele.name for ele in fields(cls))
+        else:
+            name_list.extend(cls.FIELDS)
+    return list(dict.fromkeys(name_list))
+
+
 def generate_random_string(length: int) -> str:
     """generate random string to be used as name"""
     char_set = digits + ascii_letters
@@ -292,5 +495,7 @@ def validate_dates(date_from: str, date_to: str) -> Tuple[str, str]:
 def ulal(mapclass, parameter):
     """map parameter"""
     if parameter:
+        if isinstance(mapclass, type) and hasattr(mapclass, "from_api"):
+            return mapclass.from_api(parameter)
         return mapclass(**parameter)
     return None
@@ -0,0 +1,658 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.aio """
+import sys
+import asyncio
+import inspect
+import email.utils
+import hashlib
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch, AsyncMock, MagicMock, Mock
+import requests
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.aio import (
+    AsyncAuthentication,
+    AsyncDKBRobo,
+    AsyncExemptionOrders,
+    AsyncOverview,
+    AsyncPostBox,
+    AsyncSession,
+    AsyncStandingOrders,
+    AsyncTransactions,
+    _retry_after,
+    httpx,
+)
+from dkb_robo.authentication import SSO_HEADERS
+from dkb_robo.dkb_robo import DKBRoboError
+from dkb_robo.postbox import Document, Message, PostboxItem
+from dkb_robo.transport import DeadlineExceeded, TransportPolicy
+from dkb_robo.utilities import DKBRoboError as ApiError
+
+
+def _response(status_code=200, json_dic=None, headers=None):
+    """response as returned by AsyncSession.get()"""
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = json_dic if json_dic is not None else {}
+    response.headers = headers or {}
+    return response
+
+
+def _transaction(uid, booking_date, status="booked"):
+    """raw api transaction"""
+    return {
+        "id": uid,
+        "attributes": {
+            "status": status,
+            "bookingDate": booking_date,
+            "description": f"description {uid}",
+            "transactionType": "LASTSCHRIFT",
+            "amount": {"value": "-10", "currencyCode": "EUR"},
+            "creditor": {"creditorAccount": {"iban": "iban"}, "name": "creditor"},
+            "debtor": {"debtorAccount": {"iban": "iban"}, "name": "debtor"},
+        },
+    }
+
+
+class _Stream:
+    """streamed response as returned by AsyncSession.stream()"""
+
+    def __init__(self, chunk_list, status_code=200):
+        self.chunk_list = chunk_list
+        self.status_code = status_code
+        self.raise_for_status = Mock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def aiter_bytes(self, _chunk_size):
+        for chunk in self.chunk_list:
+            yield chunk
+
+
+class TestRetryAfter(unittest.TestCase):
+    """_retry_after() test class"""
+
+    def test_001_retry_after(self):
+        """test Retry-After in seconds and as http date"""
+        self.assertIsNone(_retry_after(_response()))
+        self.assertEqual(3, _retry_after(_response(headers={"Retry-After": "3"})))
+        self.assertEqual(0, _retry_after(_response(headers={"Retry-After": "-1"})))
+        self.assertIsNone(_retry_after(_response(headers={"Retry-After": "soon"})))
+        http_date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertTrue(
+            55 < _retry_after(_response(headers={"Retry-After": http_date})) <= 60
+        )
+
+
+class TestAsyncModules(unittest.IsolatedAsyncioTestCase):
+    """async counterparts of the api modules"""
+
+    def setUp(self):
+        self.client = Mock()
+        self.client.get = AsyncMock()
+
+    async def test_002_transactions_get(self):
+        """test aget() follows the pages"""
+        self.client.get.side_effect = [
+            _response(
+                json_dic={
+                    "data": [_transaction("id1", "2024-01-02")],
+                    "links": {"next": "/page2"},
+                }
+            ),
+            _response(json_dic={"data": [_transaction("id2", "2024-01-03")]}),
+        ]
+        transactions = AsyncTransactions(client=self.client, unfiltered=True)
+        result = await transactions.aget("url", "account", "2024-01-01", "2024-01-31")
+        self.assertEqual(["id1", "id2"], [ele.id for ele in result])
+        self.assertEqual(
+            "https://banking.dkb.de/api/accounts/page2",
+            self.client.get.call_args_list[1][0][0],
+        )
+
+    async def test_003_transactions_get(self):
+        """test aget() with an error response"""
+        self.client.get.return_value = _response(status_code=500)
+        transactions = AsyncTransactions(client=self.client)
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            result = await transactions.aget(
+                "url", "account", "2024-01-01", "2024-01-31"
+            )
+        self.assertEqual([], result)
+        self.assertIn(
+            "ERROR:dkb_robo.transaction:fetch transactions: http status code is not 200 but 500",
+            lcm.output,
+        )
+
+    async def test_004_transactions_backfill(self):
+        """test abackfill() fetches the windows concurrently and merges them"""
+        running = {"now": 0, "max": 0}
+
+        async def _get(url):
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            if "2024-01-01" in url:
+                return _response(
+                    json_dic={
+                        "data": [
+                            _transaction("id2", "2024-01-31"),
+                            _transaction("id1", "2024-01-05"),
+                        ]
+                    }
+                )
+            return _response(
+                json_dic={
+                    "data": [
+                        _transaction("id3", "2024-02-02"),
+                        _transaction("id2", "2024-01-31"),
+                    ]
+                }
+            )
+
+        self.client.get.side_effect = _get
+        transactions = AsyncTransactions(client=self.client, unfiltered=True)
+        result = await transactions.abackfill(
+            "url", "account", "2024-01-01", "2024-03-31", max_workers=2
+        )
+        self.assertEqual(["id1", "id2", "id3"], [ele.id for ele in result])
+        self.assertEqual(3, self.client.get.call_count)
+        self.assertEqual(2, running["max"])
+
+    async def test_005_transactions_backfill(self):
+        """test abackfill() of a depot falls back to aget()"""
+        self.client.get.return_value = _response(json_dic={"data": []})
+        transactions = AsyncTransactions(client=self.client)
+        self.assertEqual(
+            [], await transactions.abackfill("url", "depot", "2024-01-01", "2024-03-31")
+        )
+        self.assertEqual(1, self.client.get.call_count)
+
+    async def test_006_transactions_iter_pages(self):
+        """test aiter_pages() yields page by page"""
+        self.client.get.side_effect = [
+            _response(
+                json_dic={
+                    "data": [_transaction("id1", "2024-01-02")],
+                    "links": {"next": "/page2"},
+                }
+            ),
+            _response(json_dic={"data": [_transaction("id2", "2024-01-03")]}),
+        ]
+        transactions = AsyncTransactions(client=self.client, unfiltered=True)
+        page_list = [
+            [ele.id for ele in page]
+            async for page in transactions.aiter_pages(
+                "url", "account", "2024-01-01", "2024-01-31"
+            )
+        ]
+        self.assertEqual([["id1"], ["id2"]], page_list)
+
+    async def test_007_transactions_get_frame(self):
+        """test aget_frame()"""
+        self.client.get.return_value = _response(
+            json_dic={"data": [_transaction("id1", "2024-01-02")]}
+        )
+        transactions = AsyncTransactions(client=self.client)
+        frame = await transactions.aget_frame(
+            "url", "account", "2024-01-01", "2024-01-31", backend="python"
+        )
+        self.assertEqual(["id1"], frame.column("id"))
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            frame = await transactions.aget_frame(
+                "url", "depot", "2024-01-01", "2024-01-31", backend="python"
+            )
+        self.assertEqual(0, len(frame))
+        self.assertIn(
+            "ERROR:dkb_robo.aio:AsyncTransactions.aget_frame(): depot is not supported",
+            lcm.output,
+        )
+
+    @patch("dkb_robo.aio.AsyncOverview._sort")
+    async def test_008_overview_get(self, mock_sort):
+        """test aget() fetches the product endpoints"""
+        self.client.get.side_effect = lambda url: _response(json_dic={"url": url})
+        mock_sort.side_effect = lambda portfolio_dic: portfolio_dic
+        overview = AsyncOverview(client=self.client)
+        result = await overview.aget()
+        self.assertEqual(
+            ["product_display", "accounts", "cards", "depots", "loans"],
+            list(result.keys()),
+        )
+        self.assertEqual(
+            "https://banking.dkb.de/api/loans/loans", result["loans"]["url"]
+        )
+        self.assertEqual(5, len(overview.latency_dic))
+
+    @patch("dkb_robo.aio.AsyncOverview._sort")
+    async def test_009_overview_get(self, mock_sort):
+        """test aget() without product display settings"""
+        self.client.get.return_value = _response(status_code=500)
+        mock_sort.side_effect = lambda portfolio_dic: portfolio_dic
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertEqual({}, await AsyncOverview(client=self.client).aget())
+        self.assertEqual(1, self.client.get.call_count)
+        self.assertIn(
+            "ERROR:dkb_robo.aio:fetch /config/users/me/product-display-settings: RC is not 200 but 500",
+            lcm.output,
+        )
+
+    @patch("dkb_robo.aio.AsyncStandingOrders._filter")
+    async def test_010_standing_orders(self, mock_filter):
+        """test afetch() of standing orders"""
+        self.client.get.return_value = _response(json_dic={"data": []})
+        mock_filter.return_value = ["so"]
+        self.assertEqual(
+            ["so"], await AsyncStandingOrders(client=self.client).afetch("uid")
+        )
+        self.assertTrue(self.client.get.call_args[0][0].endswith("?accountId=uid"))
+        with self.assertRaises(ApiError):
+            await AsyncStandingOrders(client=self.client).afetch(None)
+
+    @patch("dkb_robo.aio.AsyncExemptionOrders._filter")
+    async def test_011_exemption_orders(self, mock_filter):
+        """test afetch() of exemption orders"""
+        self.client.get.return_value = _response(json_dic={"data": []})
+        mock_filter.return_value = ["exo"]
+        self.assertEqual(
+            ["exo"], await AsyncExemptionOrders(client=self.client).afetch()
+        )
+        self.client.get.return_value = _response(status_code=400)
+        with self.assertRaises(ApiError) as err:
+            await AsyncExemptionOrders(client=self.client).afetch()
+        self.assertEqual(
+            "fetch exemption orders: http status code is not 200 but 400",
+            str(err.exception),
+        )
+
+
+class TestAsyncPostBox(unittest.IsolatedAsyncioTestCase):
+    """AsyncPostBox test class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = Mock()
+        self.client.get = AsyncMock()
+        self.client.patch = AsyncMock(return_value=Mock())
+        self.item = PostboxItem(
+            id="1",
+            document=Document(
+                contentType="application/pdf",
+                checksum=hashlib.md5(b"content").hexdigest(),
+                fileName="document",
+                link="https://banking.dkb.de/document",
+            ),
+            message=Message(subject="subject", link="https://banking.dkb.de/message"),
+        )
+        self.postbox = AsyncPostBox(client=self.client)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def test_012_fetch_items(self):
+        """test afetch_items() merges messages and documents"""
+        self.client.get.side_effect = [
+            _response(
+                json_dic={
+                    "data": [
+                        {
+                            "id": "1",
+                            "attributes": {"subject": "subject", "read": False},
+                            "links": {"self": "https://api.dkb.de/documentstorage/m1"},
+                        }
+                    ]
+                }
+            ),
+            _response(
+                json_dic={
+                    "data": [
+                        {
+                            "id": "1",
+                            "attributes": {"fileName": "document"},
+                            "links": {"self": "https://api.dkb.de/documentstorage/d1"},
+                        }
+                    ]
+                }
+            ),
+        ]
+        items = await self.postbox.afetch_items()
+        self.assertEqual("subject", items["1"].message.subject)
+        self.assertEqual(
+            "https://banking.dkb.de/api/documentstorage/d1", items["1"].document.link
+        )
+
+    async def test_013_download(self):
+        """test adownload() streams the document into the target file"""
+        self.client.stream = Mock(return_value=_Stream([b"con", b"tent"]))
+        target_file = Path(self.tmp_dir.name) / "folder" / "document.pdf"
+        self.assertEqual(200, await self.postbox.adownload(self.item, target_file))
+        self.assertEqual(b"content", target_file.read_bytes())
+        self.assertEqual(
+            ["document.pdf"], [p.name for p in target_file.parent.iterdir()]
+        )
+        self.assertFalse(await self.postbox.adownload(self.item, target_file))
+
+    async def test_014_download(self):
+        """test adownload() keeps a document with a wrong checksum aside"""
+        self.client.stream = Mock(return_value=_Stream([b"modified"]))
+        target_file = Path(self.tmp_dir.name) / "document.pdf"
+        with self.assertLogs("dkb_robo", level="INFO"):
+            await self.postbox.adownload(self.item, target_file)
+        self.assertFalse(target_file.exists())
+        self.assertTrue(
+            target_file.with_name("document.pdf.checksum_mismatch").exists()
+        )
+
+    async def test_015_mark_read(self):
+        """test amark_read()"""
+        await self.postbox.amark_read(self.item, True)
+        self.assertEqual(
+            {"data": {"attributes": {"read": True}, "type": "message"}},
+            self.client.patch.call_args[1]["json"],
+        )
+
+
+class TestAsyncDKBRobo(unittest.IsolatedAsyncioTestCase):
+    """AsyncAuthentication and AsyncDKBRobo test class"""
+
+    @patch("dkb_robo.aio.save_snapshot")
+    @patch("dkb_robo.aio.AsyncOverview.aget", new_callable=AsyncMock)
+    @patch("dkb_robo.aio.AsyncSession")
+    @patch("dkb_robo.aio.AsyncAuthentication._session")
+    async def test_016_login(self, mock_session, mock_async, mock_get, mock_save):
+        """test alogin() hands the session over to an AsyncSession"""
+        mock_get.return_value = {0: "account"}
+        header_list = []
+
+        def _async_session(session, *_args):
+            header_list.append(dict(session.headers))
+            return mock_async.return_value
+
+        mock_async.side_effect = _async_session
+        auth = AsyncAuthentication(
+            dkb_user="user", max_workers=4, snapshot_file="snapshot_file"
+        )
+        auth.client = requests.session()
+        self.assertEqual(({0: "account"}, None), await auth.alogin())
+        self.assertTrue(mock_session.called)
+        mock_async.assert_called_once_with(auth.client, auth.transport.policy, 4)
+        # the async client starts with the headers of the sync api calls
+        self.assertLessEqual(SSO_HEADERS.items(), header_list[0].items())
+        mock_save.assert_called_once_with("snapshot_file", "user", {0: "account"})
+        mock_async.return_value.aclose = AsyncMock()
+        await auth.alogout()
+        self.assertTrue(mock_async.return_value.aclose.called)
+
+    @patch("dkb_robo.aio.AsyncAuthentication.alogout", new_callable=AsyncMock)
+    @patch("dkb_robo.aio.AsyncAuthentication.alogin", new_callable=AsyncMock)
+    async def test_017_context(self, mock_login, mock_logout):
+        """test async context manager"""
+        mock_login.return_value = ({0: "account"}, None)
+        async with AsyncDKBRobo(dkb_user="user", max_workers=2) as dkb:
+            self.assertEqual({0: "account"}, dkb.account_dic)
+            self.assertIsInstance(dkb.wrapper, AsyncAuthentication)
+        self.assertTrue(mock_logout.called)
+        with self.assertRaises(DKBRoboError):
+            with AsyncDKBRobo():
+                pass
+
+    @patch("dkb_robo.aio.AsyncTransactions.aget", new_callable=AsyncMock)
+    async def test_018_get_transactions(self, mock_get):
+        """test concurrent aget_transactions() calls"""
+        mock_get.side_effect = lambda url, *args: [url]
+        dkb = AsyncDKBRobo()
+        dkb.wrapper = Mock()
+        result = await asyncio.gather(
+            dkb.aget_transactions("url1", "account", "01.01.2024", "31.01.2024"),
+            dkb.aget_transactions("url2", "creditcard", "01.01.2024", "31.01.2024"),
+        )
+        self.assertEqual([["url1"], ["url2"]], result)
+
+    @patch("dkb_robo.aio.AsyncTransactions.aget")
+    async def test_019_deadline(self, mock_get):
+        """test the deadline of the transport policy cancels slow operations"""
+        cancelled = asyncio.Event()
+
+        async def _slow(*_args):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        mock_get.side_effect = _slow
+        dkb = AsyncDKBRobo(transport_policy=TransportPolicy(deadline=0.05))
+        dkb.wrapper = Mock()
+        with self.assertRaises(DeadlineExceeded) as err:
+            await dkb.aget_transactions("url", "account", "01.01.2024", "31.01.2024")
+        self.assertEqual(
+            "Deadline exceeded: aget_transactions() did not complete within 0.05s",
+            str(err.exception),
+        )
+        self.assertTrue(cancelled.is_set())
+
+    @patch("dkb_robo.aio.AsyncTransactions.aiter_pages")
+    async def test_020_iter_transactions(self, mock_pages):
+        """test aiter_transactions()"""
+
+        async def _pages(*_args):
+            yield [1, 2]
+            yield [3]
+
+        mock_pages.side_effect = _pages
+        dkb = AsyncDKBRobo()
+        dkb.wrapper = Mock()
+        self.assertEqual(
+            [1, 2, 3],
+            [
+                ele
+                async for ele in dkb.aiter_transactions(
+                    "url", "account", "01.01.2024", "31.01.2024"
+                )
+            ],
+        )
+
+    async def test_021_refresh_accounts(self):
+        """test arefresh_accounts() keeps the overview if the refresh fails"""
+        dkb = AsyncDKBRobo()
+        dkb.wrapper = Mock()
+        dkb.wrapper.aoverview = AsyncMock(side_effect=[{0: "new"}, {}])
+        self.assertEqual({0: "new"}, await dkb.arefresh_accounts())
+        with self.assertLogs("dkb_robo", level="INFO"):
+            self.assertEqual({0: "new"}, await dkb.arefresh_accounts())
+
+    @patch("dkb_robo.aio.AsyncPostBox.amark_read", new_callable=AsyncMock)
+    @patch("dkb_robo.aio.AsyncPostBox.adownload", new_callable=AsyncMock)
+    @patch("dkb_robo.aio.AsyncPostBox.afetch_items", new_callable=AsyncMock)
+    async def test_022_download(self, mock_fetch, mock_download, mock_read):
+        """test adownload() of unread documents"""
+        read_doc = MagicMock()
+        read_doc.message.read = True
+        unread_doc = MagicMock()
+        unread_doc.message.read = False
+        unread_doc.category.return_value = "category"
+        unread_doc.filename.return_value = "file.pdf"
+        mock_fetch.return_value = {"1": read_doc, "2": unread_doc}
+        mock_download.return_value = 200
+        dkb = AsyncDKBRobo(unfiltered=True)
+        dkb.wrapper = Mock()
+        dkb.wrapper.account_dic = {}
+        with self.assertLogs("dkb_robo", level="INFO"):
+            result = await dkb.adownload(Path("/tmp/postbox"), False, concurrency=2)
+        self.assertEqual({"2": unread_doc}, result)
+        self.assertEqual(
+            Path("/tmp/postbox/category/file.pdf"), mock_download.call_args[0][1]
+        )
+        mock_read.assert_called_once_with(unread_doc, True)
+        self.assertEqual(200, unread_doc.rcode)
+
+    @patch("dkb_robo.aio.AsyncTransactions.aget", new_callable=AsyncMock)
+    async def test_028_get_all_transactions(self, mock_get):
+        """test aget_all_transactions() gathers the accounts and reports failures"""
+
+        async def _get(transaction_url, *_args):
+            if transaction_url == "url2":
+                raise ApiError("failed")
+            return [transaction_url]
+
+        mock_get.side_effect = _get
+        dkb = AsyncDKBRobo()
+        dkb.wrapper = Mock()
+        dkb.account_dic = {
+            0: {"account": "iban", "type": "account", "transactions": "url1"},
+            1: {"account": "pan", "type": "creditcard", "transactions": "url2"},
+        }
+        with self.assertLogs("dkb_robo", level="INFO"):
+            result = await dkb.aget_all_transactions(None, "01.01.2024", "31.01.2024")
+        self.assertEqual(
+            {
+                "iban": {"type": "account", "transactions": ["url1"], "error": None},
+                "pan": {"type": "creditcard", "transactions": [], "error": "failed"},
+            },
+            result,
+        )
+
+    @patch("dkb_robo.aio.AsyncTransactions._afetch", new_callable=AsyncMock)
+    async def test_029_get_transactions(self, mock_fetch):
+        """test aget_transactions() building the requested fields only"""
+        mock_fetch.return_value = {
+            "data": [
+                {
+                    "id": "id",
+                    "attributes": {
+                        "status": "booked",
+                        "bookingDate": "2024-01-02",
+                        "amount": {"value": "-1.5", "currencyCode": "EUR"},
+                    },
+                }
+            ]
+        }
+        dkb = AsyncDKBRobo()
+        dkb.wrapper = Mock()
+        self.assertEqual(
+            [{"bdate": "2024-01-02", "amount": -1.5}],
+            await dkb.aget_transactions(
+                "url", "account", "01.01.2024", "31.01.2024", fields=["bdate", "amount"]
+            ),
+        )
+        with self.assertRaises(ApiError):
+            await dkb.aget_transactions(
+                "url", "account", "01.01.2024", "31.01.2024", fields=["foo"]
+            )
+        self.assertEqual(1, mock_fetch.call_count)
+
+    @patch("dkb_robo.aio.AsyncTransactions._afetch", new_callable=AsyncMock)
+    async def test_030_backfill_transactions(self, mock_fetch):
+        """test abackfill_transactions() with fields"""
+        mock_fetch.return_value = {"data": []}
+        dkb = AsyncDKBRobo()
+        dkb.wrapper = Mock()
+        self.assertEqual(
+            [],
+            await dkb.abackfill_transactions(
+                "url", "account", "01.01.2024", "31.01.2024", fields=["bdate"]
+            ),
+        )
+        with self.assertRaises(ApiError):
+            await dkb.abackfill_transactions(
+                "url", "account", "01.01.2024", "31.01.2024", fields=["foo"]
+            )
+        self.assertEqual(1, mock_fetch.call_count)
+
+    def test_031_methods(self):
+        """test the coroutines do not replace the blocking methods of the base classes"""
+        for base in (AsyncDKBRobo, AsyncTransactions, AsyncAuthentication):
+            for name, method in vars(base).items():
+                if asyncio.iscoroutinefunction(method) or inspect.isasyncgenfunction(
+                    method
+                ):
+                    self.assertFalse(
+                        any(hasattr(parent, name) for parent in base.__mro__[1:]),
+                        f"{base.__name__}.{name}",
+                    )
+
+
+@unittest.skipUnless(httpx, "httpx is not installed")
+class TestAsyncSession(unittest.IsolatedAsyncioTestCase):
+    """AsyncSession test class"""
+
+    def setUp(self):
+        session = requests.session()
+        session.headers = {"Accept-Encoding": "gzip", "x-xsrf-token": "token"}
+        session.cookies.set("cookie", "value", domain="banking.dkb.de", path="/")
+        self.session = AsyncSession(session, TransportPolicy(backoff_factor=0))
+        self.request_list = []
+
+    def _mount(self, status_list):
+        """answer requests from a list of status codes"""
+
+        def _handler(request):
+            self.request_list.append(request)
+            (status_code, header_dic) = status_list.pop(0)
+            return httpx.Response(status_code, headers=header_dic, json={})
+
+        self.session.client._transport = httpx.MockTransport(_handler)
+
+    async def asyncTearDown(self):
+        await self.session.aclose()
+
+    async def test_023_init(self):
+        """test headers and cookies of the requests session get taken over"""
+        self._mount([(200, {})])
+        await self.session.get("https://banking.dkb.de/api/foo")
+        request = self.request_list[0]
+        self.assertEqual("token", request.headers["x-xsrf-token"])
+        self.assertEqual("cookie=value", request.headers["cookie"])
+        self.assertNotEqual("gzip", request.headers["accept-encoding"])
+
+    async def test_024_get(self):
+        """test GET requests get retried on 429/5xx"""
+        self._mount([(503, {}), (429, {"Retry-After": "0"}), (200, {})])
+        response = await self.session.get("https://banking.dkb.de/api/foo")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(self.request_list))
+
+    async def test_025_get(self):
+        """test the last response gets returned once the retries are used up"""
+        self._mount([(500, {})] * 4)
+        response = await self.session.get("https://banking.dkb.de/api/foo")
+        self.assertEqual(500, response.status_code)
+        self.assertEqual(4, len(self.request_list))
+
+    async def test_026_post(self):
+        """test POST and PATCH requests do not get retried"""
+        self._mount([(503, {}), (503, {})])
+        response = await self.session.post("https://banking.dkb.de/api/foo")
+        self.assertEqual(503, response.status_code)
+        response = await self.session.patch("https://banking.dkb.de/api/foo")
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(2, len(self.request_list))
+
+
+class TestAsyncSessionImport(unittest.TestCase):
+    """AsyncSession without httpx"""
+
+    @patch("dkb_robo.aio.httpx", None)
+    def test_027_init(self):
+        """test a missing httpx gets reported"""
+        with self.assertRaises(ImportError) as err:
+            AsyncSession(requests.session())
+        self.assertEqual(
+            "AsyncDKBRobo requires httpx, install it by running 'pip install dkb_robo[async]'",
+            str(err.exception),
+        )
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -7,10 +7,14 @@ from datetime import date
 import unittest
 import logging
 import json
+import tempfile
+import time
 from unittest.mock import patch, Mock, MagicMock, mock_open
 from bs4 import BeautifulSoup
 from mechanicalsoup import LinkNotFoundError
 import io
+import requests
+from urllib3.util.request import ACCEPT_ENCODING
 
 sys.path.insert(0, ".")
 sys.path.insert(0, "..")
@@ -78,6 +82,7 @@ class TestAuthentication(unittest.TestCase):
         mock_session.headers = {}
         client = self.auth._session_new()
         exp_headers = {
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Accept-Language": "en-US,en;q=0.5",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Cache-Control": "no-cache",
@@ -110,6 +115,7 @@ class TestAuthentication(unittest.TestCase):
         mock_session.return_value.cookies = {"__Host-xsrf": "foo"}
         client = self.auth._session_new()
         exp_headers = {
+            "Accept-Encoding": ACCEPT_ENCODING,
             "Accept-Language": "en-US,en;q=0.5",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Cache-Control": "no-cache",
@@ -547,6 +553,13 @@ class TestAuthentication(unittest.TestCase):
         self.auth.client.post.return_value.text = "OK"
         self.auth._sso_redirect()
         self.assertTrue(mock_instance.called)
+        self.assertEqual(self.auth.client, mock_instance.call_args[1]["session"])
+        self.assertEqual(
+            "application/json",
+            self.auth.client.post.call_args[1]["headers"]["Content-Type"],
+        )
+        self.assertEqual({}, self.auth.client.headers)
+        self.assertEqual(mock_instance.return_value, self.auth.dkb_br)
 
     @patch("dkb_robo.legacy.Wrapper._new_instance")
     def test_038__sso_redirect(self, mock_instance):
@@ -839,14 +852,306 @@ class TestAuthentication(unittest.TestCase):
         self.assertTrue(mock_chall.called)
         self.assertTrue(mock_2fa.called)
         self.assertTrue(mock_upd.called)
-        self.assertTrue(mock_redir.called)
+        self.assertFalse(mock_redir.called)
         self.assertTrue(mock_mfa.called)
         self.assertTrue(mock_overview.called)
 
+    def _session_file(self, session_dic):
+        """write a session file into a temporary directory"""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        session_file = os.path.join(tmp_dir.name, "session.json")
+        if session_dic is not None:
+            with open(session_file, "w", encoding="utf8") as fh:
+                json.dump(session_dic, fh)
+        return session_file
+
+    def test_047__session_load(self):
+        """test _session_load() without session file"""
+        self.auth.session_file = self._session_file(None)
+        self.assertFalse(self.auth._session_load())
+
+    def test_048__session_load(self):
+        """test _session_load() session of a different user"""
+        self.auth.dkb_user = "user"
+        self.auth.session_file = self._session_file(
+            {"user": "other", "expires": time.time() + 100}
+        )
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertFalse(self.auth._session_load())
+        self.assertIn(
+            "INFO:dkb_robo.authentication:Persisted session belongs to a different user",
+            lcm.output,
+        )
+
+    def test_049__session_load(self):
+        """test _session_load() expired session"""
+        self.auth.dkb_user = "user"
+        self.auth.session_file = self._session_file(
+            {"user": "user", "expires": time.time() - 1}
+        )
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertFalse(self.auth._session_load())
+        self.assertIn(
+            "INFO:dkb_robo.authentication:Persisted session expired", lcm.output
+        )
+
+    @patch("requests.session")
+    def test_050__session_load(self, mock_session):
+        """test _session_load() probe fails"""
+        self.auth.dkb_user = "user"
+        self.auth.session_file = self._session_file(
+            {"user": "user", "expires": time.time() + 100}
+        )
+        mock_session.return_value.get.return_value.status_code = 401
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertFalse(self.auth._session_load())
+        self.assertIn(
+            "INFO:dkb_robo.authentication:Persisted session is not valid anymore. RC: 401",
+            lcm.output,
+        )
+        self.assertFalse(self.auth.client)
+
+    @patch("dkb_robo.authentication.Authentication._session_save")
+    @patch("requests.session")
+    def test_051__session_load(self, mock_session, mock_save):
+        """test _session_load() restores cookies, headers and token"""
+        self.auth.dkb_user = "user"
+        expires = time.time() + 100
+        self.auth.session_file = self._session_file(
+            {
+                "user": "user",
+                "expires": expires,
+                "headers": {"x-xsrf-token": "xsrf"},
+                "cookies": [{"name": "name", "value": "value", "domain": "dkb.de"}],
+                "token_dic": {"access_token": "access_token"},
+            }
+        )
+        mock_session.return_value.get.return_value.status_code = 200
+        self.assertTrue(self.auth._session_load())
+        self.assertEqual(mock_session.return_value, self.auth.client)
+        self.assertEqual(
+            {"x-xsrf-token": "xsrf", "Accept-Encoding": ACCEPT_ENCODING},
+            self.auth.client.headers,
+        )
+        mock_session.return_value.cookies.set.assert_called_once_with(
+            name="name", value="value", domain="dkb.de"
+        )
+        mock_session.return_value.get.assert_called_once_with(
+            "https://banking.dkb.de/api/config/users/me/product-display-settings",
+            headers={"Cache-Control": "max-age=0"},
+        )
+        self.assertEqual({"access_token": "access_token"}, self.auth.token_dic)
+        mock_save.assert_called_once_with(expires)
+
+    def test_052__session_save(self):
+        """test _session_save() writes an owner-only session file"""
+        self.auth.dkb_user = "user"
+        self.auth.session_file = self._session_file(None)
+        self.auth.client = requests.session()
+        self.auth.client.headers = {"foo": "bar"}
+        self.auth.client.cookies.set("name", "value", domain="dkb.de", path="/")
+        self.auth.token_dic = {"access_token": "access_token", "expires_in": 600}
+        start = time.time()
+        self.auth._session_save()
+        self.assertEqual(0o600, os.stat(self.auth.session_file).st_mode & 0o777)
+        session_dic = json_load(self.auth.session_file)
+        self.assertEqual("user", session_dic["user"])
+        self.assertTrue(start + 600 <= session_dic["expires"] <= time.time() + 600)
+        self.assertEqual({"foo": "bar"}, session_dic["headers"])
+        self.assertEqual(self.auth.token_dic, session_dic["token_dic"])
+        self.assertEqual(
+            {
+                "name": "name",
+                "value": "value",
+                "domain": "dkb.de",
+                "path": "/",
+                "secure": False,
+                "expires": None,
+            },
+            session_dic["cookies"][0],
+        )
+        self.assertEqual(
+            ["session.json"], os.listdir(os.path.dirname(self.auth.session_file))
+        )
+
+    def test_053__session_save(self):
+        """test _session_save() default ttl and explicit expiry"""
+        self.auth.session_file = self._session_file(None)
+        self.auth.client = requests.session()
+        self.auth.token_dic = {"access_token": "access_token"}
+        start = time.time()
+        self.auth._session_save()
+        session_dic = json_load(self.auth.session_file)
+        self.assertTrue(start + 300 <= session_dic["expires"] <= time.time() + 300)
+        self.auth._session_save(42)
+        self.assertEqual(42, json_load(self.auth.session_file)["expires"])
+
+    def test_054__session_save(self):
+        """test _session_save() does not fail the login if the file cannot be written"""
+        self.auth.session_file = os.path.join(
+            self._session_file(None), "missing", "session.json"
+        )
+        self.auth.client = requests.session()
+        self.auth.token_dic = {}
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.auth._session_save()
+        self.assertIn("Unable to persist session to", lcm.output[0])
+
+    @patch("dkb_robo.portfolio.Overview.get")
+    @patch("dkb_robo.authentication.Authentication._sso_redirect")
+    @patch("dkb_robo.authentication.Authentication._session_save")
+    @patch("dkb_robo.authentication.Authentication._login_mfa")
+    @patch("dkb_robo.authentication.Authentication._session_load")
+    def test_055_login(self, mock_load, mock_mfa, mock_save, mock_redir, mock_overview):
+        """test login() reusing a persisted session"""
+        self.auth.client = requests.session()
+        self.auth.session_file = "session_file"
+        mock_load.return_value = True
+        mock_overview.return_value = {"foo": "bar"}
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertEqual(({"foo": "bar"}, None), self.auth.login())
+        self.assertIn(
+            "INFO:dkb_robo.authentication:Reusing persisted session from session_file",
+            lcm.output,
+        )
+        self.assertFalse(mock_mfa.called)
+        self.assertFalse(mock_save.called)
+        self.assertFalse(mock_redir.called)
+        # the api calls after the login keep the headers of the sso redirect
+        self.assertEqual("application/json", self.auth.client.headers["Content-Type"])
+        self.assertEqual("cors", self.auth.client.headers["Sec-Fetch-Mode"])
+
+    @patch("dkb_robo.portfolio.Overview.get")
+    @patch("dkb_robo.authentication.Authentication._sso_redirect")
+    @patch("dkb_robo.authentication.Authentication._session_save")
+    @patch("dkb_robo.authentication.Authentication._login_mfa")
+    @patch("dkb_robo.authentication.Authentication._session_load")
+    def test_056_login(self, mock_load, mock_mfa, mock_save, mock_redir, mock_overview):
+        """test login() falls back to a full login and persists the session"""
+        self.auth.client = requests.session()
+        self.auth.session_file = "session_file"
+        mock_load.return_value = False
+        self.auth.login()
+        self.assertTrue(mock_mfa.called)
+        self.assertTrue(mock_save.called)
+
+    @patch("dkb_robo.portfolio.Overview.get")
+    @patch("dkb_robo.authentication.Authentication._sso_redirect")
+    @patch("dkb_robo.authentication.Authentication._session_save")
+    @patch("dkb_robo.authentication.Authentication._login_mfa")
+    @patch("dkb_robo.authentication.Authentication._session_load")
+    def test_057_login(self, mock_load, mock_mfa, mock_save, mock_redir, mock_overview):
+        """test login() without session persistence"""
+        self.auth.client = requests.session()
+        self.auth.login()
+        self.assertFalse(mock_load.called)
+        self.assertTrue(mock_mfa.called)
+        self.assertFalse(mock_save.called)
+
+    @patch("dkb_robo.authentication.APPAuthentication")
+    @patch("dkb_robo.authentication.Authentication._mfa_challenge_id")
+    def test_058__mfa_finalize(self, mock_cid, mock_app):
+        """test _mfa_finalize() passes the deadline and keeps the detection latency"""
+        mock_cid.return_value = "cid"
+        mock_app.return_value.finalize.return_value = True
+        mock_app.return_value.detection_latency = 0.75
+        self.auth.mfa_method = "seal_one"
+        self.auth.mfa_deadline = 30
+        self.assertTrue(self.auth._mfa_finalize("challenge_dic", "device_name"))
+        self.assertEqual(0.75, self.auth.mfa_latency)
+        self.assertEqual(30, mock_app.call_args[1]["deadline"])
+
+    @patch("requests.session")
+    def test_059__session_new(self, mock_session):
+        """test _session_new() counts transfers"""
+        mock_session.return_value.hooks = {"response": []}
+        client = self.auth._session_new()
+        self.assertEqual([self.auth.transfer_stats.hook], client.hooks["response"])
+
+    def test_060_logout(self):
+        """test logout() logs transfer statistics"""
+        self.auth.transfer_stats.record("https://host/api/path", 10, 100, 0.5, "gzip")
+        with self.assertLogs("dkb_robo", level="DEBUG") as lcm:
+            self.auth.logout()
+        self.assertIn(
+            "DEBUG:dkb_robo.authentication:transfer /api/path: 1 requests, 10 bytes on the wire, 100 bytes decoded, 0.500s, encodings: {'gzip': 1}",
+            lcm.output,
+        )
+
+    @patch("requests.session")
+    def test_061__session_new(self, mock_session):
+        """test _session_new() mounts the http cache"""
+        from dkb_robo.cache import MemoryCache
+
+        mock_session.return_value.hooks = {"response": []}
+        self.auth = Authentication(http_cache=MemoryCache())
+        with self.assertLogs("dkb_robo", level="DEBUG") as lcm:
+            client = self.auth._session_new()
+            self.auth.logout()
+        client.mount.assert_called_once_with("https://", self.auth.cache_adapter)
+        self.assertIn(
+            "DEBUG:dkb_robo.authentication:http cache: {'hits': 0, 'misses': 0, 'revalidated': 0}",
+            lcm.output,
+        )
+        self.assertIsNone(Authentication().cache_adapter)
+
+    @patch("dkb_robo.authentication.save_snapshot")
+    @patch("dkb_robo.portfolio.Overview.get")
+    def test_062_overview(self, mock_get, mock_save):
+        """test overview() persists the snapshot"""
+        mock_get.return_value = {0: {"iban": "iban"}}
+        self.auth.dkb_user = "user"
+        self.assertEqual({0: {"iban": "iban"}}, self.auth.overview())
+        self.assertFalse(mock_save.called)
+        self.auth.snapshot_file = "snapshot.json"
+        self.auth.overview()
+        mock_save.assert_called_once_with(
+            "snapshot.json", "user", {0: {"iban": "iban"}}
+        )
+        # failed overviews do not overwrite the snapshot
+        mock_get.return_value = {}
+        self.auth.overview()
+        self.assertEqual(1, mock_save.call_count)
+
     def test_147_logout(self):
         """test logout"""
         self.assertFalse(self.auth.logout())
 
+    @patch("dkb_robo.authentication.Authentication._sso_redirect")
+    def test_063_dkb_br(self, mock_redir):
+        """test dkb_br performs the sso redirect on first access only"""
+        self.auth.client = Mock()
+
+        def redirect():
+            self.auth.dkb_br = "browser"
+
+        mock_redir.side_effect = redirect
+        self.assertEqual("browser", self.auth.dkb_br)
+        self.assertEqual("browser", self.auth.dkb_br)
+        self.assertEqual(1, mock_redir.call_count)
+
+    @patch("dkb_robo.authentication.Authentication._sso_redirect")
+    def test_064_dkb_br(self, mock_redir):
+        """test dkb_br without a session"""
+        self.assertIsNone(self.auth.dkb_br)
+        self.assertFalse(mock_redir.called)
+
+    @patch("requests.session")
+    def test_065__session_new(self, mock_session):
+        """test _session_new() mounts the transport policy"""
+        from dkb_robo.transport import TransportAdapter, TransportPolicy
+
+        mock_session.return_value.hooks = {"response": []}
+        policy = TransportPolicy(retries=1)
+        self.auth = Authentication(max_workers=16, transport_policy=policy)
+        client = self.auth._session_new()
+        client.mount.assert_called_once_with("https://", self.auth.transport)
+        self.assertIsInstance(self.auth.transport, TransportAdapter)
+        self.assertIs(policy, self.auth.transport.policy)
+        self.assertEqual(16, self.auth.transport._pool_maxsize)
+        self.assertIsNone(self.auth.cache_adapter)
+
 
 class TestAPPAuthentication(unittest.TestCase):
     """test class"""
@@ -960,6 +1265,76 @@ class TestAPPAuthentication(unittest.TestCase):
         )
         self.assertTrue(mock_confirm.called)
 
+    def test_010__intervals(self):
+        """test _intervals() backs off up to the cap and stops at the deadline"""
+        self.appauth.deadline = 20
+        self.assertEqual(
+            [0.5, 0.75, 1.125, 1.6875, 2.53125, 3.796875, 5, 4.609375],
+            list(self.appauth._intervals()),
+        )
+        self.assertEqual(55, sum(APPAuthentication(client=Mock())._intervals()))
+
+    def _fake_endpoint(self, confirm_at):
+        """challenge endpoint flipping to processed at a given (virtual) time"""
+        clock = {"now": 0.0, "polls": []}
+
+        def _get(_url):
+            clock["polls"].append(clock["now"])
+            response = Mock(status_code=200)
+            if confirm_at is not None and clock["now"] >= confirm_at:
+                status = "processed"
+            else:
+                status = "processing"
+            response.json.return_value = {
+                "data": {"attributes": {"verificationStatus": status}}
+            }
+            return response
+
+        def _sleep(seconds):
+            clock["now"] += seconds
+
+        self.appauth.client = Mock()
+        self.appauth.client.get.side_effect = _get
+        mock_time = Mock()
+        mock_time.monotonic.side_effect = lambda: clock["now"]
+        mock_time.sleep.side_effect = _sleep
+        return clock, mock_time
+
+    @patch("dkb_robo.authentication.APPAuthentication._print")
+    def test_011_finalize(self, _mock_print):
+        """test finalize() detects an early confirmation fast"""
+        clock, mock_time = self._fake_endpoint(1.0)
+        with patch("dkb_robo.authentication.time", mock_time):
+            self.assertTrue(self.appauth.finalize("challengeid", {}, "devicename"))
+        self.assertEqual([0, 0.5, 1.25], clock["polls"])
+        self.assertEqual(0.75, self.appauth.detection_latency)
+        self.assertEqual(1.25, self.appauth.elapsed)
+        self.appauth.client.get.assert_called_with(
+            "https://banking.dkb.de/api/mfa/mfa/challenges/challengeid"
+        )
+
+    @patch("dkb_robo.authentication.APPAuthentication._print")
+    def test_012_finalize(self, _mock_print):
+        """test finalize() latency is capped by max_interval for late confirmations"""
+        clock, mock_time = self._fake_endpoint(30.0)
+        with patch("dkb_robo.authentication.time", mock_time):
+            self.assertTrue(self.appauth.finalize("challengeid", {}, "devicename"))
+        self.assertEqual(5, self.appauth.detection_latency)
+        self.assertLessEqual(clock["polls"][-1] - 30.0, self.appauth.max_interval)
+        # old fixed 5s polling needed 7 requests
+        self.assertEqual(11, len(clock["polls"]))
+
+    @patch("dkb_robo.authentication.APPAuthentication._print")
+    def test_013_finalize(self, _mock_print):
+        """test finalize() gives up at the deadline"""
+        self.appauth.deadline = 10
+        clock, mock_time = self._fake_endpoint(None)
+        with patch("dkb_robo.authentication.time", mock_time):
+            self.assertFalse(self.appauth.finalize("challengeid", {}, "devicename"))
+        self.assertEqual(10, clock["polls"][-1])
+        self.assertEqual(10, self.appauth.elapsed)
+        self.assertIsNone(self.appauth.detection_latency)
+
 
 class TestTANAuthentication(unittest.TestCase):
     """test class"""
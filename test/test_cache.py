@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.cache """
+import sys
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.cache import CacheAdapter, DiskCache, MemoryCache
+
+URL = "https://banking.dkb.de/api/customers/me/tax-exemptions"
+
+
+def _response(status_code=200, content=b'{"data": []}', headers=None):
+    """build a response as returned by HTTPAdapter.send()"""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.url = URL
+    return response
+
+
+class TestBackends(unittest.TestCase):
+    """cache backend test class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_001_memory(self):
+        """test MemoryCache() roundtrip"""
+        cache = MemoryCache()
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", {"content": b"foo", "expires": 1})
+        entry = cache.get("key")
+        self.assertEqual({"content": b"foo", "expires": 1}, entry)
+        # entries are copies
+        entry["expires"] = 2
+        self.assertEqual(1, cache.get("key")["expires"])
+        cache.clear()
+        self.assertIsNone(cache.get("key"))
+
+    def test_002_disk(self):
+        """test DiskCache() roundtrip with private files"""
+        path = os.path.join(self.tmp_dir.name, "cache")
+        cache = DiskCache(path)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", {"content": b"\x00foo", "headers": {"ETag": "1"}})
+        self.assertEqual(
+            {"content": b"\x00foo", "headers": {"ETag": "1"}},
+            DiskCache(path).get("key"),
+        )
+        (file_name,) = os.listdir(path)
+        self.assertEqual(
+            0o600, stat.S_IMODE(os.stat(os.path.join(path, file_name)).st_mode)
+        )
+        cache.clear()
+        self.assertFalse(os.listdir(path))
+
+    def test_003_disk(self):
+        """test DiskCache() broken entries and write errors"""
+        cache = DiskCache(self.tmp_dir.name)
+        with open(cache._file("key"), "w", encoding="utf8") as fh:
+            fh.write("{broken")
+        self.assertIsNone(cache.get("key"))
+        with patch("tempfile.mkstemp", side_effect=OSError("read-only")):
+            with self.assertLogs("dkb_robo", level="INFO") as lcm:
+                cache.set("key", {"content": b""})
+        self.assertIn(
+            f"ERROR:dkb_robo.cache:Unable to write cache entry to {self.tmp_dir.name}: read-only",
+            lcm.output,
+        )
+
+
+@patch("requests.adapters.HTTPAdapter.send")
+class TestCacheAdapter(unittest.TestCase):
+    """CacheAdapter test class"""
+
+    def setUp(self):
+        self.adapter = CacheAdapter(MemoryCache())
+        self.session = requests.session()
+        self.session.mount("https://", self.adapter)
+
+    def test_004_send(self, mock_send):
+        """fresh entries get answered from the cache"""
+        mock_send.return_value = _response(headers={"Content-Type": "application/json"})
+        self.assertEqual({"data": []}, self.session.get(URL).json())
+        response = self.session.get(URL)
+        self.assertEqual({"data": []}, response.json())
+        self.assertTrue(response.from_cache)
+        self.assertEqual("application/json", response.headers["content-type"])
+        self.assertEqual(1, mock_send.call_count)
+        self.assertEqual(
+            {"hits": 1, "misses": 1, "revalidated": 0}, self.adapter.stats()
+        )
+
+    def test_005_send(self, mock_send):
+        """stale entries get revalidated by a conditional request"""
+        not_modified = _response(304, b"")
+        not_modified.raw = Mock()
+        mock_send.side_effect = [
+            _response(headers={"ETag": '"v1"', "Last-Modified": "yesterday"}),
+            not_modified,
+        ]
+        self.adapter.ttl_dic = {"/tax-exemptions": 0}
+        self.session.get(URL)
+        response = self.session.get(URL)
+        self.assertEqual({"data": []}, response.json())
+        self.assertTrue(response.from_cache)
+        # the connection of the 304 response is released
+        not_modified.raw.release_conn.assert_called_once_with()
+        request = mock_send.call_args[0][0]
+        self.assertEqual('"v1"', request.headers["If-None-Match"])
+        self.assertEqual("yesterday", request.headers["If-Modified-Since"])
+        self.assertEqual(
+            {"hits": 0, "misses": 1, "revalidated": 1}, self.adapter.stats()
+        )
+
+    def test_006_send(self, mock_send):
+        """changed content replaces the entry, max-age=0 forces a revalidation"""
+        mock_send.side_effect = [
+            _response(headers={"ETag": '"v1"'}),
+            _response(content=b'{"data": [1]}', headers={"ETag": '"v2"'}),
+        ]
+        self.session.get(URL)
+        response = self.session.get(URL, headers={"Cache-Control": "max-age=0"})
+        self.assertEqual({"data": [1]}, response.json())
+        self.assertFalse(getattr(response, "from_cache", False))
+        self.assertEqual({"data": [1]}, self.session.get(URL).json())
+        self.assertEqual(2, mock_send.call_count)
+
+    def test_007_send(self, mock_send):
+        """errors, other methods, streams and unknown endpoints bypass the cache"""
+        mock_send.return_value = _response(401)
+        self.session.get(URL)
+        self.session.get(URL)
+        mock_send.return_value = _response()
+        self.session.post(URL)
+        self.session.get(URL, stream=True)
+        self.session.get("https://banking.dkb.de/api/accounts/accounts")
+        self.assertEqual(5, mock_send.call_count)
+        self.assertEqual(
+            {"hits": 0, "misses": 2, "revalidated": 0}, self.adapter.stats()
+        )
+        self.assertIsNone(self.adapter.backend.get(self.adapter._key(URL)))
+
+    def test_008_send(self, mock_send):
+        """standing orders are cached per account"""
+        mock_send.side_effect = lambda request, **kwargs: _response(
+            content=request.url.encode("utf8")
+        )
+        url = "https://banking.dkb.de/api/accounts/payments/recurring-credit-transfers?accountId="
+        for _ in range(2):
+            self.assertEqual(url + "1", self.session.get(url + "1").text)
+            self.assertEqual(url + "2", self.session.get(url + "2").text)
+        self.assertEqual(2, mock_send.call_count)
+
+    def test_009_send(self, mock_send):
+        """users sharing a backend do not get each others entries"""
+        mock_send.side_effect = [
+            _response(content=b"user1"),
+            _response(content=b"user2"),
+        ]
+        backend = MemoryCache()
+        for user in ["user1", "user2"]:
+            session = requests.session()
+            session.mount("https://", CacheAdapter(backend, scope=user))
+            self.assertEqual(user, session.get(URL).text)
+            self.assertEqual(user, session.get(URL).text)
+        self.assertEqual(2, mock_send.call_count)
+        self.assertEqual(
+            ["cert", "proxies", "stream", "timeout", "verify"],
+            sorted(mock_send.call_args[1]),
+        )
+        self.assertEqual((10.0, 30.0), mock_send.call_args[1]["timeout"])
+
+
+if __name__ == "__main__":
+
+    unittest.main()
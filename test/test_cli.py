@@ -4,9 +4,10 @@
 import sys
 import os
 import unittest
-from unittest.mock import patch, MagicMock, Mock, mock_open
+from unittest.mock import patch, ANY, MagicMock, Mock, mock_open
 from bs4 import BeautifulSoup
 from mechanicalsoup import LinkNotFoundError
+from dataclasses import dataclass
 from datetime import date
 import click
 from click.testing import CliRunner
@@ -16,6 +17,14 @@ sys.path.insert(0, "..")
 import logging
 
 
+@dataclass
+class Item:
+    """dataclass for formatter tests"""
+
+    amount: int = None
+    bdate: str = None
+
+
 class Config:
     def __init__(self):
         self.FORMAT = None
@@ -44,9 +53,11 @@ class TestDKBRobo(unittest.TestCase):
             _id_lookup,
             _account_lookup,
             _transactionlink_lookup,
+            _field_list,
             scan_postbox,
             download,
         )
+        from dkb_robo.cli_sync import export, sync
 
         self.logger = logging.getLogger("dkb_robo")
         self._load_format = _load_format
@@ -57,9 +68,12 @@ class TestDKBRobo(unittest.TestCase):
         self.accounts = accounts
         self.main = main
         self.transactions = transactions
+        self.sync = sync
+        self.export = export
         self._id_lookup = _id_lookup
         self._account_lookup = _account_lookup
         self._transactionlink_lookup = _transactionlink_lookup
+        self._field_list = _field_list
         self.scan_postbox = scan_postbox
         self.download = download
 
@@ -573,6 +587,441 @@ class TestDKBRobo(unittest.TestCase):
         self.assertEqual("<Result okay>", str(runner.invoke(self.download, obj=obj)))
         self.assertTrue(mock_click.called)
 
+    @patch("click.echo")
+    @patch("dkb_robo.cli.load_snapshot")
+    @patch("dkb_robo.cli._login")
+    def test_035_accounts(self, mock_login, mock_snapshot, mock_click):
+        """test accounts --stale-ok prints the snapshot before the login"""
+        output_list = []
+        mock_login.side_effect = lambda ctx: output_list.append("login") or MagicMock()
+        mock_snapshot.return_value = ({"0": {"iban": "iban", "details": "d"}}, 42.4)
+        obj = {
+            "FORMAT": lambda data, fieldnames: output_list.append(data),
+            "UNFILTERED": True,
+            "USERNAME": "user",
+            "SNAPSHOT_FILE": "snapshot.json",
+        }
+        CliRunner().invoke(self.accounts, ["--stale-ok", "--max-age", "60"], obj=obj)
+        mock_click.assert_called_once_with("Snapshot is 42 seconds old", err=True)
+        self.assertEqual([[{"iban": "iban"}], "login"], output_list)
+        mock_snapshot.assert_called_once_with("snapshot.json", "user", 60)
+
+    @patch("dkb_robo.cli.load_snapshot")
+    @patch("dkb_robo.cli._login")
+    def test_047_accounts(self, mock_login, mock_snapshot):
+        """test accounts --stale-ok flushes the snapshot before the login starts"""
+        event_list = []
+        mock_snapshot.return_value = ({"0": {"iban": "iban"}}, 1)
+        mock_login.return_value.__enter__.side_effect = lambda: event_list.append(
+            "login"
+        )
+        obj = {
+            "FORMAT": lambda data, fieldnames: event_list.append("output"),
+            "UNFILTERED": False,
+            "USERNAME": "user",
+            "SNAPSHOT_FILE": "snapshot.json",
+        }
+        with patch("dkb_robo.cli.sys") as mock_sys:
+            mock_sys.stdout.flush.side_effect = lambda: event_list.append("flush")
+            CliRunner().invoke(self.accounts, ["--stale-ok"], obj=obj)
+        self.assertEqual(["output", "flush", "login"], event_list[:3])
+
+    @patch("dkb_robo.cli.load_snapshot")
+    @patch("dkb_robo.cli._login")
+    def test_036_accounts(self, mock_login, mock_snapshot):
+        """test accounts --stale-ok without usable snapshot or via server"""
+        mock_login.return_value.__enter__.return_value.account_dic = {
+            0: {"iban": "fresh"}
+        }
+        mock_snapshot.return_value = None
+        obj = {
+            "FORMAT": Mock(),
+            "UNFILTERED": False,
+            "USERNAME": "user",
+            "SNAPSHOT_FILE": "snapshot.json",
+        }
+        runner = CliRunner()
+        runner.invoke(self.accounts, ["--stale-ok"], obj=obj)
+        obj["FORMAT"].assert_called_once_with([{"iban": "fresh"}], fieldnames=ANY)
+        fieldnames = obj["FORMAT"].call_args[1]["fieldnames"]
+        self.assertEqual(["account", "amount", "currencyCode"], fieldnames[:3])
+        self.assertIn("productgroup", fieldnames)
+        self.assertNotIn("transactions", fieldnames)
+        mock_snapshot.assert_called_once_with("snapshot.json", "user", 3600)
+        # the server refreshes the snapshot itself
+        mock_snapshot.return_value = ({"0": {"iban": "stale"}}, 1)
+        obj["SERVER"] = "url"
+        mock_login.reset_mock()
+        runner.invoke(self.accounts, ["--stale-ok"], obj=obj)
+        obj["FORMAT"].assert_called_with([{"iban": "stale"}], fieldnames=ANY)
+        self.assertFalse(mock_login.called)
+
+    @patch("dkb_robo.cli.load_snapshot")
+    @patch("dkb_robo.cli._login")
+    def test_049_accounts(self, mock_login, mock_snapshot):
+        """test accounts --stale-ok --no-refresh skips the login"""
+        mock_snapshot.return_value = ({"0": {"iban": "stale"}}, 1)
+        obj = {
+            "FORMAT": Mock(),
+            "UNFILTERED": False,
+            "USERNAME": "user",
+            "SNAPSHOT_FILE": "snapshot.json",
+        }
+        result = CliRunner().invoke(
+            self.accounts, ["--stale-ok", "--no-refresh"], obj=obj
+        )
+        self.assertEqual(0, result.exit_code)
+        obj["FORMAT"].assert_called_once_with([{"iban": "stale"}], fieldnames=ANY)
+        self.assertFalse(mock_login.called)
+        # without a usable snapshot the login is needed anyway
+        mock_snapshot.return_value = None
+        mock_login.return_value.__enter__.return_value.account_dic = {
+            0: {"iban": "fresh"}
+        }
+        CliRunner().invoke(self.accounts, ["--stale-ok", "--no-refresh"], obj=obj)
+        obj["FORMAT"].assert_called_with([{"iban": "fresh"}], fieldnames=ANY)
+        self.assertTrue(mock_login.called)
+
+    @patch("dkb_robo.cli._login")
+    def test_050_transactions(self, mock_login):
+        """test transactions rejects --backfill together with --store"""
+        result = CliRunner().invoke(
+            self.transactions,
+            ["-a", "iban", "--backfill", "--store", "transactions.db"],
+            obj={"UNFILTERED": False},
+        )
+        self.assertEqual(2, result.exit_code)
+        self.assertIn("--backfill cannot be combined with --store", result.output)
+        self.assertFalse(mock_login.called)
+
+    @patch("click.echo")
+    @patch("dkb_robo.cli_sync._login")
+    def test_038_sync(self, mock_login, mock_click):
+        """test sync --all prints the merged accounts and reports failures"""
+        dkb = mock_login.return_value.__enter__.return_value
+        dkb.account_dic = {0: {"account": "iban"}, 1: {"account": "pan"}}
+        dkb.get_all_transactions.return_value = {
+            "iban": {
+                "type": "account",
+                "transactions": [{"bdate": "2024-01-20"}, {"bdate": "2024-01-02"}],
+                "error": None,
+            },
+            "pan": {"type": "creditcard", "transactions": [], "error": "failed"},
+            "pan2": {
+                "type": "creditcard",
+                "transactions": [{"bdate": "2024-01-10"}],
+                "error": None,
+            },
+        }
+        output_list = []
+        obj = {
+            "FORMAT": lambda data, fieldnames: output_list.append(
+                (list(data), fieldnames)
+            ),
+            "UNFILTERED": False,
+        }
+        result = CliRunner().invoke(
+            self.sync,
+            ["--all", "--date-from", "01.01.2024", "--date-to", "2024-01-31"],
+            obj=obj,
+        )
+        self.assertEqual(1, result.exit_code)
+        dkb.get_all_transactions.assert_called_once_with(
+            dkb.account_dic, "01.01.2024", "31.01.2024", transaction_type="booked"
+        )
+        self.assertEqual(
+            [
+                {"account": "iban", "bdate": "2024-01-20"},
+                {"account": "pan2", "bdate": "2024-01-10"},
+                {"account": "iban", "bdate": "2024-01-02"},
+            ],
+            output_list[0][0],
+        )
+        # account columns followed by the card-only ones
+        self.assertEqual(["account", "amount", "currencycode"], output_list[0][1][:3])
+        self.assertEqual(15, len(output_list[0][1]))
+        mock_click.assert_any_call("iban (account): 2 transactions", err=True)
+        mock_click.assert_any_call("pan: failed", err=True)
+
+    @patch("dkb_robo.cli_sync._login")
+    def test_039_sync(self, mock_login):
+        """test sync of a single account and without account selection"""
+        dkb = mock_login.return_value.__enter__.return_value
+        dkb.account_dic = {0: {"account": "iban"}, 1: {"account": "pan"}}
+        dkb.get_all_transactions.return_value = {
+            "pan": {"type": "creditcard", "transactions": [], "error": None},
+        }
+        obj = {"FORMAT": Mock(), "UNFILTERED": False}
+        runner = CliRunner()
+        result = runner.invoke(self.sync, ["--account", "pan"], obj=obj)
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual(
+            {0: {"account": "pan"}}, dkb.get_all_transactions.call_args[0][0]
+        )
+        result = runner.invoke(self.sync, [], obj=obj)
+        self.assertEqual(2, result.exit_code)
+        self.assertFalse(mock_login.call_count > 1)
+
+    def test_040__load_format(self):
+        """test the csv formatter writes rows while the iterator produces them"""
+        import io
+
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+
+            def _rows():
+                yield {"amount": 1, "bdate": "2024-01-02", "peer": "foo"}
+                # the first row got flushed before the next one is produced
+                self.assertEqual(
+                    "amount,bdate\r\n1,2024-01-02\r\n", mock_stdout.getvalue()
+                )
+                yield Item(amount=2, bdate="2024-01-01")
+
+            self._load_format("csv")(_rows(), fieldnames=["amount", "bdate"])
+            self.assertEqual(
+                "amount,bdate\r\n1,2024-01-02\r\n2,2024-01-01\r\n",
+                mock_stdout.getvalue(),
+            )
+
+    def test_041__load_format(self):
+        """test the csv formatter takes the header from the first row if none is declared"""
+        import io
+
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+
+            def _rows():
+                yield {"a": 1}
+                # the header does not wait for further rows
+                self.assertEqual("a\r\n1\r\n", mock_stdout.getvalue())
+                yield {"a": 2, "b": 2}
+
+            self._load_format("csv")(_rows())
+            self.assertEqual("a\r\n1\r\n2\r\n", mock_stdout.getvalue())
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            self._load_format("csv")({"foo": {"a": 1}})
+            self.assertEqual("a\r\n1\r\n", mock_stdout.getvalue())
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            self._load_format("csv")([])
+            self.assertEqual("", mock_stdout.getvalue())
+
+    def test_042__load_format(self):
+        """test the ndjson formatter writes one json object per line"""
+        import io
+
+        with patch("sys.stdout", new_callable=io.StringIO) as mock_stdout:
+            self._load_format("ndjson")(
+                iter([{"a": 1}, Item(amount=2, bdate=None)]), fieldnames=["a"]
+            )
+            self.assertEqual(
+                '{"a": 1}\n{"amount": 2, "bdate": null}\n', mock_stdout.getvalue()
+            )
+        with patch("click.echo") as mock_echo:
+            self._load_format("json")(iter([Item(amount=2, bdate=None)]))
+            mock_echo.assert_called_once_with(
+                '[\n  {\n    "amount": 2,\n    "bdate": null\n  }\n]'
+            )
+
+    @patch("click.echo")
+    @patch("dkb_robo.cli_sync._login")
+    def test_043_export(self, mock_login, mock_click):
+        """test export of transactions and standing orders into sqlite"""
+        import sqlite3
+        import tempfile
+
+        dkb = mock_login.return_value.__enter__.return_value
+        dkb.account_dic = {
+            0: {"id": "uid", "account": "iban", "type": "account"},
+            1: {"id": "did", "account": "depot", "type": "depot"},
+        }
+        dkb.get_all_transactions.return_value = {
+            "iban": {
+                "type": "account",
+                "transactions": [{"bdate": "2024-01-02", "amount": -1.5}],
+                "error": None,
+            }
+        }
+        dkb.get_standing_orders.return_value = [{"amount": 10.0}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "export.db")
+            runner = CliRunner()
+            result = runner.invoke(
+                self.export, ["--output", path], obj={"UNFILTERED": True}
+            )
+            self.assertEqual(0, result.exit_code)
+            # depots are exported as positions only
+            self.assertEqual(
+                {0: dkb.account_dic[0]}, dkb.get_all_transactions.call_args[0][0]
+            )
+            # the setting of the instance is left alone
+            self.assertFalse(dkb.get_all_transactions.call_args[1]["unfiltered"])
+            self.assertNotIn("unfiltered", vars(dkb))
+            mock_click.assert_called_with(f"1 rows written to {path}", err=True)
+            result = runner.invoke(
+                self.export,
+                ["--output", path, "--model", "standing-orders", "-a", "iban"],
+                obj={"UNFILTERED": False},
+            )
+            self.assertEqual(0, result.exit_code)
+            dkb.get_standing_orders.assert_called_once_with("uid", unfiltered=False)
+            db = sqlite3.connect(path)
+            self.assertEqual(
+                [("iban", "2024-01-02", -1.5)],
+                db.execute(
+                    "SELECT account, bdate, amount FROM transactions"
+                ).fetchall(),
+            )
+            self.assertEqual(
+                [("iban", 10.0)],
+                db.execute("SELECT account, amount FROM standing_orders").fetchall(),
+            )
+            db.close()
+
+    @patch("dkb_robo.cli_sync._login")
+    def test_044_export(self, mock_login):
+        """test export with an unknown suffix and failing accounts"""
+        dkb = mock_login.return_value.__enter__.return_value
+        dkb.account_dic = {0: {"id": "did", "account": "depot", "type": "depot"}}
+        dkb.get_all_transactions.return_value = {
+            "depot": {"type": "depot", "transactions": [], "error": "failed"}
+        }
+        runner = CliRunner()
+        result = runner.invoke(self.export, ["--output", "export.txt"], obj={})
+        self.assertEqual(2, result.exit_code)
+        self.assertFalse(mock_login.called)
+        with patch("click.echo") as mock_click, patch(
+            "dkb_robo.export.export"
+        ) as mock_export:
+            mock_export.side_effect = lambda model, data, *args, **kwargs: len(
+                list(data)
+            )
+            result = runner.invoke(
+                self.export,
+                [
+                    "--output",
+                    "export.txt",
+                    "--file-format",
+                    "parquet",
+                    "-M",
+                    "positions",
+                ],
+                obj={"UNFILTERED": False},
+            )
+        self.assertEqual(1, result.exit_code)
+        mock_click.assert_any_call("depot: failed", err=True)
+        self.assertFalse(mock_export.call_args[1]["append"])
+        # only sqlite tables can be appended to
+        result = runner.invoke(
+            self.export, ["--output", "export.parquet", "--append"], obj={}
+        )
+        self.assertEqual(2, result.exit_code)
+        self.assertIn("--append requires a sqlite file", result.output)
+
+    def test_037_importtime(self):
+        """importing the cli must not load the api, the scraping stack or renderers
+
+        the time budget (cumulative import time in ms) can be set via DKB_IMPORT_BUDGET_MS
+        """
+        import subprocess
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import dkb_robo.cli"],
+            cwd=os.path.dirname(self.dir_path),
+            env=dict(os.environ, PYTHONPATH=os.path.dirname(self.dir_path)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        import_dic = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                (_self, cumulative, module) = line[12:].split("|")
+                if cumulative.strip().isdigit():
+                    import_dic[module.strip()] = int(cumulative)
+        for module in (
+            "bs4",
+            "mechanicalsoup",
+            "tabulate",
+            "dkb_robo.authentication",
+            "dkb_robo.legacy",
+            "dkb_robo.dkb_robo",
+        ):
+            self.assertNotIn(module, import_dic)
+        budget = int(os.environ.get("DKB_IMPORT_BUDGET_MS", 500))
+        self.assertLess(
+            import_dic["dkb_robo.cli"] / 1000,
+            budget,
+            f"importing dkb_robo.cli took {import_dic['dkb_robo.cli'] / 1000:.1f}ms",
+        )
+
+    def test_045__field_list(self):
+        """test _field_list()"""
+        ctx = Mock()
+        self.assertIsNone(self._field_list(ctx, None, "account", False))
+        self.assertEqual(
+            ["bdate", "amount"],
+            self._field_list(ctx, " bdate, amount,,bdate", "account", False),
+        )
+        with self.assertRaises(click.UsageError) as err:
+            self._field_list(ctx, "bdate,peer", "creditcard", False)
+        self.assertEqual(
+            "Unknown fields: peer. Choose from: amount, bdate, currencycode, text, vdate",
+            err.exception.message,
+        )
+        with self.assertRaises(click.UsageError):
+            self._field_list(ctx, "bdate", "account", True)
+
+    @patch("dkb_robo.cli._login")
+    def test_046_csv(self, mock_login):
+        """test commands declare the csv header instead of deriving it from the rows"""
+        dkb = mock_login.return_value.__enter__.return_value
+        dkb.get_credit_limits.return_value = {}
+        dkb.get_standing_orders.return_value = []
+        dkb.account_dic = {0: {"id": "uid", "account": "iban", "name": "name"}}
+        obj = {"FORMAT": self._load_format("csv"), "UNFILTERED": False}
+        runner = CliRunner()
+        result = runner.invoke(self.credit_limits, obj=obj)
+        self.assertEqual("account,limit\n", result.output)
+        result = runner.invoke(self.standing_orders, ["--account", "iban"], obj=obj)
+        self.assertEqual(
+            "amount,currencycode,purpose,recipient,creditoraccount,interval\n",
+            result.output,
+        )
+        obj["UNFILTERED"] = True
+        dkb.account_dic = {0: Mock(id="uid", type="account", iban="iban")}
+        result = runner.invoke(self.standing_orders, ["--account", "iban"], obj=obj)
+        self.assertEqual(
+            "amount,creditor,debtor,description,messages,recurrence,status\n",
+            result.output,
+        )
+
+    def test_048_main(self):
+        """test the sync and export commands get imported on first use"""
+        ctx = click.Context(self.main)
+        self.assertIn("sync", self.main.list_commands(ctx))
+        self.assertIn("export", self.main.list_commands(ctx))
+        self.assertIs(self.sync, self.main.get_command(ctx, "sync"))
+        self.assertIs(self.export, self.main.get_command(ctx, "export"))
+        self.assertIs(self.accounts, self.main.get_command(ctx, "accounts"))
+
+    @patch("dkb_robo.cli._login")
+    def test_051_main(self, mock_login):
+        """test --unfiltered is rejected together with --server"""
+        result = CliRunner().invoke(
+            self.main,
+            [
+                "-u",
+                "user",
+                "-p",
+                "password",
+                "--server",
+                "http://127.0.0.1:8765",
+                "--unfiltered",
+                "accounts",
+            ],
+        )
+        self.assertEqual(2, result.exit_code)
+        self.assertIn("--unfiltered cannot be combined with --server", result.output)
+        self.assertFalse(mock_login.called)
+
 
 if __name__ == "__main__":
 
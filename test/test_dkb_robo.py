@@ -5,7 +5,7 @@ import sys
 import os
 import unittest
 from pathlib import Path
-from unittest.mock import patch, MagicMock, Mock, mock_open
+from unittest.mock import patch, MagicMock, Mock, mock_open, ANY
 from bs4 import BeautifulSoup
 from mechanicalsoup import LinkNotFoundError
 from datetime import date
@@ -285,6 +285,7 @@ class TestDKBRobo(unittest.TestCase):
             use_account_folders=False,
             list_only=False,
             accounts_by_id={"id1": "account1", "id2": "account2"},
+            rate_limiter=ANY,
         )
         mock_download_doc.assert_any_call(
             self.dkb,
@@ -295,6 +296,7 @@ class TestDKBRobo(unittest.TestCase):
             use_account_folders=False,
             list_only=False,
             accounts_by_id={"id1": "account1", "id2": "account2"},
+            rate_limiter=ANY,
         )
 
     @patch("dkb_robo.dkb_robo.DKBRobo.format_doc")
@@ -323,8 +325,7 @@ class TestDKBRobo(unittest.TestCase):
         self.assertTrue(mock_format.called)
         self.assertTrue(mock_fetch_items.called)
 
-    @patch("dkb_robo.dkb_robo.time.sleep", autospec=True)
-    def test_019_download_doc(self, mock_sleep):
+    def test_019_download_doc(self):
         """download a single document"""
         path = Path("/some/path")
         doc = MagicMock()
@@ -346,9 +347,11 @@ class TestDKBRobo(unittest.TestCase):
         )
         target = path / "category" / "account"
         filename = "2022-01-01_document.pdf"
-        doc.download.assert_called_with(self.dkb.wrapper.client, target / filename)
+        doc.download.assert_called_with(
+            self.dkb.wrapper.client, target / filename, rate_limiter=None
+        )
         doc.mark_read.assert_called_with(self.dkb.wrapper.client, True)
-        mock_sleep.assert_called_once_with(0.5)
+        self.assertTrue(doc.rcode)
 
     def test_020_download_doc(self):
         """list only"""
@@ -375,8 +378,7 @@ class TestDKBRobo(unittest.TestCase):
         doc.download.assert_not_called()
         doc.mark_read.assert_not_called()
 
-    @patch("dkb_robo.dkb_robo.time.sleep", autospec=True)
-    def test_021_download_doc(self, mock_sleep):
+    def test_021_download_doc(self):
         """test existing file"""
         path = Path("/some/path")
         doc = MagicMock()
@@ -402,9 +404,11 @@ class TestDKBRobo(unittest.TestCase):
         self.dkb.logger.info.assert_called_with(
             "File already exists. Skipping %s.", filename
         )
-        doc.download.assert_called_with(self.dkb.wrapper.client, target / filename)
+        doc.download.assert_called_with(
+            self.dkb.wrapper.client, target / filename, rate_limiter=None
+        )
         doc.mark_read.assert_not_called()
-        mock_sleep.assert_not_called()
+        self.assertEqual("skipped", doc.rcode)
 
     def test_022_format_doc(self):
         """format documents"""
@@ -557,6 +561,330 @@ class TestDKBRobo(unittest.TestCase):
 
         self.assertEqual(result, expected_result)
 
+    @patch("dkb_robo.dkb_robo.DKBRobo.format_doc", autospec=True)
+    @patch("dkb_robo.postbox.PostBox.fetch_items")
+    @patch("dkb_robo.dkb_robo.DKBRobo.download_doc", autospec=True)
+    def test_026_download(self, mock_download_doc, mock_fetch_items, mock_format):
+        """download documents via thread pool"""
+        path = Path("/some/path")
+        self.dkb.wrapper = Mock()
+        self.dkb.wrapper.account_dic = {}
+        mock_fetch_items.return_value = {
+            f"doc{idx}": f"document{idx}" for idx in range(10)
+        }
+        mock_format.return_value = {"foo": "bar"}
+        self.assertEqual(
+            {"foo": "bar"},
+            self.dkb.download(path=path, download_all=True, concurrency=4, rate=0),
+        )
+        self.assertEqual(10, mock_download_doc.call_count)
+        rate_limiter_list = [
+            call.kwargs["rate_limiter"] for call in mock_download_doc.call_args_list
+        ]
+        # all workers share the same rate limiter
+        self.assertEqual(1, len(set(rate_limiter_list)))
+        self.assertEqual(4, rate_limiter_list[0].capacity)
+
+    @patch("dkb_robo.dkb_robo.DKBRobo.format_doc", autospec=True)
+    @patch("dkb_robo.postbox.PostBox.fetch_items")
+    @patch("dkb_robo.dkb_robo.DKBRobo.download_doc", autospec=True)
+    def test_027_download(self, mock_download_doc, mock_fetch_items, mock_format):
+        """download documents via thread pool - exceptions get re-raised"""
+        self.dkb.wrapper = Mock()
+        self.dkb.wrapper.account_dic = {}
+        mock_fetch_items.return_value = {"doc1": "document1", "doc2": "document2"}
+        mock_download_doc.side_effect = Exception("exc_download")
+        with self.assertRaises(Exception) as err:
+            self.dkb.download(path=Path("/some/path"), download_all=True, concurrency=2)
+        self.assertEqual("exc_download", str(err.exception))
+        self.assertFalse(mock_format.called)
+
+    @patch("dkb_robo.transaction.Transactions.iter_pages")
+    @patch("dkb_robo.dkb_robo.validate_dates")
+    def test_028_iter_transactions(self, mock_date, mock_pages):
+        """test iter_transactions()"""
+        mock_date.return_value = ("from", "to")
+        self.dkb.wrapper = Mock()
+        mock_pages.return_value = iter([["foo1", "foo2"], [], ["foo3"]])
+        transactions = self.dkb.iter_transactions("url", "account", "from", "to")
+        # nothing gets fetched before the generator gets consumed
+        self.assertFalse(mock_pages.called)
+        self.assertEqual(["foo1", "foo2", "foo3"], list(transactions))
+        mock_pages.assert_called_once_with("url", "account", "from", "to", "booked")
+
+    @patch("dkb_robo.dkb_robo.validate_dates")
+    def test_030_sync_transactions(self, mock_date):
+        """test sync_transactions()"""
+        mock_date.return_value = ("from", "to")
+        self.dkb.wrapper = Mock()
+        store = Mock()
+        store.transactions.return_value = ["foo"]
+        self.assertEqual(
+            ["foo"],
+            self.dkb.sync_transactions(store, "aid", "url", "account", "from", "to"),
+        )
+        store.sync.assert_called_once_with(ANY, "aid", "url", "account", "from", "to")
+        self.assertTrue(store.sync.call_args[0][0].strict)
+        store.transactions.assert_called_once_with(
+            "aid", "account", "from", "to", "booked", unfiltered=False
+        )
+        self.assertFalse(store.positions.called)
+
+    @patch("dkb_robo.dkb_robo.validate_dates")
+    def test_031_sync_transactions(self, mock_date):
+        """test sync_transactions() for a depot"""
+        mock_date.return_value = ("from", "to")
+        self.dkb.wrapper = Mock()
+        store = Mock()
+        store.positions.return_value = ["bar"]
+        self.assertEqual(
+            ["bar"],
+            self.dkb.sync_transactions(store, "did", "url", "depot", "from", "to"),
+        )
+        store.positions.assert_called_once_with("did", unfiltered=False)
+        self.assertFalse(store.transactions.called)
+
+    @patch("dkb_robo.transaction.Transactions.backfill")
+    @patch("dkb_robo.dkb_robo.validate_dates")
+    def test_029_backfill_transactions(self, mock_date, mock_backfill):
+        """test backfill_transactions()"""
+        mock_date.return_value = ("from", "to")
+        self.dkb.wrapper = Mock()
+        self.dkb.max_workers = 5
+        mock_backfill.return_value = ["foo"]
+        self.assertEqual(
+            ["foo"], self.dkb.backfill_transactions("url", "account", "from", "to")
+        )
+        mock_backfill.assert_called_once_with(
+            "url", "account", "from", "to", "booked", max_workers=5
+        )
+
+    @patch("dkb_robo.transaction.Transactions.get_frame")
+    @patch("dkb_robo.dkb_robo.validate_dates")
+    def test_032_get_transaction_frame(self, mock_date, mock_frame):
+        """test get_transaction_frame()"""
+        mock_date.return_value = ("from", "to")
+        self.dkb.wrapper = Mock()
+        mock_frame.return_value = ["foo"]
+        self.assertEqual(
+            ["foo"],
+            self.dkb.get_transaction_frame("url", "account", "from", "to", "pending"),
+        )
+        mock_frame.assert_called_once_with(
+            "url", "account", "from", "to", "pending", None
+        )
+
+    def test_033_refresh_accounts(self):
+        """test refresh_accounts()"""
+        self.dkb.wrapper = Mock()
+        self.dkb.account_dic = {0: "old"}
+        self.dkb.wrapper.overview.return_value = {0: "new"}
+        self.assertEqual({0: "new"}, self.dkb.refresh_accounts())
+        self.assertEqual({0: "new"}, self.dkb.account_dic)
+
+    def test_034_refresh_accounts(self):
+        """test refresh_accounts() keeps the overview if the refresh fails"""
+        self.dkb.wrapper = Mock()
+        self.dkb.account_dic = {0: "old"}
+        self.dkb.wrapper.overview.return_value = {}
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertEqual({0: "old"}, self.dkb.refresh_accounts())
+        self.assertIn(
+            "ERROR:dkb_robo:Refreshing the account overview failed", lcm.output
+        )
+
+    def test_035_package(self):
+        """test lazy attributes of the package"""
+        import dkb_robo
+        from dkb_robo.dkb_robo import DKBRobo, DKBRoboError
+
+        self.assertIs(DKBRobo, dkb_robo.DKBRobo)
+        self.assertIs(DKBRoboError, dkb_robo.DKBRoboError)
+        self.assertTrue(dkb_robo.__version__)
+        self.assertIn("DKBRobo", dir(dkb_robo))
+        with self.assertRaises(AttributeError):
+            dkb_robo.unknown
+
+    @patch("dkb_robo.dkb_robo.StandingOrders")
+    def test_036_operation(self, mock_so):
+        """test exported methods run within the deadline of the transport policy"""
+        from dkb_robo.transport import TransportAdapter, TransportPolicy
+
+        transport = TransportAdapter(TransportPolicy(deadline=60))
+        self.dkb.wrapper = Mock()
+        self.dkb.wrapper.transport = transport
+        mock_so.return_value.fetch.side_effect = lambda uid: transport.remaining()
+        self.assertTrue(59 < self.dkb.get_standing_orders() <= 60)
+        self.assertIsNone(transport.remaining())
+
+    @patch("dkb_robo.dkb_robo.Transactions")
+    def test_037_operation(self, mock_trans):
+        """test generators keep the deadline until they are exhausted"""
+        from dkb_robo.transport import TransportAdapter, TransportPolicy
+
+        transport = TransportAdapter(TransportPolicy(deadline=60))
+        self.dkb.wrapper = Mock()
+        self.dkb.wrapper.transport = transport
+        mock_trans.return_value.iter_pages.return_value = [[1, 2], [3]]
+        remaining_list = []
+        for _transaction in self.dkb.iter_transactions(
+            "url", "account", "01.01.2024", "31.01.2024"
+        ):
+            remaining_list.append(transport.remaining())
+        self.assertEqual(3, len(remaining_list))
+        self.assertTrue(all(remaining_list))
+        self.assertIsNone(transport.remaining())
+
+    def test_038_transaction_sources(self):
+        """test _transaction_sources() skips products without transactions"""
+        account_dic = {
+            0: {"account": "iban", "type": "account", "transactions": "url1"},
+            1: {"account": "pan1", "type": "creditcard", "transactions": "url2"},
+            2: {"account": "pan2", "type": "debitcard"},
+            3: {"account": "depot", "type": "depot", "transactions": "url3"},
+        }
+        self.assertEqual(
+            [
+                ("iban", "account", "url1"),
+                ("pan1", "creditcard", "url2"),
+                ("depot", "depot", "url3"),
+            ],
+            self.dkb._transaction_sources(account_dic),
+        )
+        self.dkb.unfiltered = True
+        account_dic = {
+            0: Mock(iban=None, maskedPan="pan", type="creditCard", transactions="url"),
+            1: Mock(iban=None, maskedPan="pan2", type="debitCard", transactions="url"),
+        }
+        self.assertEqual(
+            [("pan", "creditCard", "url")], self.dkb._transaction_sources(account_dic)
+        )
+        # formatted accounts of an unfiltered instance
+        self.assertEqual(
+            [("iban", "account", "url1")],
+            self.dkb._transaction_sources(
+                {0: {"account": "iban", "type": "account", "transactions": "url1"}},
+                False,
+            ),
+        )
+
+    @patch("dkb_robo.dkb_robo.Transactions")
+    def test_039_get_all_transactions(self, mock_trans):
+        """test get_all_transactions() reports failures per account"""
+        from dkb_robo.utilities import DKBRoboError as ApiError
+
+        def _get(transaction_url, atype, date_from, date_to, transaction_type):
+            if atype == "creditcard":
+                raise ApiError("http status code is not 200 but 500")
+            return [f"{transaction_url} {date_from} {date_to} {transaction_type}"]
+
+        mock_trans.return_value.get.side_effect = _get
+        self.dkb.wrapper = Mock()
+        self.dkb.account_dic = {
+            0: {"account": "iban", "type": "account", "transactions": "url1"},
+            1: {"account": "pan", "type": "creditcard", "transactions": "url2"},
+            2: {"account": "depot", "type": "depot", "transactions": "url3"},
+        }
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            result = self.dkb.get_all_transactions(None, "01.01.2024", "31.01.2024")
+        self.assertEqual(
+            {
+                "iban": {
+                    "type": "account",
+                    "transactions": ["url1 2024-01-01 2024-01-31 booked"],
+                    "error": None,
+                },
+                "pan": {
+                    "type": "creditcard",
+                    "transactions": [],
+                    "error": "http status code is not 200 but 500",
+                },
+                "depot": {
+                    "type": "depot",
+                    "transactions": ["url3 2024-01-01 2024-01-31 booked"],
+                    "error": None,
+                },
+            },
+            result,
+        )
+        self.assertIn(
+            "ERROR:dkb_robo:fetching transactions of pan failed: http status code is not 200 but 500",
+            lcm.output,
+        )
+        self.assertTrue(mock_trans.call_args[1]["strict"])
+        self.assertEqual(
+            {}, self.dkb.get_all_transactions({}, "01.01.2024", "31.01.2024")
+        )
+        self.dkb.max_workers = 2
+        with patch("dkb_robo.dkb_robo.ThreadPoolExecutor") as mock_pool:
+            mock_pool.return_value.__enter__.return_value.map = map
+            self.dkb.get_all_transactions(
+                None, "01.01.2024", "31.01.2024", fields=["amount"]
+            )
+        mock_pool.assert_called_once_with(max_workers=2)
+        self.assertEqual(["amount"], mock_trans.call_args[1]["field_list"])
+
+    @patch("dkb_robo.dkb_robo.Transactions")
+    @patch("dkb_robo.dkb_robo.validate_dates")
+    def test_040_get_transactions(self, mock_date, mock_trans):
+        """test get_transactions(), iter_transactions() and backfill_transactions() with fields"""
+        mock_date.return_value = ("from", "to")
+        self.dkb.wrapper = Mock()
+        mock_trans.return_value.get.return_value = [{"amount": 1.0}]
+        mock_trans.return_value.iter_pages.return_value = iter([[{"amount": 2.0}]])
+        mock_trans.return_value.backfill.return_value = []
+        self.assertEqual(
+            [{"amount": 1.0}],
+            self.dkb.get_transactions(
+                "url", "account", "from", "to", fields=["amount"]
+            ),
+        )
+        self.assertEqual(["amount"], mock_trans.call_args[1]["field_list"])
+        self.assertEqual(
+            [{"amount": 2.0}],
+            list(self.dkb.iter_transactions("url", "account", "from", "to")),
+        )
+        self.assertIsNone(mock_trans.call_args[1]["field_list"])
+        self.dkb.backfill_transactions("url", "account", "from", "to", fields=["bdate"])
+        self.assertEqual(["bdate"], mock_trans.call_args[1]["field_list"])
+
+    @patch("dkb_robo.utilities.time")
+    def test_041_download_doc(self, mock_time):
+        """the rate limits documents - marking a document read takes no extra token"""
+        import tempfile
+        from dkb_robo.postbox import Document, Message, PostboxItem
+        from dkb_robo.utilities import RateLimiter
+
+        # the clock stands still, every wait is due to the rate
+        mock_time.monotonic.return_value = 0
+        self.dkb.wrapper = MagicMock()
+        self.dkb.wrapper.client.get.return_value.status_code = 200
+        self.dkb.wrapper.client.get.return_value.iter_content.return_value = [b"pdf"]
+        rate_limiter = RateLimiter(rate=2.0, capacity=1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for idx in range(5):
+                self.dkb.download_doc(
+                    path=Path(tmp_dir),
+                    doc=PostboxItem(
+                        id=str(idx),
+                        document=Document(
+                            fileName=f"document{idx}.pdf",
+                            link="link",
+                            metadata={},
+                        ),
+                        message=Message(
+                            documentType="bankAccountStatement", link="message"
+                        ),
+                    ),
+                    rate_limiter=rate_limiter,
+                )
+        self.assertEqual(5, self.dkb.wrapper.client.patch.call_count)
+        # document n starts (n - 1) / 2 seconds after the first one: 2 documents/s
+        self.assertEqual(
+            [0.5, 1.0, 1.5, 2.0],
+            [call.args[0] for call in mock_time.sleep.call_args_list],
+        )
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.export """
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.export import (
+    columns,
+    export,
+    export_sqlite,
+    postbox_documents,
+    rows,
+)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+TRANSACTION_LIST = [
+    {
+        "account": "iban",
+        "amount": -10.5,
+        "bdate": "2024-01-03",
+        "vdate": "2024-01-02",
+        "currencycode": "EUR",
+        "peer": "peer",
+        "text": "text",
+    },
+    {"account": "pan", "amount": "-1,x", "bdate": None, "text": "card"},
+]
+
+
+class TestRows(unittest.TestCase):
+    """rows() test class"""
+
+    def test_001_rows(self):
+        """test rows() converts values into the types of the schema"""
+        row_list = list(rows("transactions", TRANSACTION_LIST))
+        self.assertEqual(
+            (
+                "iban",
+                datetime.date(2024, 1, 3),
+                datetime.date(2024, 1, 2),
+                -10.5,
+                "EUR",
+                "peer",
+            ),
+            row_list[0][0:6],
+        )
+        self.assertEqual("text", row_list[0][-1])
+        # values which cannot be converted become None
+        self.assertEqual(("pan", None, None, None), row_list[1][0:4])
+        self.assertEqual(len(columns("transactions")), len(row_list[1]))
+
+    def test_002_rows(self):
+        """test rows() of nested and differently named keys"""
+        standing_order = {
+            "account": "iban",
+            "amount": 100.0,
+            "creditoraccount": {"iban": "IBAN-1", "bic": "BIC-1"},
+            "interval": {"frequency": "monthly", "from": "2019-01-05", "until": None},
+        }
+        self.assertEqual(
+            [
+                (
+                    "iban",
+                    100.0,
+                    None,
+                    None,
+                    None,
+                    "IBAN-1",
+                    "BIC-1",
+                    "monthly",
+                    datetime.date(2019, 1, 5),
+                    None,
+                    None,
+                )
+            ],
+            list(rows("standing_orders", [standing_order])),
+        )
+        card = {"account": "pan", "holdername:": "Jane Doe", "currencycode": "EUR"}
+        row = list(rows("accounts", [card]))[0]
+        self.assertEqual(("Jane Doe", None, "EUR"), row[4:7])
+
+    def test_003_rows(self):
+        """test rows() formats unfiltered objects and rejects unknown models"""
+
+        class _Item:
+            def format(self):
+                return {"id": "id", "date": "2024-02-01T10:00:00Z"}
+
+        row = list(rows("accounts", [_Item()]))[0]
+        self.assertEqual("id", row[0])
+        self.assertEqual(datetime.date(2024, 2, 1), row[8])
+        with self.assertRaises(ValueError) as err:
+            list(rows("foo", []))
+        self.assertEqual("Unknown model: foo", str(err.exception))
+
+    def test_004_postbox_documents(self):
+        """test postbox_documents() flattens the categories"""
+        document_dic = {
+            "Kontoauszüge": {
+                "documents": {"subject": {"id": "id", "rcode": 200}},
+                "count": 1,
+            }
+        }
+        self.assertEqual(
+            [
+                {
+                    "category": "Kontoauszüge",
+                    "subject": "subject",
+                    "id": "id",
+                    "rcode": 200,
+                }
+            ],
+            list(postbox_documents(document_dic)),
+        )
+
+
+class TestExport(unittest.TestCase):
+    """export test class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_005_export_sqlite(self):
+        """test export_sqlite() writes all batches into a typed table"""
+        path = os.path.join(self.tmp_dir.name, "export.db")
+        self.assertEqual(
+            2, export("transactions", iter(TRANSACTION_LIST), path, "sqlite", 1)
+        )
+        # a second export replaces the rows of the first one
+        self.assertEqual(
+            2, export_sqlite("transactions", TRANSACTION_LIST, path, batch_size=1)
+        )
+        db = sqlite3.connect(path)
+        self.assertEqual(
+            [("iban", "2024-01-03", -10.5), ("pan", None, None)],
+            db.execute("SELECT account, bdate, amount FROM transactions").fetchall(),
+        )
+        db.close()
+        self.assertEqual(
+            2, export("transactions", TRANSACTION_LIST, path, "sqlite", append=True)
+        )
+        db = sqlite3.connect(path)
+        self.assertEqual(
+            [("iban", "2024-01-03", -10.5), ("pan", None, None)] * 2,
+            db.execute("SELECT account, bdate, amount FROM transactions").fetchall(),
+        )
+        self.assertEqual(
+            ("amount", "REAL"),
+            db.execute("PRAGMA table_info(transactions)").fetchall()[3][1:3],
+        )
+        db.close()
+
+    def test_006_export_sqlite(self):
+        """test export_sqlite() with a custom table and an invalid table name"""
+        path = os.path.join(self.tmp_dir.name, "export.db")
+        self.assertEqual(0, export_sqlite("postbox", [], path, table="documents"))
+        with self.assertRaises(ValueError):
+            export_sqlite("postbox", [], path, table="documents; DROP TABLE foo")
+
+    @patch("dkb_robo.export.pyarrow", None)
+    def test_007_export_arrow(self):
+        """test export without pyarrow"""
+        with self.assertRaises(ImportError) as err:
+            export("transactions", [], os.path.join(self.tmp_dir.name, "a.parquet"))
+        self.assertIn("pip install dkb_robo[arrow]", str(err.exception))
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_008_export_arrow(self):
+        """test export to parquet and arrow ipc"""
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        path = os.path.join(self.tmp_dir.name, "export.parquet")
+        self.assertEqual(
+            2, export("transactions", iter(TRANSACTION_LIST), path, batch_size=1)
+        )
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(columns("transactions"), table.column_names)
+        self.assertEqual(pyarrow.date32(), table.schema.field("bdate").type)
+        self.assertEqual([-10.5, None], table.column("amount").to_pylist())
+
+        path = os.path.join(self.tmp_dir.name, "export.arrow")
+        self.assertEqual(0, export("positions", [], path, "arrow"))
+        table = pyarrow.ipc.open_file(path).read_all()
+        self.assertEqual(0, table.num_rows)
+        self.assertEqual(pyarrow.float64(), table.schema.field("quantity").type)
+        with self.assertRaises(ValueError):
+            export("positions", [], path, "xlsx")
+        with self.assertRaises(ValueError):
+            export("positions", [], path, "arrow", append=True)
+
+
+if __name__ == "__main__":
+
+    unittest.main()
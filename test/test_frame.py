@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.frame """
+import sys
+import os
+import json
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.frame import TransactionFrame, _load_numpy
+from dkb_robo.transaction import AccountTransactionItem
+
+numpy = _load_numpy()
+
+
+def _transaction(uid, booking_date, amount, peer, currency="EUR"):
+    """create a raw account transaction as returned by the api"""
+    return {
+        "id": uid,
+        "attributes": {
+            "status": "booked",
+            "bookingDate": booking_date,
+            "description": f"description {uid}",
+            "transactionType": "LASTSCHRIFT" if amount < 0 else "GUTSCHRIFT",
+            "amount": {"value": str(amount), "currencyCode": currency},
+            "creditor": {"creditorAccount": {"iban": "iban"}, "name": peer},
+            "debtor": {"debtorAccount": {"iban": "iban"}, "name": peer},
+        },
+    }
+
+
+TRANSACTION_LIST = [
+    _transaction("id1", "2023-01-31", -10.1, "shop"),
+    _transaction("id2", "2023-02-01", 2500, "employer"),
+    _transaction("id3", "2023-02-01", -0.29, "shop"),
+    _transaction("id4", "2023-02-15", -100, "shop", "USD"),
+    {"id": "id5"},
+    {"id": "id6", "attributes": {"bookingDate": "2023-02-15"}},
+]
+
+
+class TestTransactionFrame(unittest.TestCase):
+    """TransactionFrame test class"""
+
+    backend = "python"
+
+    def setUp(self):
+        self.dir_path = os.path.dirname(os.path.realpath(__file__))
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.frame = TransactionFrame.from_api(
+                TRANSACTION_LIST, backend=self.backend
+            )
+        self.assertIn(
+            "ERROR:dkb_robo.frame:TransactionFrame.append(): skipping id6: 'amount'",
+            lcm.output,
+        )
+        self.maxDiff = None
+
+    def test_001_from_api(self):
+        """test from_api() encodes the columns"""
+        self.assertEqual(4, len(self.frame))
+        self.assertEqual("q", self.frame.columns["amount"].typecode)
+        self.assertEqual(
+            [-1010, 250000, -29, -10000], list(self.frame.columns["amount"])
+        )
+        self.assertEqual(
+            ["2023-01-31", "2023-02-01", "2023-02-01", "2023-02-15"],
+            self.frame.column("date"),
+        )
+        self.assertEqual([0, 1, 0, 0], list(self.frame.columns["peer"]))
+        self.assertEqual(["shop", "employer"], self.frame.dictionaries["peer"])
+        self.assertEqual(["EUR", "USD"], self.frame.dictionaries["currency"])
+        self.assertEqual(["id1", "id2", "id3", "id4"], self.frame.column("id"))
+        self.assertEqual([-10.1, 2500.0, -0.29, -100.0], self.frame.column("amount"))
+
+    def test_002_from_api(self):
+        """test from_api() peers match the formatted transactions"""
+        with open(
+            self.dir_path + "/mocks/account_transactions.json", encoding="utf8"
+        ) as fixture:
+            transaction_list = json.load(fixture)["data"]
+        frame = TransactionFrame.from_api(transaction_list, backend=self.backend)
+        self.assertEqual(
+            [
+                AccountTransactionItem.from_api(ele["attributes"]).format()["peer"]
+                for ele in json.loads(json.dumps(transaction_list))
+            ],
+            frame.column("peer"),
+        )
+
+    def test_003_from_api(self):
+        """test from_api() for credit card transactions"""
+        frame = TransactionFrame.from_api(
+            [
+                {
+                    "id": "id",
+                    "attributes": {
+                        "bookingDate": "2023-01-01",
+                        "description": "  some   shop",
+                        "amount": {"value": "-1", "currencyCode": "EUR"},
+                    },
+                }
+            ],
+            "creditcard",
+            backend=self.backend,
+        )
+        self.assertEqual(["some shop"], frame.column("peer"))
+        self.assertEqual([None], frame.column("transaction_type"))
+
+    def test_004_filter(self):
+        """test filter()"""
+        self.assertEqual(
+            ["id2", "id3"],
+            self.frame.filter(date_from="2023-02-01", date_to="2023-02-14").column(
+                "id"
+            ),
+        )
+        self.assertEqual(
+            ["id1", "id3"], self.frame.filter(peer="shop", currency="EUR").column("id")
+        )
+        self.assertEqual(["id2"], self.frame.filter(incoming=True).column("id"))
+        self.assertEqual(
+            ["id1", "id3", "id4"],
+            self.frame.filter(transaction_type="LASTSCHRIFT").column("id"),
+        )
+        self.assertEqual(3, len(self.frame.filter(incoming=False)))
+        self.assertEqual(0, len(self.frame.filter(peer="unknown")))
+        self.assertEqual(4, len(self.frame.filter()))
+
+    def test_005_sum(self):
+        """test sum()"""
+        self.assertEqual(2389.61, self.frame.sum())
+        self.assertEqual(-10.39, self.frame.filter(currency="EUR", peer="shop").sum())
+        self.assertEqual(0, self.frame.filter(peer="unknown").sum())
+
+    def test_006_group_by(self):
+        """test group_by()"""
+        self.assertEqual(
+            {"2023-01": -10.1, "2023-02": 2399.71}, self.frame.group_by("month")
+        )
+        self.assertEqual(
+            {"2023-01-31": -10.1, "2023-02-01": 2499.71, "2023-02-15": -100.0},
+            self.frame.group_by("date"),
+        )
+        self.assertEqual(
+            {"shop": -110.39, "employer": 2500.0}, self.frame.group_by("peer")
+        )
+        self.assertEqual(
+            {"EUR": 2489.61, "USD": -100.0}, self.frame.group_by("currency")
+        )
+        with self.assertRaises(ValueError):
+            self.frame.group_by("amount")
+
+    def test_007_balance(self):
+        """test balance()"""
+        self.assertEqual(
+            [("2023-01-31", 89.9), ("2023-02-01", 2589.61), ("2023-02-15", 2489.61)],
+            self.frame.balance(100),
+        )
+
+    def test_008_rows(self):
+        """test rows()"""
+        self.assertEqual(
+            {
+                "id": "id2",
+                "amount": 2500.0,
+                "date": "2023-02-01",
+                "currency": "EUR",
+                "peer": "employer",
+                "transaction_type": "GUTSCHRIFT",
+            },
+            list(self.frame.rows())[1],
+        )
+
+    @patch("dkb_robo.frame._load_numpy", return_value=None)
+    def test_009_init(self, _mock_numpy):
+        """test numpy backend without numpy"""
+        self.assertEqual("python", TransactionFrame().backend)
+        with self.assertRaises(ImportError):
+            TransactionFrame(backend="numpy")
+
+    def test_010_from_api(self):
+        """test from_api() peers of intermediaries match the formatted transactions"""
+        transaction_list = []
+        for uid, amount, peer_dic, description in (
+            ("id1", -1, {"intermediaryName": " intermediary  1"}, "payment"),
+            ("id2", -1, {}, "payment"),
+            ("id3", 1, {}, "refund"),
+            ("id4", -1, {}, "VISA  Debitkartenumsatz"),
+        ):
+            transaction = _transaction(uid, "2023-01-01", amount, " peer  name")
+            transaction["attributes"]["description"] = description
+            for peer in ("creditor", "debtor"):
+                transaction["attributes"][peer].update(peer_dic)
+                # intermediary of the account
+                transaction["attributes"][peer][f"{peer}Account"][
+                    "intermediaryName"
+                ] = "account intermediary"
+            transaction_list.append(transaction)
+        frame = TransactionFrame.from_api(transaction_list, backend=self.backend)
+        self.assertEqual(
+            [
+                "intermediary 1",
+                "account intermediary",
+                "account intermediary",
+                "peer name",
+            ],
+            frame.column("peer"),
+        )
+        self.assertEqual(
+            [
+                AccountTransactionItem.from_api(ele["attributes"]).format()["peer"]
+                for ele in json.loads(json.dumps(transaction_list))
+            ],
+            frame.column("peer"),
+        )
+
+    def test_011_import(self):
+        """test numpy does not get imported with the transaction module"""
+        import subprocess
+
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, dkb_robo.transaction; print('numpy' in sys.modules)",
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        self.assertEqual("False", result.stdout.strip())
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class TestTransactionFrameNumpy(TestTransactionFrame):
+    """run the TransactionFrame tests on the numpy backend"""
+
+    backend = "numpy"
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -7,6 +7,7 @@ from datetime import date
 import unittest
 import logging
 import json
+import requests
 from unittest.mock import patch, Mock, mock_open
 from bs4 import BeautifulSoup
 from mechanicalsoup import LinkNotFoundError
@@ -182,6 +183,17 @@ class TestDKBRobo(unittest.TestCase):
             str(self.wrapper._new_instance([cookieobj])),
         )
 
+    def test_084_new_instance(self, _unused):
+        """test legacy._new_instance() method sharing an existing session"""
+        session = requests.Session()
+        session.headers = {"User-Agent": "Firefox", "Accept": "application/json"}
+        browser = self.wrapper._new_instance(session=session)
+        self.assertIs(session, browser.session)
+        # the user agent of the api calls does not get replaced by mechanicalsoup
+        self.assertEqual(
+            {"User-Agent": "Firefox", "Accept": "application/json"}, session.headers
+        )
+
     def test_011_get_points(self, mock_browser):
         """test legacy.get_points() method"""
         html = read_file(self.dir_path + "/mocks/dkb_punkte.html")
@@ -537,6 +537,101 @@ class TestOverview(unittest.TestCase):
 
         self.assertEqual(result, self.overview.get())
 
+    def test_031__fetch(self):
+        """test _fetch() records latency"""
+        self.overview.client = Mock()
+        self.overview.client.get.return_value.status_code = 200
+        self.overview.client.get.return_value.json.return_value = {"foo": "bar"}
+        self.assertEqual({"foo": "bar"}, self.overview._fetch("url"))
+        self.assertIn("url", self.overview.latency_dic)
+
+    @patch("dkb_robo.portfolio.Overview._fetch")
+    def test_032__fetch_products(self, mock_fetch):
+        """test _fetch_products() sequential"""
+        mock_fetch.side_effect = ["accounts", "cards", "depots", "loans"]
+        self.assertEqual(
+            {
+                "accounts": "accounts",
+                "cards": "cards",
+                "depots": "depots",
+                "loans": "loans",
+            },
+            self.overview._fetch_products(),
+        )
+        self.assertEqual(4, mock_fetch.call_count)
+
+    @patch("dkb_robo.portfolio.Overview._fetch")
+    def test_033__fetch_products(self, mock_fetch):
+        """test _fetch_products() via thread pool"""
+        mock_fetch.side_effect = lambda url_path: url_path
+        self.overview.max_workers = 4
+        self.assertEqual(Overview.PRODUCT_ENDPOINTS, self.overview._fetch_products())
+        self.assertEqual(4, mock_fetch.call_count)
+
+    def test_034_get(self):
+        """test get() e2e with concurrent fetches"""
+        response_dic = {
+            "/config/users/me/product-display-settings": json_load(
+                self.dir_path + "/mocks/pd.json"
+            ),
+            "/accounts/accounts": json_load(self.dir_path + "/mocks/accounts.json"),
+            Overview.PRODUCT_ENDPOINTS["cards"]: json_load(
+                self.dir_path + "/mocks/cards.json"
+            ),
+            "/broker/brokerage-accounts": json_load(
+                self.dir_path + "/mocks/brokerage.json"
+            ),
+            "/loans/loans": {"foo": "bar"},
+        }
+        with patch("dkb_robo.portfolio.Overview._fetch") as mock_fetch:
+            mock_fetch.side_effect = list(response_dic.values())
+            sequential_result = self.overview.get()
+
+        self.overview.max_workers = 4
+        self.overview.client = Mock()
+        self.overview.client.get.side_effect = lambda url: Mock(
+            status_code=200,
+            json=Mock(
+                return_value=json.loads(
+                    json.dumps(response_dic[url.replace(self.overview.base_url, "")])
+                )
+            ),
+        )
+        self.assertEqual(sequential_result, self.overview.get())
+        self.assertEqual(
+            sorted(response_dic.keys()), sorted(self.overview.latency_dic.keys())
+        )
+
+    @patch("dkb_robo.portfolio.Overview._fetch")
+    def test_035_get(self, mock_fetch):
+        """test get() e2e unfiltered"""
+        mock_fetch.side_effect = [
+            json_load(self.dir_path + "/mocks/pd.json"),
+            json_load(self.dir_path + "/mocks/accounts.json"),
+            json_load(self.dir_path + "/mocks/cards.json"),
+            json_load(self.dir_path + "/mocks/brokerage.json"),
+            {"foo": "bar"},
+        ]
+        self.overview.unfiltered = True
+        item_dic = {getattr(item, "id"): item for item in self.overview.get().values()}
+        self.assertIsInstance(item_dic["baccountid1"], DepotItem)
+        self.assertEqual("productGroup name 1", item_dic["baccountid1"].productGroup)
+        self.assertEqual(
+            "pdsettings brokeraage baccountid1", item_dic["baccountid1"].displayName
+        )
+        self.assertIsInstance(item_dic["cardid1"], CardItem)
+        self.assertEqual("productGroup name 1", item_dic["cardid1"].productGroup)
+        self.assertEqual("pdsettings cardname cardid1", item_dic["cardid1"].displayName)
+        # products without group
+        self.assertIn(
+            None,
+            [
+                item.productGroup
+                for item in item_dic.values()
+                if isinstance(item, CardItem)
+            ],
+        )
+
 
 class TestAccountItem(unittest.TestCase):
     """test class"""
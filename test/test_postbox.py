@@ -1,4 +1,5 @@
 """Tests for the postbox module."""
+import os
 import sys
 import tempfile
 import unittest
@@ -73,7 +74,7 @@ class TestPostboxItem(unittest.TestCase):
         """Test that the download method correctly downloads a document and saves it to the specified file path."""
         mock_client = mock_session.return_value
         mock_client.get.return_value.status_code = 200
-        mock_client.get.return_value.content = b"test content"
+        mock_client.get.return_value.iter_content.return_value = [b"test content"]
         target_file = Path(tempfile.gettempdir()) / "test_001_document.pdf"
         result = self.postbox_item.download(mock_client, target_file, overwrite=True)
         self.assertTrue(result)
@@ -95,7 +96,7 @@ class TestPostboxItem(unittest.TestCase):
         """Test that the download method renames the downloaded file if the checksum of the downloaded file does not match."""
         mock_client = mock_session.return_value
         mock_client.get.return_value.status_code = 200
-        mock_client.get.return_value.content = b"wrong test content"
+        mock_client.get.return_value.iter_content.return_value = [b"wrong test content"]
         target_file = Path(tempfile.gettempdir()) / "test_document.pdf"
         result = self.postbox_item.download(mock_client, target_file, overwrite=True)
         self.assertTrue(result)
@@ -110,19 +111,22 @@ class TestPostboxItem(unittest.TestCase):
         """Test that the download method renames the downloaded file if the checksum of the downloaded file does not match."""
         mock_client = mock_session.return_value
         mock_client.get.return_value.status_code = 200
-        mock_client.get.return_value.content = b"wrong test content"
-        target_file = Path("document.pdf")
-        mock_exists.side_effect = [False, True, True]
+        mock_client.get.return_value.iter_content.return_value = [b"wrong test content"]
+        target_dir = tempfile.mkdtemp()
+        target_file = Path(target_dir) / "document.pdf"
+        mock_exists.side_effect = [False, True]
         with self.assertLogs("dkb_robo", level="INFO") as lcm:
             result = self.postbox_item.download(
                 mock_client, target_file, overwrite=True
             )
         self.assertIn(
-            "WARNING:dkb_robo.postbox:File document.pdf.checksum_mismatch already exists. Not renaming.",
+            f"WARNING:dkb_robo.postbox:File {target_file}.checksum_mismatch already exists. Not renaming.",
             lcm.output,
         )
         self.assertTrue(result)
-        target_file.unlink()  # Remove the downloaded test file
+        # neither the target file nor the temporary file are left behind
+        self.assertEqual([], os.listdir(target_dir))
+        os.rmdir(target_dir)
 
     def test_007_filename(self):
         """Test that the filename method returns the correct filename for the postbox item."""
@@ -253,7 +257,7 @@ class TestPostboxItem(unittest.TestCase):
         mock_client = mock_session.return_value
         mock_client.get.return_value.status_code = 200
         content = b"test content for SHA-512 verification"
-        mock_client.get.return_value.content = content
+        mock_client.get.return_value.iter_content.return_value = [content]
 
         # Create a target file
         target_file = Path(tempfile.gettempdir()) / "test_sha512_document.pdf"
@@ -270,7 +274,8 @@ class TestPostboxItem(unittest.TestCase):
             # Verify the results
             self.assertTrue(result)
             self.assertTrue(target_file.exists())
-            mock_sha512.assert_called_once_with(content)
+            mock_sha512.assert_called_once_with()
+            mock_sha512.return_value.update.assert_called_once_with(content)
         target_file.unlink()  # Remove the downloaded test file
 
     @patch("requests.Session")
@@ -284,7 +289,7 @@ class TestPostboxItem(unittest.TestCase):
         mock_client = mock_session.return_value
         mock_client.get.return_value.status_code = 200
         content = b"test content that will cause a SHA-512 checksum mismatch"
-        mock_client.get.return_value.content = content
+        mock_client.get.return_value.iter_content.return_value = [content]
 
         # Create a target file
         target_file = Path(tempfile.gettempdir()) / "test_sha512_mismatch.pdf"
@@ -319,7 +324,7 @@ class TestPostboxItem(unittest.TestCase):
         # Mock the session and content
         mock_client = mock_session.return_value
         mock_client.get.return_value.status_code = 200
-        mock_client.get.return_value.content = b"test content"
+        mock_client.get.return_value.iter_content.return_value = [b"test content"]
 
         # Create a target file
         target_file = Path(tempfile.gettempdir()) / "test_unsupported_checksum.pdf"
@@ -333,8 +338,82 @@ class TestPostboxItem(unittest.TestCase):
             f"Unsupported checksum length: {len(unsupported_checksum)}",
             str(context.exception),
         )
+        # nothing got downloaded
+        self.assertFalse(target_file.exists())
+        mock_client.get.assert_not_called()
+
+    @patch("requests.Session")
+    def test_034_download_rate_limiter(self, mock_session):
+        """Test that the download method takes a token from the rate limiter before downloading."""
+        mock_client = mock_session.return_value
+        mock_client.get.return_value.status_code = 200
+        mock_client.get.return_value.iter_content.return_value = [b"test content"]
+        rate_limiter = MagicMock()
+        target_file = Path(tempfile.gettempdir()) / "test_034_document.pdf"
+        result = self.postbox_item.download(
+            mock_client, target_file, overwrite=True, rate_limiter=rate_limiter
+        )
+        self.assertTrue(result)
+        rate_limiter.acquire.assert_called_once()
         target_file.unlink()  # Remove the downloaded test file
 
+    @patch("requests.Session")
+    def test_035_download_rate_limiter_existing_file(self, mock_session):
+        """Test that no token is taken from the rate limiter for existing files."""
+        mock_client = mock_session.return_value
+        rate_limiter = MagicMock()
+        target_file = Path(tempfile.gettempdir()) / "existing_035.pdf"
+        target_file.touch()
+        result = self.postbox_item.download(
+            mock_client, target_file, rate_limiter=rate_limiter
+        )
+        self.assertFalse(result)
+        rate_limiter.acquire.assert_not_called()
+        target_file.unlink()
+
+    @patch("requests.Session")
+    def test_036_download_streaming(self, mock_session):
+        """Test that the download method streams the document in chunks and hashes them on the fly."""
+        mock_client = mock_session.return_value
+        mock_client.get.return_value.status_code = 200
+        mock_client.get.return_value.iter_content.return_value = [
+            b"test ",
+            b"content",
+        ]
+        target_dir = tempfile.mkdtemp()
+        target_file = Path(target_dir) / "test_036_document.pdf"
+        result = self.postbox_item.download(mock_client, target_file, overwrite=True)
+        self.assertEqual(200, result)
+        self.assertEqual(b"test content", target_file.read_bytes())
+        mock_client.get.assert_called_once_with(
+            self.document.link,
+            headers={"Accept": self.document.contentType},
+            stream=True,
+        )
+        self.assertTrue(mock_client.get.return_value.close.called)
+        self.assertEqual(["test_036_document.pdf"], os.listdir(target_dir))
+        target_file.unlink()
+        os.rmdir(target_dir)
+
+    @patch("requests.Session")
+    def test_037_download_streaming_error(self, mock_session):
+        """Test that an interrupted download neither leaves a temporary nor a target file behind."""
+        mock_client = mock_session.return_value
+        mock_client.get.return_value.status_code = 200
+
+        def _iter_content(chunk_size):
+            yield b"test "
+            raise requests.ConnectionError("connection reset")
+
+        mock_client.get.return_value.iter_content.side_effect = _iter_content
+        target_dir = tempfile.mkdtemp()
+        target_file = Path(target_dir) / "test_037_document.pdf"
+        with self.assertRaises(requests.ConnectionError):
+            self.postbox_item.download(mock_client, target_file, overwrite=True)
+        self.assertEqual([], os.listdir(target_dir))
+        self.assertTrue(mock_client.get.return_value.close.called)
+        os.rmdir(target_dir)
+
 
 class TestPostBox(unittest.TestCase):
     """Tests for the PostBox class."""
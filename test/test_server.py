@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.server """
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from dataclasses import dataclass
+from pathlib import Path
+from unittest.mock import Mock, patch
+import requests
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.dkb_robo import DKBRoboError
+from dkb_robo.server import Client, Server, _serialize
+
+
+@dataclass
+class Item:
+    """dataclass for serialization tests"""
+
+    foo: str = None
+
+
+class TestServer(unittest.TestCase):
+    """Server test class"""
+
+    def setUp(self):
+        self.dkb = Mock()
+        self.dkb.account_dic = {0: {"account": "account"}}
+        self.dkb.last_login = None
+        self.dkb.snapshot_file = None
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.token_file = os.path.join(self.tmp_dir.name, "server.token")
+        self.server = Server(
+            self.dkb,
+            port=0,
+            keepalive=60,
+            token_file=self.token_file,
+            download_dir=self.tmp_dir.name,
+        )
+        self.maxDiff = None
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_001__serialize(self):
+        """test _serialize()"""
+        self.assertEqual(
+            {"a": [{"foo": "bar"}, "path"], "b": 1},
+            _serialize({"a": (Item(foo="bar"), Path("path")), "b": 1}),
+        )
+
+    def test_002_dispatch(self):
+        """test dispatch() accounts and last login"""
+        self.assertEqual(
+            (200, {"data": {0: {"account": "account"}}}),
+            self.server.dispatch("GET", "/accounts"),
+        )
+        self.assertEqual(
+            (200, {"data": None}), self.server.dispatch("GET", "/last_login?foo=bar")
+        )
+
+    def test_003_dispatch(self):
+        """test dispatch() operation"""
+        self.dkb.get_transactions.return_value = [Item(foo="bar")]
+        self.assertEqual(
+            (200, {"data": [{"foo": "bar"}]}),
+            self.server.dispatch(
+                "POST", "/get_transactions", b'{"transaction_url": "url"}'
+            ),
+        )
+        self.dkb.get_transactions.assert_called_once_with(transaction_url="url")
+
+    def test_004_dispatch(self):
+        """test dispatch() download keeps the path within the download directory"""
+        self.dkb.download.return_value = {}
+        self.assertEqual(
+            (200, {"data": {}}),
+            self.server.dispatch("POST", "/download", b'{"path": "documents"}'),
+        )
+        self.dkb.download.assert_called_once_with(
+            path=Path(self.tmp_dir.name).resolve() / "documents"
+        )
+        for path in ("../documents", "/tmp"):
+            code, response_dic = self.server.dispatch(
+                "POST", "/download", f'{{"path": "{path}"}}'.encode("utf8")
+            )
+            self.assertEqual(400, code)
+            self.assertIn(
+                "path must be within the download directory", response_dic["error"]
+            )
+        self.assertEqual(1, self.dkb.download.call_count)
+
+    def test_005_dispatch(self):
+        """test dispatch() unknown operations"""
+        self.assertEqual(
+            (404, {"error": "unknown operation: POST __enter__"}),
+            self.server.dispatch("POST", "/__enter__"),
+        )
+        self.assertEqual(
+            (404, {"error": "unknown operation: GET get_transactions"}),
+            self.server.dispatch("GET", "/get_transactions"),
+        )
+
+    def test_006_dispatch(self):
+        """test dispatch() bad requests"""
+        self.assertEqual(400, self.server.dispatch("POST", "/download", b"foo")[0])
+        self.assertEqual(
+            (400, {"error": "request body must be a json object"}),
+            self.server.dispatch("POST", "/download", b"[]"),
+        )
+
+    def test_007_dispatch(self):
+        """test dispatch() errors of the operation"""
+        self.dkb.get_exemption_order.side_effect = DKBRoboError("foo")
+        self.assertEqual(
+            (500, {"error": "foo"}),
+            self.server.dispatch("POST", "/get_exemption_order"),
+        )
+
+    def test_012_dispatch(self):
+        """test dispatch() answers unexpected errors with 500"""
+        self.dkb.get_credit_limits.side_effect = KeyError("foo")
+        with self.assertLogs("dkb_robo", level="INFO"):
+            self.assertEqual(
+                (500, {"error": "KeyError: 'foo'"}),
+                self.server.dispatch("POST", "/get_credit_limits"),
+            )
+
+    def test_013_authorize(self):
+        """test authorize() checks host header and token"""
+        self.server.port = 8765
+        token = f"Bearer {self.server.token}"
+        self.assertIsNone(
+            self.server.authorize({"Host": "127.0.0.1:8765", "Authorization": token})
+        )
+        self.assertIsNone(
+            self.server.authorize({"Host": "localhost:8765", "Authorization": token})
+        )
+        self.assertEqual(
+            (403, {"error": "invalid host header"}),
+            self.server.authorize({"Host": "evil.com:8765", "Authorization": token}),
+        )
+        self.assertEqual(403, self.server.authorize({"Authorization": token})[0])
+        self.assertEqual(
+            (401, {"error": "invalid or missing token"}),
+            self.server.authorize({"Host": "127.0.0.1:8765"}),
+        )
+        self.assertEqual(
+            401,
+            self.server.authorize(
+                {"Host": "127.0.0.1:8765", "Authorization": "Bearer wrong"}
+            )[0],
+        )
+
+    def test_008__keepalive(self):
+        """test _keepalive() sends requests until stopped"""
+        self.server.keepalive = 0.01
+        self.dkb.wrapper.base_url = "base_url"
+        response_list = [Mock(status_code=200), Mock(status_code=401)]
+
+        def _get(url, headers):
+            if len(response_list) == 1:
+                self.server.stopped.set()
+            return response_list.pop(0)
+
+        self.dkb.wrapper.client.get.side_effect = _get
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.server._keepalive()
+        self.assertEqual(2, self.dkb.wrapper.client.get.call_count)
+        self.dkb.wrapper.client.get.assert_called_with(
+            "base_url/config/users/me/product-display-settings",
+            headers={"Cache-Control": "max-age=0"},
+        )
+        self.assertIn("ERROR:dkb_robo.server:keepalive failed. RC: 401", lcm.output)
+
+    def test_009__keepalive(self):
+        """test _keepalive() survives connection errors"""
+        self.server.keepalive = 0.01
+        self.dkb.wrapper.base_url = "base_url"
+
+        def _get(url, headers):
+            self.server.stopped.set()
+            raise requests.exceptions.ConnectionError("error")
+
+        self.dkb.wrapper.client.get.side_effect = _get
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.server._keepalive()
+        self.assertIn("ERROR:dkb_robo.server:keepalive failed: error", lcm.output)
+
+    def test_011__keepalive(self):
+        """test _keepalive() refreshes the account snapshot"""
+        self.server.keepalive = 0.01
+        self.dkb.snapshot_file = "snapshot.json"
+        self.dkb.refresh_accounts.side_effect = lambda: self.server.stopped.set()
+        self.server._keepalive()
+        self.dkb.refresh_accounts.assert_called_once_with()
+        self.assertFalse(self.dkb.wrapper.client.get.called)
+
+    def test_010_serve_forever(self):
+        """test serve_forever() with client roundtrip"""
+        self.dkb.get_transactions.return_value = [{"amount": 1.0}]
+        self.dkb.get_standing_orders.side_effect = DKBRoboError("no orders")
+        server_thread = threading.Thread(target=self.server.serve_forever)
+        server_thread.start()
+        try:
+            while not os.path.exists(self.token_file):
+                time.sleep(0.01)
+            # the token is readable by the current user only
+            self.assertEqual(0o600, stat.S_IMODE(os.stat(self.token_file).st_mode))
+            with self.assertRaises(DKBRoboError) as err, self.assertLogs(
+                "dkb_robo", level="INFO"
+            ):
+                with Client(f"http://127.0.0.1:{self.server.port}", token_file="foo"):
+                    pass
+            self.assertEqual("invalid or missing token", str(err.exception))
+            with Client(
+                f"http://127.0.0.1:{self.server.port}", token_file=self.token_file
+            ) as client:
+                self.assertEqual({"0": {"account": "account"}}, client.account_dic)
+                self.assertEqual(
+                    [{"amount": 1.0}],
+                    client.get_transactions("url", "account", "from", "to"),
+                )
+                with self.assertRaises(DKBRoboError) as err:
+                    client.get_standing_orders("uid")
+                self.assertEqual("no orders", str(err.exception))
+        finally:
+            self.server.shutdown()
+            server_thread.join()
+        self.dkb.get_transactions.assert_called_once_with(
+            transaction_url="url",
+            atype="account",
+            date_from="from",
+            date_to="to",
+            transaction_type="booked",
+        )
+        self.assertTrue(self.server.stopped.is_set())
+        self.assertFalse(os.path.exists(self.token_file))
+        # answered from the running session instead of a new login
+        self.assertFalse(self.dkb.login.called)
+
+
+class TestClient(unittest.TestCase):
+    """Client test class"""
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile("w", delete=False) as fh:
+            fh.write("token\n")
+        self.client = Client("http://server/", token_file=fh.name)
+        os.unlink(fh.name)
+        self.assertEqual("Bearer token", self.client.session.headers["Authorization"])
+        self.client.session = Mock()
+
+    def test_001__request(self):
+        """test _request()"""
+        self.client.session.request.return_value.status_code = 200
+        self.client.session.request.return_value.json.return_value = {"data": "foo"}
+        self.assertEqual(
+            "foo", self.client._request("POST", "download", path=Path("path"))
+        )
+        self.client.session.request.assert_called_once_with(
+            "POST", "http://server/download", data='{"path": "path"}', timeout=300
+        )
+
+    def test_002__request(self):
+        """test _request() error response"""
+        self.client.session.request.return_value.status_code = 404
+        self.client.session.request.return_value.json.return_value = {}
+        with self.assertRaises(DKBRoboError) as err:
+            self.client._request("GET", "foo")
+        self.assertEqual("Server request failed: 404", str(err.exception))
+
+    def test_003__request(self):
+        """test _request() server not reachable"""
+        self.client.session.request.side_effect = requests.exceptions.ConnectionError(
+            "refused"
+        )
+        with self.assertRaises(DKBRoboError) as err:
+            self.client._request("GET", "foo")
+        self.assertEqual("Server request failed: refused", str(err.exception))
+
+    @patch("dkb_robo.server.Client._request")
+    def test_004_methods(self, mock_request):
+        """test operations are mapped to requests"""
+        self.client.get_credit_limits()
+        mock_request.assert_called_with("POST", "get_credit_limits")
+        self.client.get_exemption_order()
+        mock_request.assert_called_with("POST", "get_exemption_order")
+        self.client.get_standing_orders("uid")
+        mock_request.assert_called_with("POST", "get_standing_orders", uid="uid")
+        self.client.scan_postbox("path")
+        mock_request.assert_called_with(
+            "POST", "download", path="path", download_all=False, prepend_date=False
+        )
+        self.client.backfill_transactions("url", "account", "from", "to", "pending")
+        mock_request.assert_called_with(
+            "POST",
+            "backfill_transactions",
+            transaction_url="url",
+            atype="account",
+            date_from="from",
+            date_to="to",
+            transaction_type="pending",
+        )
+        mock_request.return_value = ["transaction"]
+        self.assertEqual(
+            ["transaction"],
+            list(
+                self.client.iter_transactions(
+                    "url", "account", "from", "to", fields=["amount"]
+                )
+            ),
+        )
+        self.assertEqual(["amount"], mock_request.call_args[1]["fields"])
+        with self.assertRaises(DKBRoboError):
+            self.client.sync_transactions("store")
+
+    @patch("dkb_robo.server.Client._request")
+    def test_005_get_all_transactions(self, mock_request):
+        """test get_all_transactions() fetches the accounts one after another"""
+        mock_request.side_effect = [DKBRoboError("failed"), ["transaction"]]
+        self.client.account_dic = {
+            "0": {"account": "iban", "type": "account", "transactions": "url1"},
+            "1": {"account": "pan", "type": "debitcard"},
+            "2": {
+                "depositAccountId": "depot",
+                "type": "brokerageAccount",
+                "transactions": "url2",
+            },
+        }
+        with self.assertLogs("dkb_robo", level="INFO"):
+            result = self.client.get_all_transactions(None, "from", "to")
+        self.assertEqual(
+            {
+                "iban": {"type": "account", "transactions": [], "error": "failed"},
+                "depot": {
+                    "type": "brokerageAccount",
+                    "transactions": ["transaction"],
+                    "error": None,
+                },
+            },
+            result,
+        )
+        self.assertEqual(2, mock_request.call_count)
+        self.assertEqual("url2", mock_request.call_args[1]["transaction_url"])
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.snapshot """
+import sys
+import os
+import stat
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.snapshot import load_snapshot, save_snapshot
+from dkb_robo.utilities import Amount
+
+
+class TestSnapshot(unittest.TestCase):
+    """snapshot test class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "snapshot.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_001_roundtrip(self):
+        """test save_snapshot() and load_snapshot()"""
+        save_snapshot(
+            self.path,
+            "user",
+            {
+                0: {"iban": "iban", "amount": 1.0},
+                1: Amount(value=1, currencyCode="EUR"),
+            },
+        )
+        (account_dic, age) = load_snapshot(self.path, "user", 60)
+        self.assertEqual(
+            {
+                "0": {"iban": "iban", "amount": 1.0},
+                "1": {
+                    "value": 1.0,
+                    "currencyCode": "EUR",
+                    "conversionRate": None,
+                    "date": None,
+                    "unit": None,
+                },
+            },
+            account_dic,
+        )
+        self.assertLess(age, 60)
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.path).st_mode))
+
+    def test_002_load_snapshot(self):
+        """test load_snapshot() rejects missing, foreign and outdated snapshots"""
+        self.assertIsNone(load_snapshot(self.path, "user"))
+        save_snapshot(self.path, "user", {0: {"iban": "iban"}})
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertIsNone(load_snapshot(self.path, "other"))
+            with patch("time.time", return_value=time.time() + 120):
+                self.assertIsNone(load_snapshot(self.path, "user", 60))
+                # without bound any age is fine
+                self.assertTrue(load_snapshot(self.path, "user"))
+        self.assertIn(
+            "INFO:dkb_robo.snapshot:Snapshot belongs to a different user", lcm.output
+        )
+        self.assertIn(
+            "INFO:dkb_robo.snapshot:Snapshot is outdated (120s old)", lcm.output
+        )
+
+    def test_003_save_snapshot(self):
+        """test save_snapshot() errors do not raise"""
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            save_snapshot(self.path, "user", {0: {"foo": object()}})
+        self.assertTrue(
+            lcm.output[0].startswith(
+                f"ERROR:dkb_robo.snapshot:Unable to write snapshot to {self.path}"
+            )
+        )
+        self.assertEqual([], os.listdir(self.tmp_dir.name))
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.store """
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.store import TransactionStore
+from dkb_robo.transaction import Transactions
+from dkb_robo.utilities import DKBRoboError
+
+
+def _transaction(uid, booking_date, status="booked", amount="-10"):
+    """create a raw account transaction as returned by the api"""
+    return {
+        "id": uid,
+        "type": "accountTransaction",
+        "attributes": {
+            "status": status,
+            "bookingDate": booking_date,
+            "description": f"description {uid}",
+            "amount": {"value": amount, "currencyCode": "EUR"},
+            "creditor": {"creditorAccount": {"iban": f"iban {uid}"}, "name": "name"},
+            "debtor": {"debtorAccount": {"iban": "iban"}},
+        },
+    }
+
+
+class TestTransactionStore(unittest.TestCase):
+    """TransactionStore test class"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = TransactionStore(os.path.join(self.tmp_dir.name, "store.db"))
+        self.maxDiff = None
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def _fetch_side_effect(self, transaction_list):
+        """emulate Transactions._fetch() on a given list filtered by the url parameters"""
+
+        def _fetch(url):
+            date_from = url.split("filter[bookingDate][GE]=")[1][:10]
+            date_to = url.split("filter[bookingDate][LE]=")[1][:10]
+            return {
+                "data": [
+                    ele
+                    for ele in transaction_list
+                    if date_from <= ele["attributes"]["bookingDate"] <= date_to
+                ],
+                "included": [],
+            }
+
+        return _fetch
+
+    def test_001_init(self):
+        """test TransactionStore() uses wal mode"""
+        self.assertEqual(
+            "wal", self.store.db.execute("PRAGMA journal_mode").fetchone()[0]
+        )
+
+    def test_002_add_transactions(self):
+        """test add_transactions() and transactions() roundtrip"""
+        self.assertEqual(
+            3,
+            self.store.add_transactions(
+                "aid",
+                "account",
+                [
+                    _transaction("id1", "2023-01-01"),
+                    _transaction("id2", "2023-01-10"),
+                    _transaction("id3", "2023-01-11", "pending"),
+                    {"id": "id4"},
+                ],
+            ),
+        )
+        transaction_list = self.store.transactions(
+            "aid", "account", "01.01.2023", "2023-01-31"
+        )
+        self.assertEqual(
+            ["iban id2", "iban id1"], [ele["peeraccount"] for ele in transaction_list]
+        )
+        self.assertEqual(-10.0, transaction_list[0]["amount"])
+        self.assertEqual(
+            ["iban id3"],
+            [
+                ele["peeraccount"]
+                for ele in self.store.transactions(
+                    "aid", "account", "2023-01-01", "2023-01-31", "reserved"
+                )
+            ],
+        )
+        self.assertFalse(
+            self.store.transactions("other", "account", "2023-01-01", "2023-01-31")
+        )
+
+    def test_003_add_transactions(self):
+        """test add_transactions() date filter and unfiltered output"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [_transaction("id1", "2023-01-01"), _transaction("id2", "2023-02-01")],
+        )
+        transaction_list = self.store.transactions(
+            "aid", "account", "2023-01-15", "2023-02-15", unfiltered=True
+        )
+        self.assertEqual(1, len(transaction_list))
+        self.assertEqual("id2", transaction_list[0].id)
+        self.assertEqual("name", transaction_list[0].creditor.name)
+
+    def test_004_add_transactions(self):
+        """test add_transactions() replaces known ids and drops outdated pending transactions"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [
+                _transaction("id1", "2023-01-01"),
+                _transaction("id2", "2023-01-10", "pending"),
+                _transaction("id3", "2023-01-02", "pending"),
+            ],
+        )
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [
+                _transaction("id1", "2023-01-01", amount="-20"),
+                _transaction("id4", "2023-01-09"),
+            ],
+            "2023-01-05",
+            "2023-01-31",
+        )
+        self.assertEqual(
+            [("iban id4", -10.0), ("iban id1", -20.0)],
+            [
+                (ele["peeraccount"], ele["amount"])
+                for ele in self.store.transactions(
+                    "aid", "account", "2023-01-01", "2023-01-31"
+                )
+            ],
+        )
+        # pending transaction before the synced range is kept
+        self.assertEqual(
+            ["iban id3"],
+            [
+                ele["peeraccount"]
+                for ele in self.store.transactions(
+                    "aid", "account", "2023-01-01", "2023-01-31", "pending"
+                )
+            ],
+        )
+        self.assertEqual(("2023-01-05", "2023-01-31"), self.store.coverage("aid"))
+
+    def test_005__since(self):
+        """test _since() without stored data"""
+        self.assertEqual("2023-01-01", self.store._since("aid", "2023-01-01"))
+
+    def test_006__since(self):
+        """test _since() high-water mark minus overlap"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [_transaction("id1", "2023-01-20"), _transaction("id2", "2023-03-01")],
+            "2023-01-01",
+            "2023-03-05",
+        )
+        self.assertEqual("2023-02-22", self.store._since("aid", "2023-01-01"))
+        self.assertEqual("2023-02-25", self.store._since("aid", "2023-02-25"))
+        # range starts before the synced one
+        self.assertEqual("2022-12-01", self.store._since("aid", "2022-12-01"))
+
+    def test_007__since(self):
+        """test _since() goes back to the oldest pending transaction"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [
+                _transaction("id1", "2023-03-01"),
+                _transaction("id2", "2023-02-01", "pending"),
+            ],
+            "2023-01-01",
+            "2023-03-05",
+        )
+        self.assertEqual("2023-02-01", self.store._since("aid", "2023-01-01"))
+
+    def test_008_sync(self):
+        """test sync() only fetches bookings newer than the high-water mark"""
+        api_list = [
+            _transaction("id1", "2023-01-05"),
+            _transaction("id2", "2023-01-20"),
+            _transaction("id3", "2023-02-03", "pending"),
+        ]
+        transaction = Transactions(client=Mock())
+        with patch.object(
+            transaction, "_fetch", side_effect=self._fetch_side_effect(api_list)
+        ) as mock_fetch:
+            self.assertEqual(
+                3,
+                self.store.sync(
+                    transaction,
+                    "aid",
+                    "url",
+                    "account",
+                    "01.01.2023",
+                    "2023-02-05",
+                ),
+            )
+            # pending transaction got booked, a late booking showed up
+            api_list[2] = _transaction("id3", "2023-02-03")
+            api_list.append(_transaction("id4", "2023-01-18"))
+            self.assertEqual(
+                3,
+                self.store.sync(
+                    transaction, "aid", "url", "account", "2023-01-01", "2023-02-10"
+                ),
+            )
+        self.assertIn(
+            "filter[bookingDate][GE]=2023-01-01", mock_fetch.call_args_list[0][0][0]
+        )
+        self.assertIn(
+            "filter[bookingDate][GE]=2023-01-13", mock_fetch.call_args_list[1][0][0]
+        )
+        self.assertIn(
+            "filter[bookingDate][LE]=2023-02-10", mock_fetch.call_args_list[1][0][0]
+        )
+        self.assertEqual(
+            ["iban id3", "iban id2", "iban id4", "iban id1"],
+            [
+                ele["peeraccount"]
+                for ele in self.store.transactions(
+                    "aid", "account", "2023-01-01", "2023-02-10"
+                )
+            ],
+        )
+        self.assertFalse(
+            self.store.transactions(
+                "aid", "account", "2023-01-01", "2023-02-10", "pending"
+            )
+        )
+
+    def test_009_sync(self):
+        """test sync() skips the api if the range is covered by the store"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [_transaction("id1", "2023-03-01")],
+            "2023-01-01",
+            "2023-03-05",
+        )
+        transaction = Transactions(client=Mock())
+        with patch.object(transaction, "_fetch") as mock_fetch:
+            self.assertEqual(
+                0,
+                self.store.sync(
+                    transaction, "aid", "url", "account", "2023-01-01", "2023-01-31"
+                ),
+            )
+        self.assertFalse(mock_fetch.called)
+
+    def test_010_sync(self):
+        """test sync() closes the gap to the synced range when going back in time"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [_transaction("id1", "2023-03-01")],
+            "2023-03-01",
+            "2023-03-05",
+        )
+        transaction = Transactions(client=Mock())
+        with patch.object(
+            transaction, "_fetch", side_effect=self._fetch_side_effect([])
+        ) as mock_fetch:
+            self.store.sync(
+                transaction, "aid", "url", "account", "2023-01-01", "2023-01-31"
+            )
+        self.assertIn("filter[bookingDate][LE]=2023-03-05", mock_fetch.call_args[0][0])
+        self.assertEqual(("2023-01-01", "2023-03-05"), self.store.coverage("aid"))
+
+    def test_011_sync(self):
+        """test sync() takes a snapshot of depot positions"""
+        position = {
+            "id": "pid",
+            "attributes": {
+                "lastOrderDate": "2023-01-01",
+                "availableQuantity": {"value": "10", "unit": "pieces"},
+                "quantity": {"value": "10", "unit": "pieces"},
+                "performance": {
+                    "currentValue": {"value": "100", "currencyCode": "EUR"}
+                },
+                "instrument": {
+                    "identifiers": [{"identifier": "isin", "value": "isin"}],
+                    "name": {"short": "short", "long": "long"},
+                },
+            },
+        }
+        transaction = Transactions(client=Mock())
+        with patch.object(
+            transaction, "_fetch", return_value={"data": [position], "included": []}
+        ) as mock_fetch:
+            self.assertEqual(
+                1,
+                self.store.sync(
+                    transaction, "did", "url", "depot", "2023-01-01", "2023-01-31"
+                ),
+            )
+        mock_fetch.assert_called_once_with("url")
+        self.store.add_positions("did", [], "2022-12-31")
+        position_list = self.store.positions("did")
+        self.assertEqual(1, len(position_list))
+        self.assertEqual("isin", position_list[0]["isin_wkn"])
+        self.assertEqual(10.0, position_list[0]["shares"])
+        self.assertFalse(self.store.positions("did", "31.12.2022"))
+
+    def test_012_sync(self):
+        """test sync() closes the gap to the synced range when going forward in time"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [_transaction("id1", "2023-03-20")],
+            "2023-01-01",
+            "2023-03-31",
+        )
+        api_list = [
+            _transaction("id1", "2023-03-20"),
+            _transaction("id2", "2023-05-10"),
+            _transaction("id3", "2023-08-01"),
+        ]
+        transaction = Transactions(client=Mock())
+        with patch.object(
+            transaction, "_fetch", side_effect=self._fetch_side_effect(api_list)
+        ) as mock_fetch:
+            self.store.sync(
+                transaction, "aid", "url", "account", "2023-07-01", "2023-12-31"
+            )
+        self.assertIn("filter[bookingDate][GE]=2023-03-24", mock_fetch.call_args[0][0])
+        self.assertEqual(("2023-01-01", "2023-12-31"), self.store.coverage("aid"))
+        self.assertEqual(
+            ["iban id3", "iban id2", "iban id1"],
+            [
+                ele["peeraccount"]
+                for ele in self.store.transactions(
+                    "aid", "account", "2023-01-01", "2023-12-31"
+                )
+            ],
+        )
+
+    def test_013_add_transactions(self):
+        """test add_transactions() does not extend the synced range over a gap"""
+        self.store.add_transactions("aid", "account", [], "2023-01-01", "2023-03-31")
+        self.store.add_transactions("aid", "account", [], "2023-07-01", "2023-12-31")
+        self.assertEqual(("2023-01-01", "2023-03-31"), self.store.coverage("aid"))
+        self.store.add_transactions("aid", "account", [], "2023-04-01", "2023-07-15")
+        self.assertEqual(("2023-01-01", "2023-07-15"), self.store.coverage("aid"))
+
+    def test_014_sync(self):
+        """test sync() does not store anything if a page fails to load"""
+        self.store.add_transactions(
+            "aid",
+            "account",
+            [_transaction("id1", "2023-01-05")],
+            "2023-01-01",
+            "2023-01-10",
+        )
+        page1 = Mock(status_code=200)
+        page1.json.return_value = {
+            "data": [_transaction("id2", "2023-01-20")],
+            "included": [],
+            "links": {"next": "/next"},
+        }
+        page2 = Mock(status_code=500)
+        client = Mock()
+        client.get.side_effect = [page1, page2]
+        transaction = Transactions(client=client, strict=True)
+        with self.assertRaises(DKBRoboError) as err:
+            self.store.sync(
+                transaction, "aid", "url", "account", "2023-01-01", "2023-01-31"
+            )
+        self.assertEqual(
+            "fetch transactions: http status code is not 200 but 500",
+            str(err.exception),
+        )
+        self.assertEqual(2, client.get.call_count)
+        self.assertEqual(("2023-01-01", "2023-01-10"), self.store.coverage("aid"))
+        self.assertEqual(
+            ["iban id1"],
+            [
+                ele["peeraccount"]
+                for ele in self.store.transactions(
+                    "aid", "account", "2023-01-01", "2023-01-31"
+                )
+            ],
+        )
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -7,6 +7,7 @@ from datetime import date
 import unittest
 import logging
 import json
+import copy
 from unittest.mock import patch, Mock, MagicMock, mock_open
 from bs4 import BeautifulSoup
 from mechanicalsoup import LinkNotFoundError
@@ -15,11 +16,14 @@ import io
 sys.path.insert(0, ".")
 sys.path.insert(0, "..")
 from dkb_robo.transaction import (
+    merge_transactions,
+    transaction_fields,
     Transactions,
     AccountTransactionItem,
     CreditCardTransactionItem,
     DepotTransactionItem,
 )
+from dkb_robo.utilities import DKBRoboError, included_index
 
 
 def json_load(fname):
@@ -519,7 +523,9 @@ class TestTransactions(unittest.TestCase):
                 "quote": {"data": {"id": "inid", "value": "value"}},
             },
         }
-        self.assertEqual(result, self.transaction._map(data_dic, included_list))
+        self.assertEqual(
+            result, self.transaction._map(data_dic, included_index(included_list))
+        )
 
     def test_020_map(self):
         """test _details() - add instrument information"""
@@ -565,7 +571,9 @@ class TestTransactions(unittest.TestCase):
                 "quote": {"data": {"id": "quoteid", "value": "value"}},
             },
         }
-        self.assertEqual(result, self.transaction._map(data_dic, included_list))
+        self.assertEqual(
+            result, self.transaction._map(data_dic, included_index(included_list))
+        )
 
     def test_021_map(self):
         """test _details() - add instrument information"""
@@ -611,7 +619,9 @@ class TestTransactions(unittest.TestCase):
                 "quote": {"data": {"id": "inid", "value": "value"}},
             },
         }
-        self.assertEqual(result, self.transaction._map(data_dic, included_list))
+        self.assertEqual(
+            result, self.transaction._map(data_dic, included_index(included_list))
+        )
 
     @patch("dkb_robo.transaction.Transactions._map")
     def test_022__correlate(self, mock_map):
@@ -645,9 +655,425 @@ class TestTransactions(unittest.TestCase):
         self.assertFalse(self.transaction._correlate(transaction_dic))
         self.assertFalse(mock_map.called)
 
+    def test_040_map(self):
+        """test _map() - relationships get resolved by type and id"""
+        included_list = [
+            {"id": "id1", "type": "instrument", "attributes": {"name": "instrument"}},
+            {"id": "id1", "type": "quote", "attributes": {"market": "quote"}},
+        ]
+        data_dic = {
+            "attributes": {},
+            "relationships": {
+                "instrument": {"data": {"id": "id1", "type": "instrument"}},
+                "quote": {"data": {"id": "id1", "type": "quote"}},
+            },
+        }
+        result = self.transaction._map(data_dic, included_index(included_list))
+        self.assertEqual(
+            {"name": "instrument", "id": "id1"}, result["attributes"]["instrument"]
+        )
+        self.assertEqual(
+            {"market": "quote", "id": "id1"}, result["attributes"]["quote"]
+        )
+
+    def test_041__correlate(self):
+        """test _correlate() scanning the included resources once on a synthetic depot"""
+
+        class Included(list):
+            """list counting the scans"""
+
+            scans = 0
+
+            def __iter__(self):
+                Included.scans += 1
+                return super().__iter__()
+
+        for size in (1000, 5000):
+            depot_dic = {"data": [], "included": Included()}
+            for idx in range(size):
+                depot_dic["data"].append(
+                    {
+                        "id": f"pos{idx}",
+                        "attributes": {},
+                        "relationships": {
+                            "instrument": {
+                                "data": {"id": f"in{idx}", "type": "instrument"}
+                            },
+                            "quote": {"data": {"id": f"qu{idx}", "type": "quote"}},
+                        },
+                    }
+                )
+                depot_dic["included"].append(
+                    {"id": f"in{idx}", "type": "instrument", "attributes": {}}
+                )
+                depot_dic["included"].append(
+                    {"id": f"qu{idx}", "type": "quote", "attributes": {}}
+                )
+            Included.scans = 0
+            position_list = self.transaction._correlate(depot_dic)
+            self.assertEqual(size, len(position_list))
+            self.assertEqual(
+                f"in{size - 1}", position_list[-1]["attributes"]["instrument"]["id"]
+            )
+            # a scan per position would make the runtime grow quadratically
+            self.assertEqual(1, Included.scans)
+
+    def test_042__pages(self):
+        """test _pages() yields one page after another"""
+        self.transaction.client = Mock()
+        self.transaction.client.get.return_value.status_code = 200
+        self.transaction.client.get.return_value.json.side_effect = [
+            {"data": [{"foo1": "bar1"}], "links": {"next": "/next_url"}},
+            {"data": [{"foo2": "bar2"}]},
+        ]
+        pages = self.transaction._pages("transaction_url")
+        self.assertEqual(
+            {"data": [{"foo1": "bar1"}], "links": {"next": "/next_url"}}, next(pages)
+        )
+        # the second page is not requested before the first one got consumed
+        self.assertEqual(1, self.transaction.client.get.call_count)
+        self.assertEqual({"data": [{"foo2": "bar2"}]}, next(pages))
+        self.transaction.client.get.assert_called_with(
+            "https://banking.dkb.de/api/accounts/next_url"
+        )
+        self.assertEqual([], list(pages))
+
+    def test_043__pages(self):
+        """test _pages() stops on http errors"""
+        self.transaction.client = Mock()
+        self.transaction.client.get.return_value.status_code = 500
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            self.assertEqual([], list(self.transaction._pages("transaction_url")))
+        self.assertIn(
+            "ERROR:dkb_robo.transaction:fetch transactions: http status code is not 200 but 500",
+            lcm.output,
+        )
+
+    def test_044__pages(self):
+        """test _pages() without url"""
+        self.transaction.client = Mock()
+        self.assertEqual([], list(self.transaction._pages(None)))
+        self.assertFalse(self.transaction.client.get.called)
+
+    def test_045_iter_pages(self):
+        """test iter_pages() filters and formats every page on its own"""
+        self.transaction.client = Mock()
+        self.transaction.client.get.return_value.status_code = 200
+        self.transaction.client.get.return_value.json.side_effect = [
+            {
+                "data": [
+                    {
+                        "id": "id1",
+                        "attributes": {
+                            "status": "booked",
+                            "bookingDate": "2023-01-02",
+                            "description": "description1",
+                            "amount": {"value": "-10", "currencyCode": "EUR"},
+                            "creditor": {"creditorAccount": {"iban": "iban1"}},
+                            "debtor": {"debtorAccount": {"iban": "iban2"}},
+                        },
+                    },
+                    {
+                        "id": "id2",
+                        "attributes": {
+                            "status": "pending",
+                            "bookingDate": "2023-01-02",
+                        },
+                    },
+                ],
+                "links": {"next": "/next_url"},
+            },
+            {
+                "data": [
+                    {
+                        "id": "id3",
+                        "attributes": {
+                            "status": "booked",
+                            "bookingDate": "2023-01-01",
+                            "description": "description3",
+                            "amount": {"value": "20", "currencyCode": "EUR"},
+                            "creditor": {"creditorAccount": {"iban": "iban2"}},
+                            "debtor": {"debtorAccount": {"iban": "iban3"}},
+                        },
+                    }
+                ]
+            },
+        ]
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            page_list = list(
+                self.transaction.iter_pages(
+                    "transaction_url", "account", "2023-01-01", "2023-01-31"
+                )
+            )
+        self.assertIn(
+            "INFO:dkb_robo.transaction:fetching account transactions", lcm.output
+        )
+        self.transaction.client.get.assert_any_call(
+            "transaction_url?filter[bookingDate][GE]=2023-01-01&filter[bookingDate][LE]=2023-01-31&expand=Merchant&page[size]=400"
+        )
+        self.assertEqual(2, len(page_list))
+        self.assertEqual(["iban1"], [ele["peeraccount"] for ele in page_list[0]])
+        self.assertEqual(["iban3"], [ele["peeraccount"] for ele in page_list[1]])
+
+    @patch("dkb_robo.transaction.Transactions._correlate")
+    @patch("dkb_robo.transaction.Transactions._filter")
+    @patch("dkb_robo.transaction.Transactions._pages")
+    def test_046_iter_pages(self, mock_pages, mock_filter, mock_correlate):
+        """test iter_pages() correlates depot positions per page"""
+        mock_pages.return_value = iter([{"data": ["page1"]}, {"data": ["page2"]}])
+        mock_correlate.return_value = []
+        self.assertEqual(
+            [[], []],
+            list(
+                self.transaction.iter_pages(
+                    "transaction_url", "depot", "2023-01-01", "2023-01-31"
+                )
+            ),
+        )
+        mock_pages.assert_called_once_with("transaction_url")
+        self.assertEqual(2, mock_correlate.call_count)
+        self.assertFalse(mock_filter.called)
+
+    def test_047__windows(self):
+        """test _windows() splits a range into calendar months"""
+        self.assertEqual(
+            [
+                ("2023-01-15", "2023-01-31"),
+                ("2023-02-01", "2023-02-28"),
+                ("2023-03-01", "2023-03-31"),
+                ("2023-04-01", "2023-04-02"),
+            ],
+            self.transaction._windows("15.01.2023", "2023-04-02"),
+        )
+
+    def test_048__windows(self):
+        """test _windows() single day and leap year"""
+        self.assertEqual(
+            [("2024-02-29", "2024-02-29")],
+            self.transaction._windows("2024-02-29", "2024-02-29"),
+        )
+        self.assertEqual(
+            [
+                ("2023-12-01", "2023-12-31"),
+                ("2024-01-01", "2024-01-31"),
+                ("2024-02-01", "2024-02-29"),
+            ],
+            self.transaction._windows("2023-12-01", "2024-02-29"),
+        )
+        self.assertEqual([], self.transaction._windows("2024-03-01", "2024-02-29"))
+
+    def test_049_backfill(self):
+        """test backfill() fetches windows, dedupes by id and sorts chronologically"""
+
+        def _transaction(uid, booking_date, status="booked"):
+            return {
+                "id": uid,
+                "attributes": {
+                    "status": status,
+                    "bookingDate": booking_date,
+                    "description": uid,
+                    "amount": {"value": "-10", "currencyCode": "EUR"},
+                    "creditor": {"creditorAccount": {"iban": uid}},
+                    "debtor": {"debtorAccount": {"iban": "iban"}},
+                },
+            }
+
+        response_dic = {
+            "2023-01-15": [
+                _transaction("id2", "2023-01-31"),
+                _transaction("id1", "2023-01-20"),
+                _transaction("id0", "2023-01-10"),
+            ],
+            "2023-02-01": [
+                _transaction("id4", "2023-02-10"),
+                _transaction("id5", "2023-02-05", "pending"),
+                # transaction at the window edge reported twice
+                _transaction("id2", "2023-01-31"),
+            ],
+            "2023-03-01": [_transaction("id3", "2023-03-01")],
+        }
+
+        def _get(url):
+            response = Mock(status_code=200)
+            date_from = url.split("filter[bookingDate][GE]=")[1][:10]
+            response.json.return_value = {"data": response_dic[date_from]}
+            return response
+
+        self.transaction.client = Mock()
+        self.transaction.client.get.side_effect = _get
+        transaction_list = self.transaction.backfill(
+            "transaction_url", "account", "2023-01-15", "2023-03-01", max_workers=3
+        )
+        self.assertEqual(3, self.transaction.client.get.call_count)
+        self.assertEqual(
+            [
+                ("id1", "2023-01-20"),
+                ("id2", "2023-01-31"),
+                ("id4", "2023-02-10"),
+                ("id3", "2023-03-01"),
+            ],
+            [(ele["peeraccount"], ele["bdate"]) for ele in transaction_list],
+        )
+
+    @patch("dkb_robo.transaction.Transactions._windows")
+    @patch("dkb_robo.transaction.Transactions.get")
+    def test_050_backfill(self, mock_get, mock_windows):
+        """test backfill() depot positions cannot be windowed"""
+        mock_get.return_value = ["mock_get"]
+        self.assertEqual(
+            ["mock_get"],
+            self.transaction.backfill("url", "depot", "2023-01-01", "2023-03-01"),
+        )
+        mock_get.assert_called_once_with(
+            "url", "depot", "2023-01-01", "2023-03-01", "booked"
+        )
+        self.assertFalse(mock_windows.called)
+
+    @patch("dkb_robo.transaction.Transactions._fetch")
+    def test_054_get_frame(self, mock_fetch):
+        """test get_frame() builds the frame from the filtered transactions"""
+        mock_fetch.return_value = json_load(
+            self.dir_path + "/mocks/account_transactions.json"
+        )
+        frame = self.transaction.get_frame(
+            "url", "account", "2024-03-01", "2024-03-31", backend="python"
+        )
+        self.assertEqual(
+            ["2024-03-28-00.34.57.123456", "2024-03-27-12.00.01.654321"],
+            frame.column("id"),
+        )
+        self.assertEqual(2415.0, frame.sum())
+        self.assertIn("filter[bookingDate][GE]=2024-03-01", mock_fetch.call_args[0][0])
+
+    @patch("dkb_robo.transaction.Transactions._fetch")
+    def test_055_get_frame(self, mock_fetch):
+        """test get_frame() for depots"""
+        with self.assertLogs("dkb_robo", level="INFO") as lcm:
+            frame = self.transaction.get_frame(
+                "url", "depot", "2024-03-01", "2024-03-31", backend="python"
+            )
+        self.assertEqual(0, len(frame))
+        self.assertFalse(mock_fetch.called)
+        self.assertIn(
+            "ERROR:dkb_robo.transaction:Transactions.get_frame(): depot is not supported",
+            lcm.output,
+        )
+
+    def test_056__fetch(self):
+        """test Transactions._fetch() raising errors in strict mode"""
+        self.transaction.client = Mock()
+        self.transaction.client.get.return_value.status_code = 500
+        self.transaction.strict = True
+        with self.assertRaises(DKBRoboError) as err:
+            self.transaction._fetch("transaction_url")
+        self.assertEqual(
+            "fetch transactions: http status code is not 200 but 500",
+            str(err.exception),
+        )
+
+    def test_057_transaction_fields(self):
+        """test transaction_fields()"""
+        self.assertEqual(
+            ["amount", "bdate", "currencycode", "text", "vdate"],
+            transaction_fields("creditCard"),
+        )
+        self.assertEqual(
+            ["id", "availableQuantity"], transaction_fields("depot", True)[0:2]
+        )
+        self.assertIsNone(transaction_fields("debitcard"))
+
+    @patch("dkb_robo.transaction.AccountTransactionItem.format")
+    def test_058__format(self, mock_format):
+        """test _format() building the requested fields only"""
+        transaction_dic = json_load(self.dir_path + "/mocks/account_transactions.json")
+        self.transaction.field_list = ["amount", "bdate", "amount"]
+        self.assertEqual(
+            [
+                {"amount": -85.0, "bdate": "2024-03-28"},
+                {"amount": 2500.0, "bdate": "2024-03-27"},
+            ],
+            self.transaction._format(transaction_dic["data"][0:2], "account"),
+        )
+        self.assertFalse(mock_format.called)
+        # unfiltered output ignores the fields
+        self.transaction.unfiltered = True
+        self.assertIsInstance(
+            self.transaction._format(transaction_dic["data"][0:1], "account")[0],
+            AccountTransactionItem,
+        )
+
+    @patch("dkb_robo.transaction.Transactions._fetch")
+    def test_059_get(self, mock_fetch):
+        """test get() rejecting unknown fields before fetching"""
+        self.transaction.field_list = ["amount", "foo", "peer"]
+        with self.assertRaises(DKBRoboError) as err:
+            self.transaction.get("url", "creditcard", "2024-03-01", "2024-03-31")
+        self.assertEqual(
+            "Unknown fields for creditcard transactions: foo, peer",
+            str(err.exception),
+        )
+        with self.assertRaises(DKBRoboError):
+            list(self.transaction.iter_pages("url", "depot", "from", "to"))
+        self.assertFalse(mock_fetch.called)
+
+
+class TestMergeTransactions(unittest.TestCase):
+    """merge_transactions() test class"""
+
+    def test_001_merge_transactions(self):
+        """test merging streams ordered oldest first"""
+        transaction_dic = {
+            "iban": iter([{"bdate": "2024-01-01"}, {"bdate": "2024-01-03"}]),
+            "pan": iter([{"bdate": "2024-01-02"}, {"bdate": "2024-01-03"}]),
+            "empty": iter([]),
+        }
+        self.assertEqual(
+            [
+                {"account": "iban", "bdate": "2024-01-01"},
+                {"account": "pan", "bdate": "2024-01-02"},
+                {"account": "iban", "bdate": "2024-01-03"},
+                {"account": "pan", "bdate": "2024-01-03"},
+            ],
+            list(merge_transactions(transaction_dic)),
+        )
+
+    def test_002_merge_transactions(self):
+        """test merging streams in api order holds one transaction per stream"""
+        consumed_list = []
+
+        def _stream(account, date_list):
+            for bdate in date_list:
+                consumed_list.append((account, bdate))
+                yield {"date": bdate}
+
+        merged = merge_transactions(
+            {
+                "iban": _stream("iban", ["2024-01-05", "2024-01-01"]),
+                "pan": _stream("pan", ["2024-01-04", "2024-01-02"]),
+            },
+            reverse=True,
+        )
+        self.assertEqual({"account": "iban", "date": "2024-01-05"}, next(merged))
+        self.assertEqual([("iban", "2024-01-05"), ("pan", "2024-01-04")], consumed_list)
+        self.assertEqual(
+            ["2024-01-04", "2024-01-02", "2024-01-01"],
+            [ele["date"] for ele in merged],
+        )
+
+    def test_003_merge_transactions(self):
+        """test merging dataclasses and undated depot positions"""
+        transaction = CreditCardTransactionItem(id="id1", bookingDate="2024-01-02")
+        result = list(
+            merge_transactions({"depot": [{"isin_wkn": "isin"}], "iban": [transaction]})
+        )
+        self.assertEqual({"account": "depot", "isin_wkn": "isin"}, result[0])
+        self.assertEqual("iban", result[1]["account"])
+        self.assertEqual("2024-01-02", result[1]["bookingDate"])
+
 
 class TestAccountTransactionItem(unittest.TestCase):
     def setUp(self):
+        self.dir_path = os.path.dirname(os.path.realpath(__file__))
         self.amount_data = {"value": 100, "currencyCode": "USD"}
         self.creditor_data = {
             "creditorAccount": {
@@ -792,6 +1218,9 @@ class TestAccountTransactionItem(unittest.TestCase):
             "text": "credit debintermediaryName Payment for services",
         }
         self.assertEqual(expected_transaction, formatted_transaction)
+        self.assertEqual(
+            list(AccountTransactionItem.FIELDS), list(formatted_transaction)
+        )
 
     @patch("dkb_robo.transaction.logger")
     def test_030_format(self, mock_logger):
@@ -919,6 +1348,117 @@ class TestAccountTransactionItem(unittest.TestCase):
         }
         self.assertEqual(expected_transaction, formatted_transaction)
 
+    def test_054_project(self):
+        """project() returns the values of format() for the requested keys"""
+        for amount, description in (
+            (100, "Payment  for services"),
+            (-100, "Payment for services"),
+            (-100, "VISA Debitkartenumsatz"),
+        ):
+            self.transaction_data["amount"] = {"value": amount, "currencyCode": "EUR"}
+            self.transaction_data["description"] = description
+            transaction_dic = copy.deepcopy(self.transaction_data)
+            formatted_transaction = AccountTransactionItem(
+                **copy.deepcopy(self.transaction_data)
+            ).format()
+            self.assertEqual(
+                formatted_transaction,
+                AccountTransactionItem.project(
+                    transaction_dic, AccountTransactionItem.FIELDS
+                ),
+            )
+            for key in AccountTransactionItem.FIELDS:
+                self.assertEqual(
+                    {key: formatted_transaction[key]},
+                    AccountTransactionItem.project(transaction_dic, [key]),
+                )
+            # raw attributes stay untouched
+            self.assertEqual(self.transaction_data, transaction_dic)
+
+    @patch("dkb_robo.transaction.Account")
+    @patch("dkb_robo.transaction.Amount")
+    def test_055_project(self, MockAmount, MockAccount):
+        """project() in the order of the fields and without dataclasses"""
+        self.transaction_data["amount"] = {"value": "-1,0", "currencyCode": "EUR"}
+        self.transaction_data["creditor"] = None
+        self.assertEqual(
+            {"peer": None, "amount": None, "text": "credit None Payment for services"},
+            AccountTransactionItem.project(
+                self.transaction_data, ["peer", "amount", "text"]
+            ),
+        )
+        self.assertFalse(MockAmount.called)
+        self.assertFalse(MockAccount.called)
+
+    def test_051_from_api(self):
+        """from_api() drops unknown fields and equals the regular constructor"""
+        transaction_dic = json_load(self.dir_path + "/mocks/account_transactions.json")[
+            "data"
+        ][0]["attributes"]
+        transaction = AccountTransactionItem.from_api(copy.deepcopy(transaction_dic))
+        self.assertEqual(AccountTransactionItem(**transaction_dic), transaction)
+        self.assertEqual("Lastschrift Stromabschlag 03/2024", transaction.description)
+        self.assertEqual(-85.0, transaction.amount.value)
+        self.assertEqual("BICXXXXXXXX", transaction.creditor.bic)
+        self.assertNotIn("unexpectedField", AccountTransactionItem.api_fields)
+        self.assertFalse(hasattr(transaction, "unexpectedField"))
+
+    def test_052_benchmark(self):
+        """filter_unexpected_fields computes the field sets once per class, not per object"""
+        from dataclasses import fields
+
+        transaction_list = json_load(
+            self.dir_path + "/mocks/account_transactions.json"
+        )["data"]
+        with patch("dkb_robo.utilities.fields", wraps=fields) as mock_fields:
+            for transaction in transaction_list * 10:
+                AccountTransactionItem(**copy.deepcopy(transaction["attributes"]))
+        self.assertFalse(mock_fields.called)
+
+    def test_053_memory(self):
+        """bytes per transaction held by slotted items compared to the decoded json
+
+        the number of objects can be raised via DKB_BENCHMARK_OBJECTS
+        """
+        import tracemalloc
+
+        count = int(os.environ.get("DKB_BENCHMARK_OBJECTS", 2000))
+        transaction_list = json_load(
+            self.dir_path + "/mocks/account_transactions.json"
+        )["data"]
+        payload = json.dumps(
+            [
+                transaction_list[idx % len(transaction_list)]["attributes"]
+                for idx in range(count)
+            ]
+        )
+
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            attributes_list = json.loads(payload)
+            decoded = (tracemalloc.get_traced_memory()[0] - start) / count
+            item_list = [
+                AccountTransactionItem.from_api(attributes)
+                for attributes in attributes_list
+            ]
+            del attributes_list
+            held = (tracemalloc.get_traced_memory()[0] - start) / count
+        finally:
+            tracemalloc.stop()
+
+        self.assertFalse(hasattr(item_list[0], "__dict__"))
+        self.assertFalse(hasattr(item_list[0].amount, "__dict__"))
+        self.assertIs(item_list[0].status, item_list[-1].status)
+        self.assertIs(
+            item_list[0].amount.currencyCode, item_list[-1].amount.currencyCode
+        )
+        self.assertLess(
+            held,
+            decoded / 2,
+            f"bytes per transaction: json {decoded:.0f} items {held:.0f}",
+        )
+
 
 class TestCreditCardTransactionItem(unittest.TestCase):
     def setUp(self):
@@ -983,6 +1523,20 @@ class TestCreditCardTransactionItem(unittest.TestCase):
         }
 
         self.assertEqual(formatted_transaction, expected_transaction)
+        self.assertEqual(
+            list(CreditCardTransactionItem.FIELDS), list(formatted_transaction)
+        )
+
+    @patch("dkb_robo.transaction.Amount")
+    def test_056_project(self, MockAmount):
+        """test project()"""
+        self.assertEqual(
+            {"vdate": "2022-01-15", "amount": 100.0},
+            CreditCardTransactionItem.project(
+                self.transaction_data, ["vdate", "amount"]
+            ),
+        )
+        self.assertFalse(MockAmount.called)
 
 
 class TestDepotTransactionItem(unittest.TestCase):
@@ -1101,6 +1655,7 @@ class TestDepotTransactionItem(unittest.TestCase):
         }
 
         self.assertEqual(formatted_transaction, expected_transaction)
+        self.assertEqual(list(DepotTransactionItem.FIELDS), list(formatted_transaction))
 
     @patch("dkb_robo.transaction.logger")
     def test_039_format(self, mock_logger):
@@ -1123,6 +1678,22 @@ class TestDepotTransactionItem(unittest.TestCase):
         }
         self.assertEqual(formatted_transaction, expected_transaction)
 
+    def test_057_project(self):
+        """test project() of a position without quote"""
+        self.transaction_data["quote"] = None
+        self.assertEqual(
+            {"text": "Short Name", "shares": 100.0},
+            DepotTransactionItem.project(
+                self.transaction_data, ["text", "price", "shares"]
+            ),
+        )
+
+    def test_058_project(self):
+        """test project() rejecting unknown keys"""
+        with self.assertRaises(DKBRoboError) as err:
+            DepotTransactionItem.project(self.transaction_data, ["text", "foo"])
+        self.assertEqual("Unknown fields: foo", str(err.exception))
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=r0904, c0415, c0413, r0913, w0212
+""" unittests for dkb_robo.transport """
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, Mock
+import requests
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+from dkb_robo.transport import (
+    DeadlineExceeded,
+    JitterRetry,
+    TransportAdapter,
+    TransportPolicy,
+)
+from dkb_robo.utilities import DKBRoboError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """answers with the next status code of the server queue"""
+
+    def _answer(self):
+        (status_code, header_dic) = self.server.status_list.pop(0)
+        self.server.method_list.append(self.command)
+        self.send_response(status_code)
+        for header, value in header_dic.items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self._answer()
+
+    def log_message(self, format, *args):  # pylint: disable=w0622
+        pass
+
+
+class TestTransportPolicy(unittest.TestCase):
+    """TransportPolicy and JitterRetry test class"""
+
+    def test_001_retry(self):
+        """test retry() configuration"""
+        retry = TransportPolicy(retries=5).retry()
+        self.assertIsInstance(retry, JitterRetry)
+        self.assertEqual(5, retry.total)
+        self.assertEqual(frozenset(["GET"]), retry.allowed_methods)
+        self.assertEqual((429, 500, 502, 503, 504), retry.status_forcelist)
+        self.assertTrue(retry.respect_retry_after_header)
+        self.assertFalse(retry.raise_on_status)
+
+    def test_002_repr(self):
+        """test repr()"""
+        self.assertEqual(
+            "TransportPolicy(pool_size=None, connect_timeout=10.0, read_timeout=30.0, deadline=None, retries=3, backoff_factor=0.5)",
+            repr(TransportPolicy()),
+        )
+
+    @patch("dkb_robo.transport.random.uniform")
+    def test_003_get_backoff_time(self, mock_uniform):
+        """test get_backoff_time() picks a random value up to the exponential back-off"""
+        mock_uniform.return_value = 0.7
+        retry = TransportPolicy(backoff_factor=1).retry()
+        self.assertEqual(0, retry.get_backoff_time())
+        retry = retry.increment("GET", "/").increment("GET", "/").increment("GET", "/")
+        self.assertEqual(0.7, retry.get_backoff_time())
+        mock_uniform.assert_called_with(0, 4.0)
+
+    def test_004_get_backoff_time(self):
+        """test get_backoff_time() refuses to wait beyond the deadline"""
+        retry = TransportPolicy(backoff_factor=100).retry(lambda: 0.001)
+        retry = retry.increment("GET", "/").increment("GET", "/")
+        with self.assertRaises(DeadlineExceeded):
+            # new() hands over the deadline
+            retry.get_backoff_time()
+
+    def test_005_get_retry_after(self):
+        """test get_retry_after() honours the Retry-After header"""
+        response = Mock()
+        response.headers = {"Retry-After": "2"}
+        self.assertEqual(2, TransportPolicy().retry().get_retry_after(response))
+        self.assertEqual(
+            2, TransportPolicy().retry(lambda: 10).get_retry_after(response)
+        )
+        with self.assertRaises(DeadlineExceeded) as err:
+            TransportPolicy().retry(lambda: 1).get_retry_after(response)
+        self.assertEqual(
+            "Deadline exceeded: retry in 2.0s but only 1.0s left", str(err.exception)
+        )
+        self.assertIsInstance(err.exception, DKBRoboError)
+        response.headers = {}
+        self.assertIsNone(TransportPolicy().retry(lambda: 1).get_retry_after(response))
+
+
+class TestTransportAdapter(unittest.TestCase):
+    """TransportAdapter test class"""
+
+    def setUp(self):
+        self.adapter = TransportAdapter(
+            TransportPolicy(connect_timeout=5, read_timeout=20, deadline=60)
+        )
+
+    def test_006_init(self):
+        """test pool size derived from the number of workers"""
+        self.assertEqual(10, TransportAdapter()._pool_maxsize)
+        self.assertEqual(32, TransportAdapter(max_workers=32)._pool_maxsize)
+        self.assertEqual(
+            4,
+            TransportAdapter(
+                TransportPolicy(pool_size=4), max_workers=32
+            )._pool_maxsize,
+        )
+        self.assertEqual(self.adapter.remaining, self.adapter.max_retries.remaining)
+
+    def test_007_timeout(self):
+        """test timeout() outside of an operation"""
+        self.assertIsNone(self.adapter.remaining())
+        self.assertEqual((5, 20), self.adapter.timeout())
+
+    def test_008_timeout(self):
+        """test timeout() gets cut down to the deadline"""
+        with self.adapter.operation(deadline=8):
+            (connect, read) = self.adapter.timeout()
+            self.assertEqual(5, connect)
+            self.assertTrue(7 < read <= 8)
+        self.assertEqual([], self.adapter.deadline_list)
+
+    def test_009_timeout(self):
+        """test timeout() after the deadline passed"""
+        with self.adapter.operation(deadline=0.01):
+            time.sleep(0.02)
+            with self.assertRaises(DeadlineExceeded):
+                self.adapter.timeout()
+        self.assertEqual([], self.adapter.deadline_list)
+
+    def test_010_operation(self):
+        """test operation() uses the policy deadline and overlapping operations"""
+        with self.adapter.operation():
+            self.assertTrue(59 < self.adapter.remaining() <= 60)
+            with self.adapter.operation(deadline=1):
+                self.assertTrue(59 < self.adapter.remaining() <= 60)
+            self.assertEqual(1, len(self.adapter.deadline_list))
+
+    def test_011_operation(self):
+        """test operation() without deadline"""
+        adapter = TransportAdapter()
+        with adapter.operation():
+            self.assertIsNone(adapter.remaining())
+
+    @patch("requests.adapters.HTTPAdapter.send")
+    def test_012_send(self, mock_send):
+        """test send() adds the policy timeouts"""
+        request = requests.Request("GET", "https://banking.dkb.de/api/foo").prepare()
+        self.adapter.send(request)
+        self.assertEqual((5, 20), mock_send.call_args[1]["timeout"])
+        self.adapter.send(request, timeout=3, verify=False, proxies={"https": "p"})
+        mock_send.assert_called_with(
+            request,
+            stream=False,
+            timeout=3,
+            verify=False,
+            cert=None,
+            proxies={"https": "p"},
+        )
+
+
+class TestRetries(unittest.TestCase):
+    """retries against a local http server"""
+
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.status_list = []
+        self.httpd.method_list = []
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/api"
+        self.session = requests.session()
+        self.session.mount(
+            "http://", TransportAdapter(TransportPolicy(backoff_factor=0))
+        )
+
+    def tearDown(self):
+        self.session.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_013_get(self):
+        """test GET requests get retried on 429/5xx"""
+        self.httpd.status_list = [
+            (503, {}),
+            (429, {"Retry-After": "0"}),
+            (200, {}),
+        ]
+        self.assertEqual(200, self.session.get(self.url).status_code)
+        self.assertEqual(["GET", "GET", "GET"], self.httpd.method_list)
+
+    def test_014_get(self):
+        """test the last response gets returned once the retries are used up"""
+        self.httpd.status_list = [(500, {})] * 4
+        self.assertEqual(500, self.session.get(self.url).status_code)
+        self.assertEqual(4, len(self.httpd.method_list))
+
+    def test_015_post(self):
+        """test POST requests do not get retried"""
+        self.httpd.status_list = [(503, {}), (200, {})]
+        self.assertEqual(503, self.session.post(self.url).status_code)
+        self.assertEqual(["POST"], self.httpd.method_list)
+
+    def test_016_deadline(self):
+        """test a Retry-After beyond the deadline aborts the operation"""
+        self.httpd.status_list = [(429, {"Retry-After": "120"}), (200, {})]
+        adapter = self.session.get_adapter(self.url)
+        with adapter.operation(deadline=5):
+            with self.assertRaises(DeadlineExceeded):
+                self.session.get(self.url)
+        self.assertEqual(1, len(self.httpd.method_list))
+
+
+if __name__ == "__main__":
+
+    unittest.main()
@@ -539,6 +539,244 @@ class TestPerformanceValue(unittest.TestCase):
         )
 
 
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        from dkb_robo.utilities import RateLimiter
+
+        self.RateLimiter = RateLimiter
+
+    @patch("dkb_robo.utilities.time.sleep")
+    def test_053_acquire(self, mock_sleep):
+        """rate limiting disabled"""
+        rate_limiter = self.RateLimiter(rate=0)
+        self.assertEqual(0, rate_limiter.acquire())
+        self.assertFalse(mock_sleep.called)
+
+    @patch("dkb_robo.utilities.time.monotonic")
+    @patch("dkb_robo.utilities.time.sleep")
+    def test_054_acquire(self, mock_sleep, mock_monotonic):
+        """token available"""
+        mock_monotonic.return_value = 100
+        rate_limiter = self.RateLimiter(rate=2, capacity=2)
+        self.assertEqual(0, rate_limiter.acquire())
+        self.assertEqual(0, rate_limiter.acquire())
+        self.assertFalse(mock_sleep.called)
+
+    @patch("dkb_robo.utilities.time.monotonic")
+    @patch("dkb_robo.utilities.time.sleep")
+    def test_055_acquire(self, mock_sleep, mock_monotonic):
+        """empty bucket queues up callers"""
+        mock_monotonic.return_value = 100
+        rate_limiter = self.RateLimiter(rate=2, capacity=1)
+        self.assertEqual(0, rate_limiter.acquire())
+        self.assertEqual(0.5, rate_limiter.acquire())
+        self.assertEqual(1.0, rate_limiter.acquire())
+        mock_sleep.assert_called_with(1.0)
+
+    @patch("dkb_robo.utilities.time.monotonic")
+    @patch("dkb_robo.utilities.time.sleep")
+    def test_056_acquire(self, mock_sleep, mock_monotonic):
+        """bucket refills over time but not above capacity"""
+        mock_monotonic.side_effect = [100, 100, 110, 110]
+        rate_limiter = self.RateLimiter(rate=2, capacity=1)
+        self.assertEqual(0, rate_limiter.acquire())
+        self.assertEqual(0, rate_limiter.acquire())
+        self.assertEqual(0.5, rate_limiter.acquire())
+        self.assertEqual(1, mock_sleep.call_count)
+
+
+class TestIncluded(unittest.TestCase):
+    def setUp(self):
+        from dkb_robo.utilities import included_index, included_lookup
+
+        self.included_index = included_index
+        self.included_lookup = included_lookup
+
+    def test_057_included_index(self):
+        """index by type and id with id-only fallback"""
+        included_list = [
+            {"id": "id1", "type": "instrument"},
+            {"id": "id2", "type": "quote"},
+            {"foo": "bar"},
+            "string",
+        ]
+        self.assertEqual(
+            {
+                ("instrument", "id1"): {"id": "id1", "type": "instrument"},
+                (None, "id1"): {"id": "id1", "type": "instrument"},
+                ("quote", "id2"): {"id": "id2", "type": "quote"},
+                (None, "id2"): {"id": "id2", "type": "quote"},
+            },
+            self.included_index(included_list),
+        )
+
+    def test_058_included_lookup(self):
+        """lookup relationships"""
+        index_dic = self.included_index(
+            [
+                {"id": "id1", "type": "instrument"},
+                {"id": "id1", "type": "quote"},
+                {"id": "id2", "type": "merchant"},
+            ]
+        )
+        resource = {
+            "relationships": {
+                "instrument": {"data": {"id": "id1", "type": "instrument"}},
+                "quote": {"data": {"id": "id1", "type": "quote"}},
+                "merchant": {"data": {"id": "id2"}},
+                "unknown": {"data": {"id": "id3"}},
+                "empty": {"data": None},
+            }
+        }
+        self.assertEqual(
+            {"id": "id1", "type": "instrument"},
+            self.included_lookup(resource, "instrument", index_dic),
+        )
+        self.assertEqual(
+            {"id": "id1", "type": "quote"},
+            self.included_lookup(resource, "quote", index_dic),
+        )
+        self.assertEqual(
+            {"id": "id2", "type": "merchant"},
+            self.included_lookup(resource, "merchant", index_dic),
+        )
+        self.assertIsNone(self.included_lookup(resource, "unknown", index_dic))
+        self.assertIsNone(self.included_lookup(resource, "empty", index_dic))
+        self.assertIsNone(self.included_lookup(resource, "missing", index_dic))
+
+
 if __name__ == "__main__":
 
     unittest.main()
+
+
+class TestTransferStats(unittest.TestCase):
+    def setUp(self):
+        from dkb_robo.utilities import TransferStats
+
+        self.stats = TransferStats()
+
+    def _response(self, body, encoding=None):
+        """build a requests response around a raw urllib3 response"""
+        import io
+        import requests
+        import urllib3
+
+        headers = {"Content-Encoding": encoding} if encoding else {}
+        response = requests.Response()
+        response.status_code = 200
+        response.url = "https://banking.dkb.de/api/accounts/accounts/d3f1a2b4-0000-1111-2222-333344445555/transactions?page=1"
+        response.headers = requests.structures.CaseInsensitiveDict(headers)
+        response.raw = urllib3.HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            preload_content=False,
+            decode_content=True,
+        )
+        return response
+
+    def test_059_hook(self):
+        """compressed response is counted with its size on the wire"""
+        import gzip
+
+        content = b'{"data": [{"id": "transaction"}]}' * 200
+        response = self._response(gzip.compress(content), "gzip")
+        self.assertEqual(response, self.stats.hook(response))
+        self.assertEqual(content, response.content)
+        stats_dic = self.stats.summary()["/api/accounts/accounts/{id}/transactions"]
+        self.assertEqual(1, stats_dic["requests"])
+        self.assertEqual(len(gzip.compress(content)), stats_dic["wire_bytes"])
+        self.assertEqual(len(content), stats_dic["content_bytes"])
+        self.assertLess(stats_dic["wire_bytes"], stats_dic["content_bytes"] / 10)
+        self.assertEqual({"gzip": 1}, stats_dic["encodings"])
+
+    def test_060_hook(self):
+        """uncompressed and streamed responses"""
+        response = self._response(b"content")
+        self.stats.hook(response)
+        self.stats.hook(self._response(b"content"))
+        streamed = self._response(b"streamed")
+        self.stats.hook(streamed, stream=True)
+        self.assertEqual(
+            {
+                "requests": 2,
+                "wire_bytes": 14,
+                "content_bytes": 14,
+                "encodings": {"identity": 2},
+            },
+            {
+                key: value
+                for key, value in self.stats.summary()[
+                    "/api/accounts/accounts/{id}/transactions"
+                ].items()
+                if key != "read_time"
+            },
+        )
+        # streamed body is left for the caller
+        self.assertEqual(b"streamed", streamed.raw.read())
+
+    def test_061_summary(self):
+        """summary is a copy"""
+        self.stats.record("https://host/path", 1, 2, 0.1, "br")
+        summary_dic = self.stats.summary()
+        summary_dic["/path"]["encodings"]["br"] = 5
+        self.assertEqual({"br": 1}, self.stats.summary()["/path"]["encodings"])
+
+    def test_064_hook(self):
+        """cached responses are counted without wire bytes"""
+        import requests
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = "https://host/path"
+        response._content = b"content"
+        response.headers = requests.structures.CaseInsensitiveDict(
+            {"Content-Encoding": "gzip"}
+        )
+        response.from_cache = True
+        self.stats.hook(response)
+        stats_dic = self.stats.summary()["/path"]
+        self.assertEqual(0, stats_dic["wire_bytes"])
+        self.assertEqual(7, stats_dic["content_bytes"])
+        self.assertEqual({"cache": 1}, stats_dic["encodings"])
+
+
+class TestSlotted(unittest.TestCase):
+    def test_062_slotted(self):
+        """slotted dataclass keeps defaults and drops the instance dictionary"""
+        from dataclasses import field, fields
+        from dkb_robo.utilities import slotted, filter_unexpected_fields
+
+        @filter_unexpected_fields
+        @slotted
+        @dataclass
+        class Slotted:
+            """slotted test class"""
+
+            foo: str = "foo"
+            bar: list = field(default_factory=list)
+
+        obj = Slotted.from_api({"bar": [1], "unknown": "unknown"})
+        self.assertEqual(Slotted(foo="foo", bar=[1]), obj)
+        self.assertEqual(("foo", "bar"), Slotted.__slots__)
+        self.assertEqual(["foo", "bar"], [ele.name for ele in fields(Slotted)])
+        self.assertFalse(hasattr(obj, "__dict__"))
+        self.assertIn("TestSlotted.test_062_slotted.<locals>.Slotted", repr(Slotted))
+        with self.assertRaises(AttributeError):
+            obj.unknown = "unknown"
+
+    def test_063_intern_fields(self):
+        """string values get interned, other values are left untouched"""
+        from dkb_robo.utilities import Account, Amount
+
+        amount_list = [
+            Amount(value="1", currencyCode="".join(["E", "UR"])) for _ in range(2)
+        ]
+        self.assertIs(amount_list[0].currencyCode, amount_list[1].currencyCode)
+        self.assertIsNone(amount_list[0].unit)
+        account_list = [
+            Account(iban="".join(["DE", "00"]), bic="".join(["BY", "LA"]))
+            for _ in range(2)
+        ]
+        self.assertIs(account_list[0].iban, account_list[1].iban)
+        self.assertIs(account_list[0].bic, account_list[1].bic)